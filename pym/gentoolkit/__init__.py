@@ -19,7 +19,13 @@ CONFIG = {
     'quiet': False,
     # verbose is True if not quiet and not piping
     'verbose': True,
-    'debug': False
+    'debug': False,
+    # Structured output for other programs: None, 'ndjson' or 'tsv'
+    'format': None,
+    # Report phase timings and counters (see gentoolkit.profiler)
+    'profile': False,
+    # Where to write cProfile stats when profiling, if anywhere
+    'profile_dump': None
 }
 
 # vim: set ts=8 sw=4 tw=79:
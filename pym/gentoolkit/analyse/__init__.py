@@ -45,6 +45,7 @@ from gentoolkit import pprinter as pp
 from gentoolkit.base import (initialize_configuration, split_arguments,
 	parse_global_options, print_help)
 from gentoolkit.formatters import format_options
+from gentoolkit.profiler import PROFILER
 
 
 NAME_MAP = {
@@ -78,7 +79,8 @@ def main():
 
 	short_opts = "hqCNV"
 	long_opts = (
-		'help', 'quiet', 'nocolor', 'no-color', 'no-pipe', 'version', 'debug'
+		'help', 'quiet', 'nocolor', 'no-color', 'no-pipe', 'version', 'debug',
+		'profile', 'profile-dump='
 	)
 
 	initialize_configuration()
@@ -113,11 +115,18 @@ def main():
 		print_help(MODULE_INFO, FORMATTED_OPTIONS, with_description=False)
 		sys.exit(2)
 
+	if gen.CONFIG['profile']:
+		PROFILER.start(gen.CONFIG['profile_dump'])
+		PROFILER.count_dbapi_calls()
+
 	try:
 		loaded_module = __import__(
 			expanded_module_name, globals(), locals(), [], -1
 		)
-		loaded_module.main(module_args)
+		try:
+			loaded_module.main(module_args)
+		finally:
+			PROFILER.finish()
 	except portage.exception.AmbiguousPackageName as err:
 		raise errors.GentoolkitAmbiguousPackage(err.args[0])
 	except IOError as err:
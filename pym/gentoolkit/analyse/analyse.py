@@ -21,6 +21,7 @@ from gentoolkit.analyse.lib import FlagAnalyzer, KeywordAnalyser
 from gentoolkit.analyse.output import nl, AnalysisPrinter
 from gentoolkit.package import Package
 from gentoolkit.helpers import get_installed_cpvs
+from gentoolkit.profiler import PROFILER
 
 import portage
 
@@ -68,11 +69,12 @@ def gather_flags_info(
 	for cpv in cpvs:
 		if cpv.startswith("virtual"):
 			continue
-		if use_portage:
-			plus, minus, unset = flags.analyse_cpv(cpv)
-		else:
-			pkg = Package(cpv)
-			plus, minus, unset = flags.analyse_pkg(pkg)
+		with PROFILER.phase("package work"):
+			if use_portage:
+				plus, minus, unset = flags.analyse_cpv(cpv)
+			else:
+				pkg = Package(cpv)
+				plus, minus, unset = flags.analyse_pkg(pkg)
 		for flag in plus:
 			if flag in flag_users:
 				flag_users[flag]["+"].append(cpv)
@@ -120,11 +122,12 @@ def gather_keywords_info(
 	for cpv in cpvs:
 		if cpv.startswith("virtual"):
 			continue
-		if use_portage:
-			keyword = analyser.get_inst_keyword_cpv(cpv)
-		else:
-			pkg = Package(cpv)
-			keyword = analyser.get_inst_keyword_pkg(pkg)
+		with PROFILER.phase("package work"):
+			if use_portage:
+				keyword = analyser.get_inst_keyword_cpv(cpv)
+			else:
+				pkg = Package(cpv)
+				keyword = analyser.get_inst_keyword_pkg(pkg)
 		#print "returned keyword =", cpv, keyword, keyword[0]
 		key = keyword[0]
 		if key in ["~", "-"]:
@@ -23,6 +23,7 @@ from gentoolkit import pprinter as pp
 from gentoolkit.analyse.lib import (get_installed_use, get_flags,
 	abs_flag, abs_list, FlagAnalyzer)
 from gentoolkit.analyse.output import RebuildPrinter
+from gentoolkit.profiler import PROFILER
 
 import portage
 
@@ -63,7 +64,8 @@ def cpv_all_diff_use(
 		_get_used=get_installed_use
 	)
 	for cpv in cpvs:
-		plus, minus, unset = flags.analyse_cpv(cpv)
+		with PROFILER.phase("package work"):
+			plus, minus, unset = flags.analyse_cpv(cpv)
 		for flag in minus:
 			plus.add("-"+flag)
 		if len(plus):
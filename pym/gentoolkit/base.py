@@ -31,7 +31,10 @@ GLOBAL_OPTIONS = (
 	("    -q, --quiet", "minimal output"),
 	("    -C, --no-color", "turn off colors"),
 	("    -N, --no-pipe", "turn off pipe detection"),
-	("    -V, --version", "display version info")
+	("    -V, --version", "display version info"),
+	("        --profile", "report where the time went on stderr"),
+	("        --profile-dump=FILE",
+		"also write cProfile stats to FILE (implies --profile)")
 )
 
 
@@ -108,8 +111,7 @@ def parse_global_options(global_opts, args, module_info, formatted_options):
 	"""
 
 	need_help = False
-	opts = (opt[0] for opt in global_opts)
-	for opt in opts:
+	for opt, posarg in global_opts:
 		if opt in ('-h', '--help'):
 			if args:
 				need_help = True
@@ -128,6 +130,11 @@ def parse_global_options(global_opts, args, module_info, formatted_options):
 			sys.exit(0)
 		elif opt in ('--debug'):
 			gentoolkit.CONFIG['debug'] = True
+		elif opt == '--profile':
+			gentoolkit.CONFIG['profile'] = True
+		elif opt == '--profile-dump':
+			gentoolkit.CONFIG['profile'] = True
+			gentoolkit.CONFIG['profile_dump'] = posarg
 	return need_help
 
 
@@ -8,22 +8,97 @@ from __future__ import print_function
 
 
 import os
+import stat
 import sys
+from multiprocessing.pool import ThreadPool
 
 import gentoolkit.pprinter as pp
 from gentoolkit.eclean.pkgindex import PkgIndex
 
 
+# maximum number of concurrent unlink() calls
+DEFAULT_JOBS = 8
+
+
+def _unlink(file_):
+	"""Worker for the deletion pool.
+
+	@rtype: tuple
+	@return: (file_, None) on success or (file_, error) on failure
+	"""
+	try:
+		os.unlink(file_)
+	except EnvironmentError as er:
+		return file_, er
+	return file_, None
+
+
+class FreedSpace(object):
+	"""Accumulates the space freed by removing files.
+
+	Each inode is counted once, and only if all of its links were
+	removed, so removing one name of a hardlinked file frees nothing.
+	Only hardlinked inodes are remembered, so the memory used does not
+	grow with the number of files added.
+	"""
+
+	def __init__(self):
+		self.size = 0
+		# {(st_dev, st_ino): number of links removed}
+		self._links = {}
+
+	def add(self, statinfo):
+		"""Add the os.lstat() result of a removed file."""
+		if not stat.S_ISREG(statinfo.st_mode):
+			return
+		if statinfo.st_nlink <= 1:
+			self.size += statinfo.st_size
+			return
+		ino = (statinfo.st_dev, statinfo.st_ino)
+		links = self._links.get(ino, 0) + 1
+		self._links[ino] = links
+		if links == statinfo.st_nlink:
+			self.size += statinfo.st_size
+
+
+def freed_size(stats):
+	"""Calculate the space freed by removing a group of files.
+
+	@param stats: iterable of os.lstat() results of the removed files
+	@rtype: int
+	@return: number of bytes freed
+	"""
+	freed = FreedSpace()
+	for statinfo in stats:
+		freed.add(statinfo)
+	return freed.size
+
+
 class CleanUp(object):
 	"""Performs all cleaning actions to distfiles or package directories.
 
 	@param controller: a progress output/user interaction controller function
 					   which returns a Boolean to control file deletion
 					   or bypassing/ignoring
+	@param file_stats: optional dict of {filepath: os.lstat() result}
+					   gathered during the search, re-used instead of
+					   stat'ing every file again
+	@param jobs: maximum number of files being unlinked concurrently
+	@param progress: optional function called with (bytes freed, files
+					   done, total number of files or None if unknown)
+					   each time a deletion completes
 	"""
 
-	def __init__(self, controller):
+	def __init__(self, controller, file_stats=None, jobs=DEFAULT_JOBS,
+			progress=None):
 		self.controller = controller
+		if file_stats is None:
+			file_stats = {}
+		self.file_stats = file_stats
+		self.jobs = max(1, jobs)
+		self.progress = progress
+		self._done = 0
+		self._total = None
 
 	def clean_dist(self, clean_dict):
 		"""Calculate size of each entry for display, prompt user if needed,
@@ -37,12 +112,8 @@ class CleanUp(object):
 		"""
 		file_type = 'file'
 		clean_keys = self._sort_keys(clean_dict)
-		clean_size = 0
-		# clean all entries one by one
-		for key in clean_keys:
-			clean_size += self._clean_files(clean_dict[key], key, file_type)
-		# return total size of deleted or to delete files
-		return clean_size
+		# clean all entries, deleting in the background
+		return self._clean_files(clean_dict, clean_keys, file_type)
 
 	def clean_pkgs(self, clean_dict, pkgdir):
 		"""Calculate size of each entry for display, prompt user if needed,
@@ -58,10 +129,8 @@ class CleanUp(object):
 		"""
 		file_type = 'binary package'
 		clean_keys = self._sort_keys(clean_dict)
-		clean_size = 0
-		# clean all entries one by one
-		for key in clean_keys:
-			clean_size += self._clean_files(clean_dict[key], key, file_type)
+		# clean all entries, deleting in the background
+		clean_size = self._clean_files(clean_dict, clean_keys, file_type)
 
 		#  run 'emaint --fix' here
 		if clean_size:
@@ -84,31 +153,125 @@ class CleanUp(object):
 		"""
 		file_type = 'file'
 		clean_keys = self._sort_keys(clean_dict)
-		clean_size = 0
+		all_stats = []
 		# tally all entries one by one
 		for key in clean_keys:
-			key_size = self._get_size(clean_dict[key])
-			self.controller(key_size, key, clean_dict[key], file_type)
-			clean_size += key_size
-		return clean_size
+			stats = [self._get_stat(file_) for file_ in clean_dict[key]]
+			stats = [statinfo for statinfo in stats if statinfo is not None]
+			self.controller(freed_size(stats), key, clean_dict[key],
+				file_type)
+			all_stats.extend(stats)
+		return freed_size(all_stats)
+
+	def clean_stream(self, candidates, file_type='file', pretend=False):
+		"""Consume candidates as they are found, calculate the size of
+		each one for display, prompt user if needed and delete files if
+		approved.
+
+		Nothing is kept about a candidate once it has been handled, and
+		at most a few deletions per job are pending at any time.
+
+		@param candidates: iterable of (display name, [files],
+				[os.lstat() results]) as yielded by
+				DistfilesSearch.iterDistfiles()
+		@param file_type: string used in the prompt
+		@param pretend: only display and tally the candidates
+
+		@rtype: tuple
+		@return: (total size that was or would be cleaned,
+				number of candidates)
+		"""
+		freed = FreedSpace()
+		count = 0
+		pending = []
+		pool = None
+		if not pretend:
+			pool = ThreadPool(self.jobs)
+		# the total is not known before the search is over
+		self._done, self._total = 0, None
+		try:
+			for key, files, stats in candidates:
+				count += 1
+				if pretend:
+					for statinfo in stats:
+						freed.add(statinfo)
+					self.controller(freed_size(stats), key, files, file_type)
+					continue
+				for file_, statinfo in zip(files, stats):
+					size = self._display_size(file_, statinfo)
+					if self.controller(size, key, file_, file_type):
+						# ... try to delete it.
+						pending.append((pool.apply_async(_unlink, (file_,)),
+							statinfo))
+					else:
+						self._done += 1
+				# wait for the oldest deletions to keep the queue bounded
+				while pending and (pending[0][0].ready() or
+						len(pending) > 4 * self.jobs):
+					self._collect(pending.pop(0), freed)
+			while pending:
+				self._collect(pending.pop(0), freed)
+			if pool is not None:
+				# the search is over, so the total is known now
+				self._total = self._done
+				self._report(freed)
+		finally:
+			if pool is not None:
+				pool.terminate()
+				pool.join()
+		return freed.size, count
+
+	def _collect(self, job, freed):
+		"""Wait for a pending deletion, account for it and report the
+		progress so far."""
+		result, statinfo = job
+		file_, er = result.get()
+		if er is None:
+			freed.add(statinfo)
+		else:
+			print( pp.error("Could not delete "+file_), file=sys.stderr)
+			print( pp.error("Error: %s" %str(er)), file=sys.stderr)
+		self._done += 1
+		if self._done != self._total:
+			self._report(freed)
+
+	def _report(self, freed):
+		"""Pass the running totals to the progress function."""
+		if self.progress is not None:
+			self.progress(freed.size, self._done, self._total)
+
+	def _get_stat(self, file_):
+		"""Return the (possibly cached) lstat info for file_, or None."""
+		try:
+			return self.file_stats[file_]
+		except KeyError:
+			pass
+		try:
+			statinfo = os.lstat(file_)
+		except EnvironmentError as er:
+			print( pp.error(
+				"Could not get stat info for:" + file_), file=sys.stderr)
+			print( pp.error("Error: %s" %str(er)), file=sys.stderr)
+			return None
+		self.file_stats[file_] = statinfo
+		return statinfo
+
+	def _display_size(self, file_, statinfo):
+		"""Return the size to show for file_, following symlinks."""
+		if not stat.S_ISLNK(statinfo.st_mode):
+			return statinfo.st_size
+		try:
+			return os.stat(file_).st_size
+		except EnvironmentError:
+			return 0
 
 	def _get_size(self, key):
 		"""Determine the total size for an entry (may be several files)."""
-		key_size = 0
-		for file_ in key:
-			#print file_
-			# get total size for an entry (may be several files, and
-			# links don't count
-			# ...get its statinfo
-			try:
-				statinfo = os.stat(file_)
-				if statinfo.st_nlink == 1:
-					key_size += statinfo.st_size
-			except EnvironmentError as er:
-				print( pp.error(
-					"Could not get stat info for:" + file_), file=sys.stderr)
-				print( pp.error("Error: %s" %str(er)), file=sys.stderr)
-		return key_size
+		# links don't count, hardlinked files are only counted
+		# when every link is part of the entry
+		stats = [self._get_stat(file_) for file_ in key]
+		return freed_size([statinfo for statinfo in stats
+			if statinfo is not None])
 
 	def _sort_keys(self, clean_dict):
 		"""Returns a list of sorted dictionary keys."""
@@ -116,34 +279,41 @@ class CleanUp(object):
 		clean_keys = sorted(clean_dict)
 		return clean_keys
 
-	def _clean_files(self, files, key, file_type):
-		"""File removal function."""
-		clean_size = 0
-		for file_ in files:
-			#print file_, type(file_)
-			# ...get its statinfo
-			try:
-				statinfo = os.stat(file_)
-			except EnvironmentError as er:
-				print( pp.error(
-					"Could not get stat info for:" + file_), file=sys.stderr)
-				print( pp.error(
-					"Error: %s" %str(er)), file=sys.stderr)
-			if self.controller(statinfo.st_size, key, file_, file_type):
-				# ... try to delete it.
-				try:
-					os.unlink(file_)
-					# only count size if successfully deleted and not a link
-					if statinfo.st_nlink == 1:
-						clean_size += statinfo.st_size
-				except EnvironmentError as er:
-					print( pp.error("Could not delete "+file_), file=sys.stderr)
-					print( pp.error("Error: %s" %str(er)), file=sys.stderr)
-		return clean_size
-
-
-
-
-
-
+	def _clean_files(self, clean_dict, clean_keys, file_type):
+		"""File removal function.
 
+		The controller is still consulted for each file in order, so
+		prompting is unchanged, while the approved files are unlinked by
+		a bounded pool of threads.  The running totals are reported to
+		self.progress as the deletions complete.
+		"""
+		freed = FreedSpace()
+		pool = ThreadPool(self.jobs)
+		self._done = 0
+		self._total = sum(len(clean_dict[key]) for key in clean_keys)
+		try:
+			pending = []
+			for key in clean_keys:
+				for file_ in clean_dict[key]:
+					statinfo = self._get_stat(file_)
+					if statinfo is None:
+						self._done += 1
+						continue
+					size = self._display_size(file_, statinfo)
+					if self.controller(size, key, file_, file_type):
+						# ... try to delete it.
+						pending.append((pool.apply_async(_unlink, (file_,)),
+							statinfo))
+					else:
+						self._done += 1
+					while pending and pending[0][0].ready():
+						self._collect(pending.pop(0), freed)
+			pool.close()
+			while pending:
+				self._collect(pending.pop(0), freed)
+			self._report(freed)
+		finally:
+			pool.terminate()
+			pool.join()
+		# only count size of successfully deleted files, once per inode
+		return freed.size
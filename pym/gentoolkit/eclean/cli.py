@@ -16,6 +16,7 @@ __productname__ = "eclean"
 __description__ = "A cleaning tool for Gentoo distfiles and binaries."
 
 
+import atexit
 import os
 import sys
 import re
@@ -30,8 +31,12 @@ from gentoolkit.eclean.search import (DistfilesSearch,
 	findPackages, port_settings, pkgdir)
 from gentoolkit.eclean.exclude import (parseExcludeFile,
 	ParseExcludeFileException)
+from gentoolkit.eclean.hosts import (exportInstalled, readHostsDir,
+	ParseHostsDirException)
+from gentoolkit.eclean.journal import DistfilesJournal
 from gentoolkit.eclean.clean import CleanUp
 from gentoolkit.eclean.output import OutputControl
+from gentoolkit.profiler import PROFILER
 #from gentoolkit.eclean.dbapi import Dbapi
 from gentoolkit.eprefix import EPREFIX
 
@@ -55,7 +60,7 @@ def printUsage(_error=None, help=None):
 	if not _error in ('actions', 'global-options', \
 			'packages-options', 'distfiles-options', \
 			'merged-packages-options', 'merged-distfiles-options', \
-			'time', 'size'):
+			'time', 'size', 'export'):
 		_error = None
 	if not _error and not help: help = 'all'
 	if _error == 'time':
@@ -75,6 +80,12 @@ def printUsage(_error=None, help=None):
 		print("For instance: \"10M\" is \"ten megabytes\", \"200K\" "+
 				"is \"two hundreds kilobytes\", etc.", file=out)
 		return
+	if _error == 'export':
+		print( pp.error("--export-installed can not be used with an action"),
+			file=out)
+		print( "It only writes the installed packages list, run the action"+
+				" separately.", file=out)
+		return
 	if _error in ('global-options', 'packages-options', 'distfiles-options', \
 			'merged-packages-options', 'merged-distfiles-options',):
 		print( pp.error("Wrong option on command line."), file=out)
@@ -117,12 +128,18 @@ def printUsage(_error=None, help=None):
 			"        - only keep the minimum for a reinstallation", file=out)
 		print( yellow(" -e, --exclude-file=<path>")+
 			" - path to the exclusion file", file=out)
+		print( yellow(" -E, --export-installed=<path>")+
+			" - write the installed packages list and exit", file=out)
 		print( yellow(" -i, --interactive")+
 			"        - ask confirmation before deletions", file=out)
 		print( yellow(" -n, --package-names")+
 			"      - protect all versions (when --destructive)", file=out)
 		print( yellow(" -p, --pretend")+
 			"            - only display what would be cleaned", file=out)
+		print( yellow("     --profile")+
+			"            - report where the time went", file=out)
+		print( yellow("     --profile-dump=<path>")+
+			" - also write cProfile stats to "+yellow("<path>"), file=out)
 		print( yellow(" -q, --quiet")+
 			"              - be as quiet as possible", file=out)
 		print( yellow(" -t, --time-limit=<time>")+
@@ -155,6 +172,14 @@ def printUsage(_error=None, help=None):
 				green("distfiles"),"action:", file=out)
 		print( yellow(" -f, --fetch-restricted")+
 			"   - protect fetch-restricted files (when --destructive)", file=out)
+		print( yellow(" -H, --hosts-dir=<dir>")+
+			"    - also protect packages listed in the exported", file=out)
+		print( "   "+"installed packages files of other hosts in "+
+				yellow("<dir>"), file=out)
+		print( yellow(" -I, --incremental")+
+			"        - re-use the classification of the previous run", file=out)
+		print( yellow("     --stream")+
+			"             - clean files as soon as they are found", file=out)
 		print( yellow(" -s, --size-limit=<size>")+
 			"  - don't delete distfiles bigger than "+yellow("<size>"), file=out)
 		print( "   "+yellow("<size>"), "is a size specification: "+
@@ -256,6 +281,14 @@ def parseArgs(options={}):
 			elif o in ("-e", "--exclude-file"):
 				print("cli --exclude option")
 				options['exclude-file'] = a
+			elif o in ("-E", "--export-installed"):
+				options['export-installed'] = a
+			elif o in ("-H", "--hosts-dir"):
+				options['hosts-dir'] = a
+			elif o in ("-I", "--incremental"):
+				options['incremental'] = True
+			elif o == "--stream":
+				options['stream'] = True
 			elif o in ("-n", "--package-names"):
 				options['package-names'] = True
 			elif o in ("-f", "--fetch-restricted"):
@@ -264,6 +297,11 @@ def parseArgs(options={}):
 				options['size-limit'] = parseSize(a)
 			elif o in ("-v", "--verbose") and not options['quiet']:
 					options['verbose'] = True
+			elif o == "--profile":
+				options['profile'] = True
+			elif o == "--profile-dump":
+				options['profile'] = True
+				options['profile-dump'] = a
 			else:
 				return_code = False
 		# sanity check of --destructive only options:
@@ -277,12 +315,14 @@ def parseArgs(options={}):
 
 	# here are the different allowed command line options (getopt args)
 	getopt_options = {'short':{}, 'long':{}}
-	getopt_options['short']['global'] = "CdDipqe:t:nhVv"
+	getopt_options['short']['global'] = "CdDipqe:E:t:nhVv"
 	getopt_options['long']['global'] = ["nocolor", "destructive",
 		"deprecated", "interactive", "pretend", "quiet", "exclude-file=",
-		"time-limit=", "package-names", "help", "version",  "verbose"]
-	getopt_options['short']['distfiles'] = "fs:"
-	getopt_options['long']['distfiles'] = ["fetch-restricted", "size-limit="]
+		"export-installed=", "time-limit=", "package-names", "help",
+		"version",  "verbose", "profile", "profile-dump="]
+	getopt_options['short']['distfiles'] = "fH:Is:"
+	getopt_options['long']['distfiles'] = ["fetch-restricted", "hosts-dir=",
+		"incremental", "size-limit=", "stream"]
 	getopt_options['short']['packages'] = ""
 	getopt_options['long']['packages'] = [""]
 	# set default options, except 'nocolor', which is set in main()
@@ -297,6 +337,12 @@ def parseArgs(options={}):
 	options['fetch-restricted'] = False
 	options['size-limit'] = 0
 	options['verbose'] = False
+	options['export-installed'] = None
+	options['hosts-dir'] = None
+	options['incremental'] = False
+	options['stream'] = False
+	options['profile'] = False
+	options['profile-dump'] = None
 	# if called by a well-named symlink, set the acction accordingly:
 	action = None
 	# temp print line to ensure it is the svn/branch code running, etc..
@@ -325,6 +371,11 @@ def parseArgs(options={}):
 		raise ParseArgsException(opts_mode+'-options')
 	# set options accordingly
 	optionSwitch(options,opts,action=action)
+	# exporting the installed packages list is an action of its own
+	if options['export-installed']:
+		if action or len(args):
+			raise ParseArgsException('export')
+		return 'export-installed'
 	# if action was already set, there should be no more args
 	if action and len(args):
 		raise ParseArgsException(opts_mode+'-options')
@@ -362,37 +413,90 @@ def doAction(action,options,exclude={}, output=None):
 		files_type = "distfiles"
 	saved = {}
 	deprecated = {}
+	file_stats = {}
 	# find files to delete, depending on the action
 	if not options['quiet']:
 		output.einfo("Building file list for "+action+" cleaning...")
 	if action == 'packages':
-		clean_me = findPackages(
-			options,
-			exclude=exclude,
-			destructive=options['destructive'],
-			package_names=options['package-names'],
-			time_limit=options['time-limit'],
-			pkgdir=pkgdir,
-			#port_dbapi=Dbapi(portage.db[portage.root]["porttree"].dbapi),
-			#var_dbapi=Dbapi(portage.db[portage.root]["vartree"].dbapi),
-		)
+		with PROFILER.phase("search"):
+			clean_me = findPackages(
+				options,
+				exclude=exclude,
+				destructive=options['destructive'],
+				package_names=options['package-names'],
+				time_limit=options['time-limit'],
+				pkgdir=pkgdir,
+				file_stats=file_stats,
+				#port_dbapi=Dbapi(portage.db[portage.root]["porttree"].dbapi),
+				#var_dbapi=Dbapi(portage.db[portage.root]["vartree"].dbapi),
+			)
 	else:
+		hosts_cpvs = None
+		if options['hosts-dir']:
+			try:
+				hosts_cpvs = readHostsDir(options['hosts-dir'],
+					options['verbose-output'])
+			except ParseHostsDirException as e:
+				print( pp.error(str(e)), file=sys.stderr)
+				print( pp.error(
+					"Invalid hosts directory: %s" % options['hosts-dir']),
+					file=sys.stderr)
+				sys.exit(1)
+		journal = None
+		if options['incremental']:
+			journal = DistfilesJournal()
+			if not journal.load():
+				options['verbose-output'](
+					"No usable journal found, doing a full classification")
 		# accept defaults
 		engine = DistfilesSearch(output=options['verbose-output'],
+			journal=journal,
 			#portdb=Dbapi(portage.db[portage.root]["porttree"].dbapi),
 			#var_dbapi=Dbapi(portage.db[portage.root]["vartree"].dbapi),
 		)
-		clean_me, saved, deprecated = engine.findDistfiles(
+		search_args = dict(
 			exclude=exclude,
 			destructive=options['destructive'],
 			fetch_restricted=options['fetch-restricted'],
 			package_names=options['package-names'],
 			time_limit=options['time-limit'],
 			size_limit=options['size-limit'],
-			deprecate = options['deprecated']
+			deprecate = options['deprecated'],
+			hosts_cpvs=hosts_cpvs
 		)
+		if options['stream']:
+			clean_me = None
+			candidates = engine.iterDistfiles(**search_args)
+		else:
+			with PROFILER.phase("search"):
+				clean_me, saved, deprecated = engine.findDistfiles(
+					**search_args)
+			file_stats = engine.file_stats
+	cleaner = CleanUp( output.progress_controller, file_stats,
+		progress=output.progress_totals)
+	# vocabulary for final message
+	if options['pretend']:
+		verb = "would be"
+	else:
+		verb = "were"
+	if clean_me is None:
+		# streaming mode, files are cleaned as soon as they are found
+		if options['pretend'] and not options['quiet']:
+			output.einfo("Here are the "+files_type+" that would be deleted:")
+		elif not options['quiet']:
+			output.einfo("Cleaning " + files_type  +" as they are found...")
+		# the search is done as the files are cleaned
+		with PROFILER.phase("clean"):
+			clean_size, num_files = cleaner.clean_stream(candidates,
+				pretend=options['pretend'])
+		saved, deprecated = engine.saved, engine.deprecated
+		if not options['quiet']:
+			if num_files:
+				output.total('normal', clean_size, num_files, verb, action)
+			else:
+				output.einfo("Your "+action+" directory was already clean.")
 	# actually clean files if something was found
-	if clean_me:
+	elif clean_me:
 		# verbose pretend message
 		if options['pretend'] and not options['quiet']:
 			output.einfo("Here are the "+files_type+" that would be deleted:")
@@ -400,19 +504,14 @@ def doAction(action,options,exclude={}, output=None):
 		elif not options['quiet']:
 			output.einfo("Cleaning " + files_type  +"...")
 		# do the cleanup, and get size of deleted files
-		cleaner = CleanUp( output.progress_controller)
-		if  options['pretend']:
-			clean_size = cleaner.pretend_clean(clean_me)
-		elif action in ['distfiles']:
-			clean_size = cleaner.clean_dist(clean_me)
-		elif action in ['packages']:
-			clean_size = cleaner.clean_pkgs(clean_me,
-				pkgdir)
-		# vocabulary for final message
-		if options['pretend']:
-			verb = "would be"
-		else:
-			verb = "were"
+		with PROFILER.phase("clean"):
+			if  options['pretend']:
+				clean_size = cleaner.pretend_clean(clean_me)
+			elif action in ['distfiles']:
+				clean_size = cleaner.clean_dist(clean_me)
+			elif action in ['packages']:
+				clean_size = cleaner.clean_pkgs(clean_me,
+					pkgdir)
 		# display freed space
 		if not options['quiet']:
 			output.total('normal', clean_size, len(clean_me), verb, action)
@@ -459,6 +558,20 @@ def main():
 		else:
 			printUsage(e.value)
 			sys.exit(2)
+	if options['profile']:
+		PROFILER.start(options['profile-dump'])
+		PROFILER.count_dbapi_calls()
+		# report however eclean exits from here on
+		atexit.register(PROFILER.finish)
+	if action == 'export-installed':
+		try:
+			exportInstalled(options['export-installed'])
+		except EnvironmentError as er:
+			print( pp.error("Could not write the installed packages list"),
+				file=sys.stderr)
+			print( pp.error("Error: %s" %str(er)), file=sys.stderr)
+			sys.exit(1)
+		sys.exit(0)
 	output = OutputControl(options)
 	options['verbose-output'] = lambda x: None
 	if not options['quiet']:
@@ -472,8 +585,9 @@ def main():
 			options['exclude-file'] = exclude_file
 	if 'exclude-file' in options:
 		try:
-			exclude = parseExcludeFile(options['exclude-file'],
-					options['verbose-output'])
+			with PROFILER.phase("exclude file"):
+				exclude = parseExcludeFile(options['exclude-file'],
+						options['verbose-output'])
 		except ParseExcludeFileException as e:
 			print( pp.error(str(e)), file=sys.stderr)
 			print( pp.error(
@@ -176,60 +176,166 @@ def cp_all(categories, portdb=portage.portdb ):
 		#print( "cp_all: new cps list=", cps)
 		return cps
 
+def _combine(patterns):
+	"""Compile a list of regular expression strings into a single
+	alternation, or return None if they can not be combined (e.g.
+	duplicate group names or inline flags).
+
+	The patterns must not have groups: a numbered backreference would
+	refer to the group of another alternative once they are combined.
+	"""
+	if not patterns:
+		return None
+	try:
+		return re.compile('|'.join('(?:%s)' % p for p in patterns))
+	except re.error:
+		return None
+
+# FILENAME_RE as one regex, the index of the first matching alternative
+# is given by the name of its last group: 'ver<index>'
+_FILENAME_ALT = re.compile('|'.join(
+	r.pattern.replace('?P<pkgname>', '?P<pkgname%d>' % i).replace(
+		'?P<ver>', '?P<ver%d>' % i)
+	for i, r in enumerate(FILENAME_RE)))
+
+
+def _split_filename(filename):
+	"""Returns the (pkgname, FILENAME_RE index) of filename
+	or (None, None) if no package name could be determined."""
+	found = _FILENAME_ALT.match(filename)
+	if not found:
+		return None, None
+	index = int(found.lastgroup[3:])
+	return found.group('pkgname%d' % index), index
+
+
+class ExcludeMatcher(object):
+	"""An exclusion dict compiled for fast repeated matching.
+
+	The category and package sets are frozen, the filename regular
+	expressions without groups are merged into one alternation (the
+	others are matched one by one), and the porttree
+	expansion of the excluded categories is done by a single, lazy
+	cp_all() pass shared by the cp and pkgname lookups.
+
+	@param exclude: an exclusion dict as returned by parseExcludeFile()
+	@param portdb: defaults to portage.portdb
+	"""
+
+	def __init__(self, exclude, portdb=None):
+		self.portdb = portdb
+		self.categories = frozenset(exclude.get('categories', ()))
+		self.packages = frozenset(exclude.get('packages', ()))
+		self.anti_packages = frozenset(exclude.get('anti-packages', ()))
+		filenames = exclude.get('filenames', {})
+		self.filenames = frozenset(filenames)
+		filename_res = list(filenames.values())
+		self._filename_re = _combine([r.pattern for r in filename_res
+			if not r.groups])
+		if self._filename_re is None:
+			self._filename_res = filename_res
+		else:
+			self._filename_res = [r for r in filename_res if r.groups]
+		self._cps = None
+		self._pkgnames = None
+
+	def __len__(self):
+		return (len(self.categories) + len(self.packages) +
+			len(self.anti_packages) + len(self.filenames))
+
+	@property
+	def cps(self):
+		"""frozenset of all the excluded cat/pkg's in the porttree"""
+		if self._cps is None:
+			cps = set(self.packages)
+			if self.categories:
+				# replace the following cp_all call with
+				# portage.portdb.cp_all([cat1, cat2])
+				# when it is available in all portage versions.
+				if self.portdb is None:
+					cps.update(cp_all(list(self.categories)))
+				else:
+					cps.update(cp_all(list(self.categories), self.portdb))
+			cps.difference_update(self.anti_packages)
+			self._cps = frozenset(cps)
+		return self._cps
+
+	@property
+	def pkgnames(self):
+		"""frozenset of the package names of all the excluded cp's"""
+		if self._pkgnames is None:
+			self._pkgnames = frozenset(cp.split('/')[1] for cp in self.cps)
+		return self._pkgnames
+
+	def match_cp(self, cp):
+		"""Checks whether a CP matches the exclusion rules."""
+		if cp in self.anti_packages:
+			return False
+		if cp in self.packages:
+			return True
+		return cp.split('/')[0] in self.categories
+
+	def match_filename(self, filename):
+		"""Checks whether a filename matches an exclusion file listing."""
+		if filename in self.filenames:
+			return True
+		if self._filename_re is not None and self._filename_re.match(filename):
+			return True
+		for file_re in self._filename_res:
+			if file_re.match(filename):
+				return True
+		return False
+
+	def match_pkgname(self, filename):
+		"""Checks whether the package name split out of a filename
+		is excluded."""
+		pkgname, index = _split_filename(filename)
+		return pkgname is not None and pkgname in self.pkgnames
+
+
+def _freeze(exclude):
+	"""Returns a hashable copy of the contents of an exclusion dict."""
+	return (frozenset(exclude.get('categories', ())),
+		frozenset(exclude.get('packages', ())),
+		frozenset(exclude.get('anti-packages', ())),
+		frozenset((name, r.pattern, r.flags)
+			for name, r in exclude.get('filenames', {}).items()))
+
+# the last compiled matcher, so the different actions and checks of a
+# run share the same expansion: [(frozen exclude, portdb, matcher)]
+_last_matcher = [None]
+
+def compileExclude(exclude, portdb=None):
+	"""Returns the ExcludeMatcher for an exclusion dict, re-using the
+	one of the previous call if the contents of the dict did not change.
+
+	@param exclude: an exclusion dict as returned by parseExcludeFile()
+	@param portdb: optional portdb to expand the categories with
+	@rtype: ExcludeMatcher
+	"""
+	key = _freeze(exclude)
+	cached = _last_matcher[0]
+	if cached is not None and cached[0] == key and cached[1] is portdb:
+		return cached[2]
+	matcher = ExcludeMatcher(exclude, portdb)
+	_last_matcher[0] = (key, portdb, matcher)
+	return matcher
+
 def exclDictExpand(exclude):
 	"""Returns a dictionary of all CP/CPV from porttree which match
 	the exclusion dictionary.
 	"""
-	d = {}
-	if 'categories' in exclude:
-		# replace the following cp_all call with
-		# portage.portdb.cp_all([cat1, cat2])
-		# when it is available in all portage versions.
-		cps = cp_all(exclude['categories'])
-		for cp in cps:
-			d[cp] = None
-	if 'packages' in exclude:
-		for cp in exclude['packages']:
-			d[cp] = None
-	if 'anti-packages' in exclude:
-		for cp in exclude['anti-packages']:
-			if cp in d:
-				del d[cp]
-	return d
+	return dict.fromkeys(compileExclude(exclude).cps)
 
 def exclDictMatchCP(exclude,pkg):
 	"""Checks whether a CP matches the exclusion rules."""
-	if 'anti-packages' in exclude and pkg in exclude['anti-packages']:
-		return False
-	if 'packages' in exclude and pkg in exclude['packages']:
-		return True
-	cat = pkg.split('/')[0]
-	if 'categories' in exclude and cat in exclude['categories']:
-		return True
-	return False
+	return compileExclude(exclude).match_cp(pkg)
 
 def exclDictExpandPkgname(exclude):
 	"""Returns a set of all pkgnames  from porttree which match
 	the exclusion dictionary.
 	"""
-	p = set()
-	if 'categories' in exclude:
-		# replace the following cp_all call with
-		# portage.portdb.cp_all([cat1, cat2])
-		# when it is available in all portage versions.
-		cps = cp_all(exclude['categories'])
-		for cp in cps:
-			pkgname = cp.split('/')[1]
-			p.add(pkgname)
-	if 'packages' in exclude:
-		for cp in exclude['packages']:
-			pkgname = cp.split('/')[1]
-			p.add(pkgname)
-	if 'anti-packages' in exclude:
-		for cp in exclude['anti-packages']:
-			if cp in p:
-				p.remove(cp)
-	return p
+	return compileExclude(exclude).pkgnames
 
 
 def exclMatchFilename(exclude_names, filename):
@@ -245,18 +351,12 @@ def exclMatchFilename(exclude_names, filename):
 
 	@rtype: bool
 	"""
-	found = False
-	index = 0
-	while not found and index < len(FILENAME_RE):
-		found = FILENAME_RE[index].match(filename)
-		index += 1
-	if not found:
+	pkgname, index = _split_filename(filename)
+	if pkgname is None:
 		dprint( "exclude", "exclMatchFilename: filename: " +\
 			"%s, Could not determine package name" %filename)
 		return False
-	pkgname = found.group('pkgname')
 	dprint("exclude", "exclMatchFilename: found pkgname = " +
 		"%s, %s, %d, %s" %(pkgname, str(pkgname in exclude_names),
-		index-1, filename))
+		index, filename))
 	return (pkgname in exclude_names)
-
@@ -0,0 +1,140 @@
+#!/usr/bin/python
+
+# Copyright 2003-2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""Support for sharing one DISTDIR between several hosts.
+
+Each host exports the list of its installed packages and of their
+distfiles with 'eclean --export-installed=<file>', the files are collected
+in a directory on the DISTDIR server and 'eclean distfiles --hosts-dir=<dir>'
+protects the distfiles of every package installed on any of those hosts,
+even when the server's tree no longer has their ebuilds.
+
+Each line of an exported list is a cpv, then a tab and the names of its
+distfiles separated by spaces.  Lines holding only a cpv, as written by
+older versions, have their distfiles looked up on the server.
+"""
+
+
+from __future__ import print_function
+
+
+import os
+import socket
+import sys
+
+import portage
+
+from gentoolkit.eclean.search import uri_filenames
+
+try:
+	intern = sys.intern
+except AttributeError:
+	# python-2.x builtin
+	pass
+
+
+class ParseHostsDirException(Exception):
+	"""For readHostsDir() -> main() communication.
+
+	@param value: Error message string
+	"""
+	def __init__(self, value):
+		self.value = value
+	def __str__(self):
+		return repr(self.value)
+
+
+def exportInstalled(filepath,
+		vardb=portage.db[portage.root]["vartree"].dbapi):
+	"""Write the list of installed cpv's and their distfile names,
+	one cpv per line.
+
+	@param filepath: file to write to, '-' for stdout
+	@param vardb: defaults to portage.db[portage.root]["vartree"].dbapi
+			can be overridden for tests.
+
+	@rtype: int
+	@return: number of cpv's written
+	"""
+	cpvs = sorted(vardb.cpv_all())
+	if filepath == '-':
+		file_ = sys.stdout
+	else:
+		file_ = open(filepath, "w")
+	try:
+		file_.write("# eclean installed packages: %s\n" % socket.gethostname())
+		for cpv in cpvs:
+			try:
+				src_uri = vardb.aux_get(cpv, ["SRC_URI"])[0]
+			except KeyError:
+				# the server will have to look it up
+				file_.write(cpv + "\n")
+				continue
+			file_.write(cpv + "\t" +
+				" ".join(sorted(set(uri_filenames(src_uri)))) + "\n")
+	finally:
+		if file_ is not sys.stdout:
+			file_.close()
+	return len(cpvs)
+
+
+def readHostsDir(dirpath, output):
+	"""Merge the installed package lists exported by several hosts.
+
+	The lists of a fleet of hosts mostly overlap, so every cpv and
+	filename string is interned and stored once in the resulting dict.
+
+	@param dirpath: directory holding one exported list per host
+	@param output: --verbose enabled output method or "lambda x: None"
+
+	@rtype: dict
+	@return: {cpv: frozenset of distfile names} of all installed cpv's,
+			None instead of the names if no host listed them
+	@raise ParseHostsDirException: in case of fatal error
+	"""
+	try:
+		hosts = sorted(os.listdir(dirpath))
+	except EnvironmentError as er:
+		raise ParseHostsDirException("Could not read hosts directory: " +
+			dirpath + " (" + str(er) + ")")
+	cpvs = {}
+	num_hosts = 0
+	for host in hosts:
+		filepath = os.path.join(dirpath, host)
+		if host.startswith('.') or not os.path.isfile(filepath):
+			continue
+		try:
+			file_ = open(filepath, "r")
+		except IOError:
+			raise ParseHostsDirException("Could not open host file: " +
+				filepath)
+		count = 0
+		linenum = 0
+		try:
+			for line in file_:
+				linenum += 1
+				if not line.strip() or line.lstrip()[0] == '#':
+					continue
+				cpv, sep, names = line.partition("\t")
+				cpv = cpv.strip()
+				if not portage.catpkgsplit(cpv):
+					raise ParseHostsDirException("Invalid cpv: " + cpv +
+						" in " + filepath + " @line # " + str(linenum))
+				cpv = intern(cpv)
+				if sep:
+					names = frozenset(intern(x) for x in names.split())
+					if cpvs.get(cpv):
+						names = names | cpvs[cpv]
+					cpvs[cpv] = names
+				elif cpv not in cpvs:
+					cpvs[cpv] = None
+				count += 1
+		finally:
+			file_.close()
+		num_hosts += 1
+		output("   - %d installed packages from host %s" % (count, host))
+	output("Hosts directory parsed. Found %d distinct packages on %d hosts"
+		% (len(cpvs), num_hosts))
+	return cpvs
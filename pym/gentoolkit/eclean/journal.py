@@ -0,0 +1,215 @@
+#!/usr/bin/python
+
+# Copyright 2003-2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""Journal of the previous distfiles classification.
+
+It keeps the SRC_URI of every protected cpv along with the signature of its
+ebuild, and the reverse index of distfile names to the cpv's owning them, so
+that an 'eclean distfiles --incremental' run only has to look up the ebuilds
+which changed since the last run.
+"""
+
+
+from __future__ import print_function
+
+
+import json
+import os
+import sys
+
+import portage
+
+import gentoolkit.pprinter as pp
+from gentoolkit.eprefix import EPREFIX
+
+
+JOURNAL_FILE = os.path.join(EPREFIX, 'var', 'cache', 'eclean',
+	'distfiles.journal')
+JOURNAL_VERSION = 1
+
+
+class DistfilesJournal(object):
+	"""Persistent classification of the DISTDIR entries.
+
+	@param filepath: path of the journal file
+	@param portdb: defaults to portage.portdb
+	"""
+
+	def __init__(self, filepath=JOURNAL_FILE, portdb=portage.portdb):
+		self.filepath = filepath
+		self.portdb = portdb
+		# previous run: {cpv: [signature, src_uri, deprecated]}
+		self.cpvs = {}
+		# previous run: {filename: [size, mtime, [cpv,...]]}
+		self.files = {}
+		self.eclasses = None
+		# this run
+		self._eclasses = self._eclass_signature()
+		self._signatures = {}
+		self._unchanged = set()
+		self._deprecated = set()
+
+	def load(self):
+		"""Read the journal, an unreadable or outdated journal is
+		silently treated as empty.
+
+		@rtype: bool
+		@return: True if a journal was loaded
+		"""
+		try:
+			file_ = open(self.filepath, "r")
+			try:
+				data = json.load(file_)
+			finally:
+				file_.close()
+		except (EnvironmentError, ValueError):
+			return False
+		if data.get('version') != JOURNAL_VERSION:
+			return False
+		self.eclasses = data.get('eclasses')
+		self.cpvs = data.get('cpvs', {})
+		self.files = data.get('files', {})
+		return True
+
+	def save(self, pkgs, owners, file_stats):
+		"""Write the classification of this run.
+
+		@param pkgs: {cpv: src_uri} of the protected packages
+		@param owners: {filename: set([cpv,...])} as returned by owners()
+		@param file_stats: {filepath: os.lstat()} of the DISTDIR entries
+
+		@rtype: bool
+		@return: True if the journal was written
+		"""
+		cpvs = {}
+		for cpv in pkgs:
+			if cpv in self._signatures:
+				signature = self._signatures[cpv]
+			else:
+				signature = self.signature(cpv)
+			cpvs[cpv] = [signature, pkgs[cpv], cpv in self._deprecated]
+		files = {}
+		for filename in owners:
+			if owners[filename]:
+				files[filename] = [None, None, sorted(owners[filename])]
+		for filepath in file_stats:
+			statinfo = file_stats[filepath]
+			entry = files.setdefault(os.path.basename(filepath),
+				[None, None, []])
+			entry[0] = statinfo.st_size
+			entry[1] = int(statinfo.st_mtime)
+		data = {
+			'version': JOURNAL_VERSION,
+			'eclasses': self._eclasses,
+			'cpvs': cpvs,
+			'files': files
+		}
+		tmp_path = self.filepath + '.new'
+		try:
+			dirname = os.path.dirname(self.filepath)
+			if dirname and not os.path.isdir(dirname):
+				os.makedirs(dirname)
+			file_ = open(tmp_path, "w")
+			try:
+				json.dump(data, file_)
+			finally:
+				file_.close()
+			os.rename(tmp_path, self.filepath)
+		except EnvironmentError as er:
+			print( pp.warn("Could not write the eclean journal: " +
+				self.filepath), file=sys.stderr)
+			print( pp.warn("Error: %s" %str(er)), file=sys.stderr)
+			return False
+		return True
+
+	def _eclass_signature(self):
+		"""Eclass changes may change any SRC_URI, so the content of the
+		eclass directories is part of every ebuild signature."""
+		signature = []
+		for tree in getattr(self.portdb, 'porttrees', []):
+			eclass_dir = os.path.join(tree, 'eclass')
+			try:
+				names = os.listdir(eclass_dir)
+			except EnvironmentError:
+				continue
+			latest = 0
+			for name in names:
+				try:
+					mtime = os.stat(os.path.join(eclass_dir, name)).st_mtime
+				except EnvironmentError:
+					continue
+				latest = max(latest, mtime)
+			signature.append([tree, len(names), int(latest)])
+		return signature
+
+	def signature(self, cpv):
+		"""Returns the [ebuild path, mtime] of cpv in the porttree,
+		or None if it is not available there."""
+		path = self.portdb.findname(cpv)
+		if not path:
+			return None
+		try:
+			mtime = os.stat(path).st_mtime
+		except EnvironmentError:
+			return None
+		return [path, int(mtime)]
+
+	def lookup(self, cpv):
+		"""Returns the journaled (src_uri, deprecated) of cpv if its
+		ebuild did not change since the last run, else None."""
+		signature = self.signature(cpv)
+		self._signatures[cpv] = signature
+		if cpv not in self.cpvs or self.eclasses != self._eclasses:
+			return None
+		old_signature, src_uri, deprecated = self.cpvs[cpv]
+		if old_signature != signature:
+			return None
+		self._unchanged.add(cpv)
+		if deprecated:
+			self._deprecated.add(cpv)
+		return src_uri, deprecated
+
+	def record(self, cpv, deprecated):
+		"""Record a cpv whose SRC_URI was looked up in this run."""
+		if deprecated:
+			self._deprecated.add(cpv)
+
+	def owners(self, pkgs, filenames):
+		"""Returns the {filename: set([cpv,...])} index of pkgs.
+
+		It is updated from the previous run's index, so only the
+		SRC_URI's of the cpv's which changed, appeared or disappeared
+		since then are parsed.
+
+		@param pkgs: {cpv: src_uri} of the protected packages
+		@param filenames: function returning the distfile names of
+				a SRC_URI string
+		"""
+		owners = {}
+		for filename in self.files:
+			owners[filename] = set(self.files[filename][2])
+		stale = [cpv for cpv in self.cpvs
+			if cpv not in pkgs or cpv not in self._unchanged]
+		for cpv in stale:
+			for filename in filenames(self.cpvs[cpv][1]):
+				if filename in owners:
+					owners[filename].discard(cpv)
+		fresh = [cpv for cpv in pkgs if cpv not in self._unchanged]
+		for cpv in fresh:
+			for filename in filenames(pkgs[cpv]):
+				owners.setdefault(filename, set()).add(cpv)
+		return owners
+
+	def changed_files(self, file_stats):
+		"""Returns the number of DISTDIR entries which appeared or
+		changed since the last run."""
+		changed = 0
+		for filepath in file_stats:
+			statinfo = file_stats[filepath]
+			entry = self.files.get(os.path.basename(filepath))
+			if (entry is None or entry[0] != statinfo.st_size or
+					entry[1] != int(statinfo.st_mtime)):
+				changed += 1
+		return changed
@@ -32,6 +32,8 @@ class OutputControl(object):
 		else:
 			self.options = options
 		self.set_colors("normal")
+		# a progress_totals status line is on the terminal
+		self._status_shown = False
 
 	def set_colors(self, mode):
 		"""Sets the colors for the progress_controller
@@ -135,6 +137,7 @@ class OutputControl(object):
 		@param key: the filename/pkgname currently being processed
 		@param clean_list: list of files being processed.
 		"""
+		self.clear_status()
 		if not self.options['quiet']:
 			# pretty print mode
 			print(self.prettySize(size,True), self.pkg_color(key))
@@ -150,6 +153,48 @@ class OutputControl(object):
 			return True
 		return False
 
+	def clear_status(self):
+		"""Erase the progress_totals status line, so other output does
+		not get mixed with it."""
+		if self._status_shown:
+			sys.stderr.write("\r\x1b[K")
+			sys.stderr.flush()
+			self._status_shown = False
+
+	def progress_totals(self, size, done, total):
+		"""Callback function for the deletions of CleanUp. It keeps a
+		status line of the files deleted and the space freed so far on
+		stderr, when it is a terminal and nothing is asked to the user.
+		The line is erased before any other output, and once every file
+		is done.
+
+		@param size: Integer of the bytes freed so far
+		@param done: number of files handled so far
+		@param total: number of files to handle, or None if not known yet
+		"""
+		if self.options['quiet'] or self.options['interactive'] \
+			or not sys.stderr.isatty():
+			return
+		# redrawing the line for each of thousands of files is slow
+		if total is None:
+			step = 100
+		else:
+			step = max(1, total // 100)
+		if done % step and done != total:
+			return
+		if total is None:
+			count = str(done)
+		else:
+			count = "%d/%d" % (done, total)
+		if done == total:
+			self.clear_status()
+			return
+		sys.stdout.flush()
+		sys.stderr.write("\r\x1b[K" + self.prettySize(size, True) +
+			" freed, " + count + " files done")
+		sys.stderr.flush()
+		self._status_shown = True
+
 	def total(self, mode, size, num_files, verb, action):
 		"""outputs the formatted totals to stdout
 
@@ -159,6 +204,7 @@ class OutputControl(object):
 		@param verb: string eg. 1 of ["would be", "has been"]
 		@param action: string eg 1 of ['distfiles', 'packages']
 		"""
+		self.clear_status()
 		self.set_colors(mode)
 		if mode =="normal":
 			message="Total space from "+red(str(num_files))+" files "+\
@@ -17,8 +17,8 @@ import portage
 
 import gentoolkit
 import gentoolkit.pprinter as pp
-from gentoolkit.eclean.exclude import (exclDictMatchCP, exclDictExpand,
-	exclDictExpandPkgname, exclMatchFilename)
+from gentoolkit.eclean.exclude import (exclDictExpand,
+	exclDictExpandPkgname, exclMatchFilename, compileExclude)
 
 
 # Misc. shortcuts to some portage stuff:
@@ -38,6 +38,25 @@ def dprint(module, message):
 		print(message)
 
 
+def uri_filenames(src_uri):
+	"""Yields the distfile names of a SRC_URI string."""
+	uris = src_uri.split()
+	uris.reverse()
+	while uris:
+		uri = uris.pop()
+		if uris and uris[-1] == "->":
+			operator = uris.pop()
+			yield uris.pop()
+		else:
+			yield os.path.basename(uri)
+
+
+def _unlisted_cpvs(hosts_cpvs):
+	"""Returns the cpv's of hosts_cpvs whose distfile names are not
+	known and have to be looked up."""
+	return [cpv for cpv in hosts_cpvs if hosts_cpvs[cpv] is None]
+
+
 def get_distdir():
 	"""Returns DISTDIR if sane, else barfs."""
 
@@ -60,17 +79,25 @@ class DistfilesSearch(object):
 		@param vardb: defaults to portage.db[portage.root]["vartree"].dbapi
 					is overridden for testing.
 		@param portdb: defaults to portage.portdb and is overriden for testing.
+		@param journal: optional journal.DistfilesJournal of the previous
+					run, used to only look up the ebuilds which changed.
 """
 
 	def __init__(self,
 			output,
 			portdb=portage.portdb,
 			vardb=portage.db[portage.root]["vartree"].dbapi,
+			journal=None
 			):
+		self.journal = journal
 		self.vardb =vardb
 		self.portdb = portdb
 		self.output = output
 		self.installed_cpvs = None
+		# distfiles of the other hosts' packages, as they exported them
+		self.hosts_filenames = frozenset()
+		# lstat() results of the files to clean, re-used by CleanUp
+		self.file_stats = {}
 
 	def findDistfiles(self,
 			exclude=None,
@@ -81,7 +108,8 @@ class DistfilesSearch(object):
 			size_limit=0,
 			_distdir=distdir,
 			deprecate=False,
-			extra_checks=()
+			extra_checks=(),
+			hosts_cpvs=None
 			):
 		"""Find all obsolete distfiles.
 
@@ -97,6 +125,10 @@ class DistfilesSearch(object):
 		@param size_limit: integer value of max. file size to keep or 0 to ignore.
 		@param _distdir: path to the distfiles dir being checked, defaults to portage.
 		@param deprecate: bool to control checking the clean dict. files for exclusion
+		@param hosts_cpvs: optional {cpv: distfile names} of the packages
+				installed on other hosts sharing this DISTDIR, as returned
+				by hosts.readHostsDir().  The names are protected as they
+				are, the cpv's without names are looked up like the local ones.
 
 		@rtype: dict
 		@return dict. of package files to clean i.e. {'cat/pkg-ver.tbz2': [filename],}
@@ -104,22 +136,9 @@ class DistfilesSearch(object):
 		if exclude is None:
 			exclude = {}
 		clean_me = {}
-		pkgs = {}
 		saved = {}
-		deprecated = {}
-		installed_included = False
-		# create a big CPV->SRC_URI dict of packages
-		# whose distfiles should be kept
-		if (not destructive) or fetch_restricted:
-			self.output("...non-destructive type search")
-			pkgs, _deprecated = self._non_destructive(destructive, fetch_restricted)
-			deprecated.update(_deprecated)
-			installed_included = True
-		if destructive:
-			self.output("...destructive type search: %d packages already found" %len(pkgs))
-			pkgs, _deprecated = self._destructive(package_names,
-					exclude, pkgs, installed_included)
-			deprecated.update(_deprecated)
+		pkgs, deprecated = self._get_pkgs(exclude, destructive,
+			fetch_restricted, package_names, hosts_cpvs)
 		# gather the files to be cleaned
 		self.output("...checking limits for %d ebuild sources"
 				%len(pkgs))
@@ -130,7 +149,12 @@ class DistfilesSearch(object):
 		# remove any protected files from the list
 		self.output("...removing protected sources from %s candidates to clean"
 				%len(clean_me))
-		clean_me = self._remove_protected(pkgs, clean_me)
+		if self.journal is None:
+			clean_me = self._remove_protected(pkgs, clean_me)
+		else:
+			clean_me = self._remove_journaled(pkgs, clean_me)
+		for file in self.hosts_filenames:
+			clean_me.pop(file, None)
 		if not deprecate and len(exclude) and len(clean_me):
 			self.output("...checking final for exclusion from " +\
 				"%s remaining candidates to clean" %len(clean_me))
@@ -138,6 +162,130 @@ class DistfilesSearch(object):
 		return clean_me, saved, deprecated
 
 
+	def iterDistfiles(self,
+			exclude=None,
+			destructive=False,
+			fetch_restricted=False,
+			package_names=False,
+			time_limit=0,
+			size_limit=0,
+			_distdir=distdir,
+			deprecate=False,
+			extra_checks=(),
+			hosts_cpvs=None
+			):
+		"""Streaming version of findDistfiles().
+
+		The SRC_URI's of the protected packages are reduced to a set of
+		filenames first, then each DISTDIR entry goes through the limit
+		checks, the protection and the exclusion checks and is yielded
+		as soon as it is known to be obsolete, so memory use does not
+		grow with the number of files to clean.
+
+		The parameters are the same as for findDistfiles().  Once the
+		generator is exhausted, the files saved by the exclusion file and
+		the deprecated packages are available as self.saved and
+		self.deprecated, and the journal, if any, is saved with the
+		lstat() results of the entries which passed the limit checks.
+
+		@rtype: generator
+		@return: (filename, [filepath], [os.lstat() result]) tuples
+		"""
+		if exclude is None:
+			exclude = {}
+		self.saved = {}
+		pkgs, self.deprecated = self._get_pkgs(exclude, destructive,
+			fetch_restricted, package_names, hosts_cpvs)
+		journal_stats = None
+		if self.journal is None:
+			protected = self._protected_filenames(pkgs)
+			del pkgs
+		else:
+			# the journal is saved once the whole DISTDIR has been seen
+			owners = self.journal.owners(pkgs, uri_filenames)
+			protected = frozenset(file for file in owners if owners[file])
+			journal_stats = {}
+		protected = protected | self.hosts_filenames
+		self.output("...checking %d protected source files" % len(protected))
+		checks = self._get_default_checks(size_limit, time_limit, exclude)
+		checks.extend(extra_checks)
+		pn_excludes = None
+		if not deprecate and len(exclude):
+			pn_excludes = exclDictExpandPkgname(exclude)
+		for file in os.listdir(_distdir):
+			if file in protected and journal_stats is None:
+				continue
+			filepath = os.path.join(_distdir, file)
+			try:
+				file_stat = os.lstat(filepath)
+			except EnvironmentError:
+				continue
+			is_dirty = False
+			for check in checks:
+				should_break, is_dirty = check(file_stat, file)
+				if should_break:
+					break
+			if not is_dirty:
+				continue
+			if journal_stats is not None:
+				# same entries as the file_stats of findDistfiles()
+				journal_stats[filepath] = file_stat
+				if file in protected:
+					continue
+			if pn_excludes and exclMatchFilename(pn_excludes, file):
+				self.saved[file] = [filepath]
+				self.output("   ...Saved excluded package filename: " + file)
+				continue
+			yield file, [filepath], [file_stat]
+		if journal_stats is not None:
+			self.output("   - %d new or changed files since the last run"
+				% self.journal.changed_files(journal_stats))
+			self.journal.save(pkgs, owners, journal_stats)
+
+	def _get_pkgs(self,
+			exclude,
+			destructive,
+			fetch_restricted,
+			package_names,
+			hosts_cpvs
+			):
+		"""Create a big CPV->SRC_URI dict of packages
+		whose distfiles should be kept
+
+		@returns packages and thier SRC_URI's: {cpv: src_uri,}
+				and the deprecated ones
+		@rtype: tuple of dictionaries
+		"""
+		pkgs = {}
+		deprecated = {}
+		installed_included = False
+		self.hosts_filenames = frozenset()
+		if hosts_cpvs:
+			self.hosts_filenames = frozenset(file for cpv in hosts_cpvs
+				if hosts_cpvs[cpv] for file in hosts_cpvs[cpv])
+			self.output("...%d source files of other hosts' packages"
+				% len(self.hosts_filenames))
+		if (not destructive) or fetch_restricted:
+			self.output("...non-destructive type search")
+			pkgs, _deprecated = self._non_destructive(destructive,
+					fetch_restricted, hosts_cpvs=hosts_cpvs)
+			deprecated.update(_deprecated)
+			installed_included = True
+		if destructive:
+			self.output("...destructive type search: %d packages already found" %len(pkgs))
+			pkgs, _deprecated = self._destructive(package_names,
+					exclude, pkgs, installed_included, hosts_cpvs)
+			deprecated.update(_deprecated)
+		return pkgs, deprecated
+
+	def _protected_filenames(self, pkgs):
+		"""Returns the frozenset of all the filenames owned by pkgs."""
+		protected = set()
+		for cpv in pkgs:
+			protected.update(uri_filenames(pkgs[cpv]))
+		return frozenset(protected)
+
+
 ####################### begin _check_limits code block
 
 	def _get_default_checks(self, size_limit, time_limit, excludes):
@@ -145,7 +293,8 @@ class DistfilesSearch(object):
 		checks =[self._isreg_check_]
 		if 'filenames' in excludes:
 			#checks.append((partial(self._filenames_check_, excludes), "Filenames_check"))
-			checks.append(partial(self._filenames_check_, excludes))
+			checks.append(partial(self._filenames_check_,
+				compileExclude(excludes)))
 		else:
 			self.output("   - skipping exclude filenames check")
 		if size_limit:
@@ -190,6 +339,7 @@ class DistfilesSearch(object):
 			if is_dirty:
 				#print( "%s Adding file to clean_list:" %check_name, file)
 				clean_me[file]=[filepath]
+				self.file_stats[filepath] = file_stat
 		return clean_me
 
 	@staticmethod
@@ -217,19 +367,13 @@ class DistfilesSearch(object):
 		return False, True
 
 	@staticmethod
-	def _filenames_check_(exclude, file_stat, file):
-		"""checks if the file matches an exclusion file listing"""
-		# Try to match file name directly
-		if file in exclude['filenames']:
-			return True, False
-		# See if file matches via regular expression matching
-		else:
-			file_match = False
-			for file_entry in exclude['filenames']:
-				if exclude['filenames'][file_entry].match(file):
-					file_match = True
-					break
-		if file_match:
+	def _filenames_check_(matcher, file_stat, file):
+		"""checks if the file matches an exclusion file listing
+
+		@param matcher: the ExcludeMatcher of the exclusion dict
+		"""
+		# direct file name or combined regular expression matching
+		if matcher.match_filename(file):
 			#print( "filename match ", file)
 			return True, False
 		return False, True
@@ -247,15 +391,7 @@ class DistfilesSearch(object):
 		@rtype: dictionary
 		"""
 		for cpv in pkgs:
-			uris = pkgs[cpv].split()
-			uris.reverse()
-			while uris:
-				uri = uris.pop()
-				if uris and uris[-1] == "->":
-					operator = uris.pop()
-					file = uris.pop()
-				else:
-					file = os.path.basename(uri)
+			for file in uri_filenames(pkgs[cpv]):
 				if file in clean_me:
 					del clean_me[file]
 			# no need to waste IO time if there is nothing left to clean
@@ -263,6 +399,22 @@ class DistfilesSearch(object):
 				return clean_me
 		return clean_me
 
+	def _remove_journaled(self, pkgs, clean_me):
+		"""Remove files owned by some protected packages using the
+		journal's filename index, then save this run's classification.
+
+		@returns packages to clean
+		@rtype: dictionary
+		"""
+		self.output("   - %d new or changed files since the last run"
+			% self.journal.changed_files(self.file_stats))
+		owners = self.journal.owners(pkgs, uri_filenames)
+		for file in list(clean_me):
+			if owners.get(file):
+				del clean_me[file]
+		self.journal.save(pkgs, owners, self.file_stats)
+		return clean_me
+
 	def _non_destructive(self,
 			destructive,
 			fetch_restricted,
@@ -290,10 +442,12 @@ class DistfilesSearch(object):
 		installed_cpvs = set(self.vardb.cpv_all())
 		# now add any installed cpv's that are not in the tree or overlays
 		cpvs.update(installed_cpvs)
-		# Add any installed cpvs from hosts on the network, if any
+		# Add any installed cpvs from hosts on the network, if any,
+		# which did not list their source files
 		if hosts_cpvs:
-			cpvs.update(hosts_cpvs)
-			installed_cpvs.update(hosts_cpvs)
+			unlisted = _unlisted_cpvs(hosts_cpvs)
+			cpvs.update(unlisted)
+			installed_cpvs.update(unlisted)
 		if fetch_restricted and destructive:
 			self.output("   - getting source file names " +
 				"for %d installed ebuilds" %len(installed_cpvs))
@@ -366,15 +520,29 @@ class DistfilesSearch(object):
 		else:
 			pkgs = pkgs_.copy()
 		deprecated = {}
+		journal = self.journal
 		for cpv in cpvs:
+			# re-use the SRC_URI of unchanged ebuilds from the journal
+			if journal is not None:
+				journaled = journal.lookup(cpv)
+				if journaled is not None:
+					pkgs[cpv] = journaled[0]
+					if journaled[1]:
+						deprecated[cpv] = pkgs[cpv]
+						self.output(DEPRECATED %cpv)
+					continue
 			# get SRC_URI from aux_get
 			try:
 				pkgs[cpv] = self.portdb.aux_get(cpv,["SRC_URI"])[0]
+				if journal is not None:
+					journal.record(cpv, False)
 			except KeyError:
 				try: # installed vardb
 					pkgs[cpv] = self.vardb.aux_get(cpv,["SRC_URI"])[0]
 					deprecated[cpv] = pkgs[cpv]
 					self.output(DEPRECATED %cpv)
+					if journal is not None:
+						journal.record(cpv, True)
 				except KeyError:
 					self.output("   - Key Error looking up: " + cpv)
 		return pkgs, deprecated
@@ -383,7 +551,8 @@ class DistfilesSearch(object):
 			package_names,
 			exclude,
 			pkgs_=None,
-			installed_included=False
+			installed_included=False,
+			hosts_cpvs=None
 			):
 		"""Builds on pkgs according to input options
 
@@ -394,6 +563,8 @@ class DistfilesSearch(object):
 				defaults to {}.
 		@param installed_included: bool. pkgs already
 				has the installed cpv's added.
+		@param hosts_cpvs: optional {cpv: distfile names} of the packages
+				installed on other hosts
 
 		@returns pkgs: {cpv: src_uri,}
 		"""
@@ -411,11 +582,15 @@ class DistfilesSearch(object):
 					pkgset.update(self.vardb.cpv_all())
 				else:
 					pkgset.update(self.installed_cpvs)
+				if hosts_cpvs:
+					pkgset.update(_unlisted_cpvs(hosts_cpvs))
 				self.output("   - processing %s installed ebuilds" % len(pkgset))
 			elif package_names:
 				# list all CPV's from portree for CP's in vartree
 				#print( "_destructive: getting vardb.cp_all")
-				cps = self.vardb.cp_all()
+				cps = set(self.vardb.cp_all())
+				if hosts_cpvs:
+					cps.update(portage.cpv_getkey(cpv) for cpv in hosts_cpvs)
 				self.output("   - processing %s installed packages" % len(cps))
 				for package in cps:
 					pkgset.update(self.portdb.cp_list(package))
@@ -486,7 +661,8 @@ def findPackages(
 		package_names=False,
 		pkgdir=None,
 		port_dbapi=portage.db[portage.root]["porttree"].dbapi,
-		var_dbapi=portage.db[portage.root]["vartree"].dbapi
+		var_dbapi=portage.db[portage.root]["vartree"].dbapi,
+		file_stats=None
 	):
 	"""Find all obsolete binary packages.
 
@@ -506,6 +682,8 @@ def findPackages(
 					can be overridden for tests.
 	@param var_dbapi: defaults to portage.db[portage.root]["vartree"].dbapi
 					can be overridden for tests.
+	@param file_stats: optional dict filled with {filepath: os.lstat()}
+			for every file returned, to be re-used by CleanUp
 
 	@rtype: dict
 	@return clean_me i.e. {'cat/pkg-ver.tbz2': [filepath],}
@@ -540,6 +718,8 @@ def findPackages(
 				continue
 			# dict is cpv->[files] (2 files in general, because of symlink)
 			clean_me[cpv] = [path]
+			if file_stats is not None:
+				file_stats[path] = st
 			#if os.path.islink(path):
 			if stat.S_ISLNK(st[stat.ST_MODE]):
 				clean_me[cpv].append(os.path.realpath(path))
@@ -553,8 +733,9 @@ def findPackages(
 	else:
 		dbapi = port_dbapi
 		cp_all = {}
+	exclude_matcher = compileExclude(exclude)
 	for cpv in list(clean_me):
-		if exclDictMatchCP(exclude,portage.cpv_getkey(cpv)):
+		if exclude_matcher.match_cp(portage.cpv_getkey(cpv)):
 			# exclusion because of the exclude file
 			del clean_me[cpv]
 			continue
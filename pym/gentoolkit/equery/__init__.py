@@ -11,7 +11,10 @@ from __future__ import print_function
 __all__ = (
 	'format_options',
 	'format_package_names',
-	'mod_usage'
+	'mod_usage',
+	'package_record',
+	'PACKAGE_FIELDS',
+	'record_writer'
 )
 __docformat__ = 'epytext'
 # version is dynamically set by distutils sdist
@@ -33,6 +36,8 @@ import gentoolkit
 from gentoolkit import CONFIG
 from gentoolkit import errors
 from gentoolkit import pprinter as pp
+from gentoolkit.formatters import RecordWriter, RECORD_FORMATS
+from gentoolkit.profiler import PROFILER
 from gentoolkit.textwrap_ import TextWrapper
 
 __productname__ = "equery"
@@ -62,6 +67,12 @@ NAME_MAP = {
 	'w': 'which'
 }
 
+# Fields of the records written by package_record
+PACKAGE_FIELDS = ('cpv', 'slot', 'repo', 'location', 'mask')
+
+# The RecordWriter of the running module, see record_writer
+_record_writer = None
+
 # =========
 # Functions
 # =========
@@ -82,7 +93,13 @@ def print_help(with_description=True):
 		(" -q, --quiet", "minimal output"),
 		(" -C, --no-color", "turn off colors"),
 		(" -N, --no-pipe", "turn off pipe detection"),
-		(" -V, --version", "display version info")
+		(" -V, --version", "display version info"),
+		("     --format=FMT", "output records for other programs, " +
+			"one of: " + ', '.join(RECORD_FORMATS) + " (belongs, files, " +
+			"has, hasuse, list, size, uses and which)"),
+		("     --profile", "report where the time went on stderr"),
+		("     --profile-dump=FILE", "also write cProfile stats to FILE " +
+			"(implies --profile)")
 	)))
 	print()
 	print(pp.command("modules") + " (" + pp.command("short name") + ")")
@@ -196,6 +213,49 @@ def format_filetype(path, fdesc, show_type=False, show_md5=False,
 	return result
 
 
+def package_record(pkgstr):
+	"""Return the values of L{PACKAGE_FIELDS} for a package.
+
+	@type pkgstr: L{gentoolkit.package.PackageFormatter}
+	@param pkgstr: formatter of the package, never turned into a string
+	@rtype: tuple
+	@return: (cpv, slot, repository, location, masking status), where the
+		masking status is the list given by portage.getmaskingstatus, or
+		None if the ebuild does not exist on the system anymore
+	"""
+
+	pkg = pkgstr.pkg
+	mask_int, masking_status = pkgstr.format_mask_status()
+	if mask_int == 6:
+		masking_status = None
+	return (str(pkg.cpv), pkg.environment("SLOT"), pkg.repo_name(),
+		pkgstr.location, masking_status)
+
+
+def record_writer(fields):
+	"""Return a writer of records for the --format given to equery.
+
+	@type fields: tuple
+	@param fields: the names of the values of a record
+	@rtype: L{gentoolkit.formatters.RecordWriter} or None
+	@return: None if the output is for humans
+	"""
+
+	global _record_writer
+	if CONFIG['format'] is None:
+		return None
+	flush_records()
+	_record_writer = RecordWriter(CONFIG['format'], fields)
+	return _record_writer
+
+
+def flush_records():
+	"""Write out the records still buffered by the running module."""
+
+	if _record_writer is not None:
+		_record_writer.flush()
+
+
 def format_timestamp(timestamp):
 	"""Format a timestamp into, e.g., '2009-01-31 21:19:44' format"""
 
@@ -260,8 +320,7 @@ def parse_global_options(global_opts, args):
 	"""
 
 	need_help = False
-	opts = (opt[0] for opt in global_opts)
-	for opt in opts:
+	for opt, posarg in global_opts:
 		if opt in ('-h', '--help'):
 			if args:
 				need_help = True
@@ -280,6 +339,21 @@ def parse_global_options(global_opts, args):
 			sys.exit(0)
 		elif opt in ('--debug'):
 			CONFIG['debug'] = True
+		elif opt == '--format':
+			if posarg not in RECORD_FORMATS:
+				sys.stderr.write(pp.error("Unknown format '%s'" % posarg))
+				print_help(with_description=False)
+				sys.exit(2)
+			# Records are for other programs: no colors, headers or progress
+			CONFIG['format'] = posarg
+			CONFIG['color'] = 0
+			CONFIG['quiet'] = True
+			pp.output.nocolor()
+		elif opt == '--profile':
+			CONFIG['profile'] = True
+		elif opt == '--profile-dump':
+			CONFIG['profile'] = True
+			CONFIG['profile_dump'] = posarg
 
 	return need_help
 
@@ -305,7 +379,8 @@ def main():
 
 	short_opts = "hqCNV"
 	long_opts = (
-		'help', 'quiet', 'nocolor', 'no-color', 'no-pipe', 'version', 'debug'
+		'help', 'quiet', 'nocolor', 'no-color', 'no-pipe', 'version', 'debug',
+		'format=', 'profile', 'profile-dump='
 	)
 
 	initialize_configuration()
@@ -342,11 +417,19 @@ def main():
 		print_help(with_description=False)
 		sys.exit(2)
 
+	if CONFIG['profile']:
+		PROFILER.start(CONFIG['profile_dump'])
+		PROFILER.count_dbapi_calls()
+
 	try:
 		loaded_module = __import__(
 			expanded_module_name, globals(), locals(), [], -1
 		)
-		loaded_module.main(module_args)
+		try:
+			loaded_module.main(module_args)
+		finally:
+			flush_records()
+			PROFILER.finish()
 	except portage.exception.AmbiguousPackageName as err:
 		raise errors.GentoolkitAmbiguousPackage(err.args[0])
 	except IOError as err:
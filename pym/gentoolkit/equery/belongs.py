@@ -23,7 +23,7 @@ from getopt import gnu_getopt, GetoptError
 
 import gentoolkit.pprinter as pp
 from gentoolkit.equery import (format_filetype, format_options, mod_usage,
-	CONFIG)
+	record_writer, CONFIG)
 from gentoolkit.helpers import FileOwner
 
 # =======
@@ -43,13 +43,16 @@ QUERY_OPTS = {
 class BelongsPrinter(object):
 	"""Outputs a formatted list of packages that claim to own a files."""
 
-	def __init__(self, verbose=True, name_only=False):
-		if verbose:
+	def __init__(self, verbose=True, name_only=False, writer=None):
+		if writer is not None:
+			self.print_fn = self.print_record
+		elif verbose:
 			self.print_fn = self.print_verbose
 		else:
 			self.print_fn = self.print_quiet
 
 		self.name_only = name_only
+		self.writer = writer
 
 	def __call__(self, pkg, cfile):
 		self.print_fn(pkg, cfile)
@@ -73,6 +76,14 @@ class BelongsPrinter(object):
 			name = str(pkg.cpv)
 		pp.uprint(pp.cpv(name), "(" + file_str + ")")
 
+	def print_record(self, pkg, cfile):
+		"Write a record with the package (cat/pkg with -n) and the file."
+		if self.name_only:
+			name = pkg.cp
+		else:
+			name = str(pkg.cpv)
+		self.writer.write(name, cfile)
+
 # =========
 # Functions
 # =========
@@ -144,8 +155,14 @@ def main(input_args):
 			pp.regexpquery(",".join(queries)))
 		)
 
+	if QUERY_OPTS['name_only']:
+		writer = record_writer(('cp', 'path'))
+	else:
+		writer = record_writer(('cpv', 'path'))
+
 	printer_fn = BelongsPrinter(
-		verbose=CONFIG['verbose'], name_only=QUERY_OPTS['name_only']
+		verbose=CONFIG['verbose'], name_only=QUERY_OPTS['name_only'],
+		writer=writer
 	)
 
 	find_owner = FileOwner(
@@ -24,6 +24,7 @@ import portage.checksum as checksum
 import gentoolkit.pprinter as pp
 from gentoolkit import errors
 from gentoolkit.equery import format_options, mod_usage, CONFIG
+from gentoolkit.profiler import PROFILER
 from gentoolkit.query import Query
 
 # =======
@@ -77,7 +78,8 @@ class VerifyContents(object):
 		result = {}
 		for pkg in pkgs:
 			# _run_checks returns tuple(n_passed, n_checked, err)
-			check_results = self._run_checks(pkg.parsed_contents())
+			with PROFILER.phase("package work"):
+				check_results = self._run_checks(pkg.parsed_contents())
 			result[pkg.cpv] = check_results
 			if self.printer_fn is not None:
 				self.printer_fn(pkg.cpv, check_results)
@@ -144,6 +146,7 @@ class VerifyContents(object):
 		if self.check_sums:
 			md5sum = files[cfile][2]
 			try:
+				PROFILER.count("files hashed")
 				cur_checksum = checksum.perform_md5(cfile, calc_prelink=1)
 			except IOError:
 				err = "Insufficient permissions to read %(cfile)s"
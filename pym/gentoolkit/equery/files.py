@@ -22,7 +22,7 @@ import portage
 
 import gentoolkit.pprinter as pp
 from gentoolkit.equery import (format_filetype, format_options, mod_usage,
-	CONFIG)
+	record_writer, CONFIG)
 from gentoolkit.query import Query
 
 # =======
@@ -46,6 +46,9 @@ FILTER_RULES = (
 	'dir', 'obj', 'sym', 'dev', 'path', 'conf', 'cmd', 'doc', 'man', 'info'
 )
 
+# Fields of the records written by write_records
+FILE_FIELDS = ('cpv', 'path', 'type', 'timestamp', 'md5', 'target')
+
 # =========
 # Functions
 # =========
@@ -132,6 +135,32 @@ def display_files(contents):
 			))
 
 
+def write_records(writer, pkg, contents):
+	"""Write a record for each file of an installed package.
+
+	@see: gentoolkit.package.Package.parsed_contents
+	@type writer: L{gentoolkit.formatters.RecordWriter}
+	@param writer: writer of records with the L{FILE_FIELDS}
+	@type pkg: L{gentoolkit.package.Package}
+	@param pkg: the package owning the files
+	@type contents: dict
+	@param contents: {'path': ['filetype', ...], ...}
+	"""
+
+	cpv = str(pkg.cpv)
+	for name in sorted(contents):
+		fdesc = contents[name]
+		ftype = fdesc[0]
+		timestamp = md5sum = target = None
+		if ftype == "obj":
+			timestamp = int(fdesc[1])
+			md5sum = fdesc[2]
+		elif ftype == "sym":
+			timestamp = int(fdesc[1])
+			target = fdesc[2].split()[0]
+		writer.write(cpv, name, ftype, timestamp, md5sum, target)
+
+
 def filter_by_doc(contents, content_filter):
 	"""Return a copy of content filtered by documentation."""
 
@@ -286,8 +315,10 @@ def main(input_args):
 		print_help()
 		sys.exit(2)
 
+	writer = record_writer(FILE_FIELDS)
+
 	# Turn off filtering for tree output
-	if QUERY_OPTS["output_tree"]:
+	if QUERY_OPTS["output_tree"] and writer is None:
 		QUERY_OPTS["type_filter"] = None
 
 	#
@@ -296,7 +327,7 @@ def main(input_args):
 
 	first_run = True
 	for query in queries:
-		if not first_run:
+		if not first_run and writer is None:
 			print()
 
 		matches = Query(query).smart_find(**QUERY_OPTS)
@@ -313,7 +344,10 @@ def main(input_args):
 				pp.uprint(" * Contents of %s:" % pp.cpv(str(pkg.cpv)))
 
 			contents = pkg.parsed_contents()
-			display_files(filter_contents(contents))
+			if writer is not None:
+				write_records(writer, pkg, filter_contents(contents))
+			else:
+				display_files(filter_contents(contents))
 
 		first_run = False
 
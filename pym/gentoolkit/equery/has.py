@@ -21,7 +21,8 @@ from portage import auxdbkeys
 
 import gentoolkit.pprinter as pp
 from gentoolkit import errors
-from gentoolkit.equery import format_options, mod_usage, CONFIG
+from gentoolkit.equery import (format_options, mod_usage, package_record,
+	record_writer, CONFIG, PACKAGE_FIELDS)
 from gentoolkit.package import PackageFormatter, FORMAT_TMPL_VARS
 from gentoolkit.query import Query
 
@@ -90,7 +91,7 @@ def query_in_env(query, env_var, pkg):
 	return False
 
 
-def display_pkg(query, env_var, pkg):
+def display_pkg(query, env_var, pkg, writer=None):
 	"""Display information for a given package."""
 
 	if CONFIG['verbose']:
@@ -119,7 +120,10 @@ def display_pkg(query, env_var, pkg):
 		not QUERY_OPTS["in_porttree"]):
 		if not 'O' in  pkgstr.location:
 			return False
-	pp.uprint(pkgstr)
+	if writer is not None:
+		writer.write(*((query,) + package_record(pkgstr)))
+	else:
+		pp.uprint(pkgstr)
 
 	return True
 
@@ -191,10 +195,12 @@ def main(input_args):
 				env = QUERY_OPTS['env_var']
 				print(match.environment(env))
 
+	writer = record_writer(('value',) + PACKAGE_FIELDS)
+
 	first_run = True
 	got_match = False
 	for query in queries:
-		if not first_run:
+		if not first_run and writer is None:
 			print()
 
 		if CONFIG['verbose']:
@@ -203,7 +209,7 @@ def main(input_args):
 
 		for pkg in matches:
 			if query_in_env(query, env_var, pkg):
-				display_pkg(query, env_var, pkg)
+				display_pkg(query, env_var, pkg, writer)
 				got_match = True
 		first_run = False
 
@@ -19,7 +19,8 @@ from getopt import gnu_getopt, GetoptError
 
 import gentoolkit.pprinter as pp
 from gentoolkit import errors
-from gentoolkit.equery import format_options, mod_usage, CONFIG
+from gentoolkit.equery import (format_options, mod_usage, package_record,
+	record_writer, CONFIG, PACKAGE_FIELDS)
 from gentoolkit.package import PackageFormatter, FORMAT_TMPL_VARS
 from gentoolkit.query import Query
 
@@ -66,7 +67,7 @@ def print_help(with_description=True):
 	print(" " * 24, ', '.join(pp.emph(x) for x in FORMAT_TMPL_VARS))			
 
 
-def display_useflags(query, pkg):
+def display_useflags(query, pkg, writer=None):
 	"""Display USE flag information for a given package."""
 
 	try:
@@ -104,7 +105,10 @@ def display_useflags(query, pkg):
 		not QUERY_OPTS["in_porttree"]):
 		if not 'O' in  pkgstr.location:
 			return False
-	pp.uprint(pkgstr)
+	if writer is not None:
+		writer.write(*((query,) + package_record(pkgstr)))
+	else:
+		pp.uprint(pkgstr)
 
 	return True
 
@@ -159,17 +163,19 @@ def main(input_args):
 	# Output
 	#
 
+	writer = record_writer(('flag',) + PACKAGE_FIELDS)
+
 	first_run = True
 	got_match = False
 	for query in queries:
-		if not first_run:
+		if not first_run and writer is None:
 			print()
 
 		if CONFIG['verbose']:
 			pp.uprint(" * Searching for USE flag %s ... " % pp.emph(query))
 
 		for pkg in matches:
-			if display_useflags(query, pkg):
+			if display_useflags(query, pkg, writer):
 				got_match = True
 
 		first_run = False
@@ -19,10 +19,11 @@ from getopt import gnu_getopt, GetoptError
 
 import gentoolkit
 import gentoolkit.pprinter as pp
-from gentoolkit.equery import format_options, mod_usage, CONFIG
+from gentoolkit.equery import (format_options, mod_usage, package_record,
+	record_writer, CONFIG, PACKAGE_FIELDS)
 from gentoolkit.helpers import get_installed_cpvs
 from gentoolkit.helpers import get_bintree_cpvs
-from gentoolkit.package import PackageFormatter, FORMAT_TMPL_VARS
+from gentoolkit.package import MaskEvaluator, PackageFormatter, FORMAT_TMPL_VARS
 from gentoolkit.query import Query
 
 # =======
@@ -119,6 +120,23 @@ def get_binpkgs_missing(matches):
 	return result
 
 
+def write_record(writer, pkgstr):
+	"""Write the record of a package, with its mask reason if requested."""
+
+	record = package_record(pkgstr)
+	if QUERY_OPTS["include_mask_reason"]:
+		mask_reason = None
+		masking_status = record[-1]
+		if masking_status and set(('profile', 'package.mask')).intersection(
+			masking_status):
+			mask_reason = pkgstr.pkg.mask_reason()
+		if mask_reason:
+			record += (mask_reason[0], mask_reason[1])
+		else:
+			record += (None, None)
+	writer.write(*record)
+
+
 def parse_module_options(module_opts):
 	"""Parse module options and update QUERY_OPTS"""
 
@@ -186,9 +204,18 @@ def main(input_args):
 		print_help()
 		sys.exit(2)
 
+	if QUERY_OPTS["include_mask_reason"]:
+		writer = record_writer(PACKAGE_FIELDS + ('mask_reason', 'mask_location'))
+	else:
+		writer = record_writer(PACKAGE_FIELDS)
+
+	# Masking status is only evaluated for the packages which need it, but
+	# then once for all the versions of a cat/pkg
+	mask_evaluator = MaskEvaluator()
+
 	first_run = True
 	for query in (Query(x, QUERY_OPTS['is_regex']) for x in queries):
-		if not first_run:
+		if not first_run and writer is None:
 			print()
 
 		matches = query.smart_find(**QUERY_OPTS)
@@ -211,7 +238,8 @@ def main(input_args):
 			pkgstr = PackageFormatter(
 				pkg,
 				do_format=CONFIG['verbose'],
-				custom_format=QUERY_OPTS["package_format"]
+				custom_format=QUERY_OPTS["package_format"],
+				mask_evaluator=mask_evaluator
 			)
 
 			if (QUERY_OPTS["in_porttree"] and
@@ -222,6 +250,9 @@ def main(input_args):
 				not QUERY_OPTS["in_porttree"]):
 				if not 'O' in pkgstr.location:
 					continue
+			if writer is not None:
+				write_record(writer, pkgstr)
+				continue
 			pp.uprint(pkgstr)
 
 			if QUERY_OPTS["include_mask_reason"]:
@@ -18,7 +18,8 @@ import sys
 from getopt import gnu_getopt, GetoptError
 
 import gentoolkit.pprinter as pp
-from gentoolkit.equery import format_options, mod_usage, CONFIG
+from gentoolkit.equery import format_options, mod_usage, record_writer, CONFIG
+from gentoolkit.profiler import PROFILER
 from gentoolkit.query import Query
 
 # =======
@@ -35,6 +36,9 @@ QUERY_OPTS = {
 	"size_in_bytes": False
 }
 
+# Fields of the records written instead of display_size's output
+SIZE_FIELDS = ('cpv', 'size', 'files', 'uncounted')
+
 # =========
 # Functions
 # =========
@@ -71,17 +75,22 @@ def print_help(with_description=True):
 	)))
 
 
-def display_size(match_set):
+def display_size(match_set, writer=None):
 	"""Display the total size of all accessible files owned by packages.
 
 	@type match_set: list
 	@param match_set: package cat/pkg-ver strings
+	@type writer: L{gentoolkit.formatters.RecordWriter}
+	@param writer: if given, write records with the L{SIZE_FIELDS} instead
 	"""
 
 	for pkg in match_set:
-		size, files, uncounted = pkg.size()
+		with PROFILER.phase("package work"):
+			size, files, uncounted = pkg.size()
 
-		if CONFIG['verbose']:
+		if writer is not None:
+			writer.write(str(pkg.cpv), size, files, uncounted)
+		elif CONFIG['verbose']:
 			pp.uprint(" * %s" % pp.cpv(str(pkg.cpv)))
 			print("Total files : %s".rjust(25) % pp.number(str(files)))
 
@@ -177,9 +186,11 @@ def main(input_args):
 		print_help()
 		sys.exit(2)
 
+	writer = record_writer(SIZE_FIELDS)
+
 	first_run = True
 	for query in (Query(x, QUERY_OPTS['is_regex']) for x in queries):
-		if not first_run:
+		if not first_run and writer is None:
 			print()
 
 		matches = query.smart_find(**QUERY_OPTS)
@@ -189,7 +200,7 @@ def main(input_args):
 
 		matches.sort()
 
-		display_size(matches)
+		display_size(matches, writer)
 
 		first_run = False
 
@@ -24,7 +24,7 @@ from portage import settings
 
 import gentoolkit.pprinter as pp
 from gentoolkit import errors
-from gentoolkit.equery import format_options, mod_usage, CONFIG
+from gentoolkit.equery import format_options, mod_usage, record_writer, CONFIG
 from gentoolkit.helpers import uniqify
 from gentoolkit.textwrap_ import TextWrapper
 from gentoolkit.query import Query
@@ -36,6 +36,9 @@ from gentoolkit.flag import get_flags, reduce_flags
 
 QUERY_OPTS = {"all_versions" : False}
 
+# Fields of the records written by write_records
+USE_FIELDS = ('cpv', 'flag', 'final', 'installed', 'description', 'restrict')
+
 # =========
 # Functions
 # =========
@@ -117,6 +120,22 @@ def display_useflags(output):
 			pp.uprint(markers[in_makeconf] + flag)
 
 
+def write_records(writer, pkg, output):
+	"""Write a record for each USE flag of a package.
+
+	@type writer: L{gentoolkit.formatters.RecordWriter}
+	@param writer: writer of records with the L{USE_FIELDS}
+	@type output: list
+	@param output: [(inuse, inused, flag, desc, restrict), ...], see
+		L{display_useflags}
+	"""
+
+	cpv = str(pkg.cpv)
+	for in_makeconf, in_installed, flag, desc, restrict in output:
+		writer.write(cpv, flag, bool(in_makeconf), bool(in_installed),
+			desc or None, restrict or None)
+
+
 def get_global_useflags():
 	"""Get global and expanded USE flag variables from
 	PORTDIR/profiles/use.desc and PORTDIR/profiles/desc/*.desc respectively.
@@ -265,10 +284,12 @@ def main(input_args):
 	# Output
 	#
 
+	writer = record_writer(USE_FIELDS)
+
 	first_run = True
 	legend_printed = False
 	for query in (Query(x) for x in queries):
-		if not first_run:
+		if not first_run and writer is None:
 			print()
 
 		if QUERY_OPTS["all_versions"]:
@@ -285,7 +306,9 @@ def main(input_args):
 		for pkg in matches:
 
 			output = get_output_descriptions(pkg, global_usedesc)
-			if output:
+			if writer is not None:
+				write_records(writer, pkg, output)
+			elif output:
 				if CONFIG['verbose']:
 					if not legend_printed:
 						print_legend()
@@ -23,7 +23,7 @@ from getopt import gnu_getopt, GetoptError
 
 import gentoolkit.pprinter as pp
 from gentoolkit import errors
-from gentoolkit.equery import format_options, mod_usage
+from gentoolkit.equery import format_options, mod_usage, record_writer
 from gentoolkit.query import Query
 
 # =======
@@ -32,6 +32,9 @@ from gentoolkit.query import Query
 
 QUERY_OPTS = {"include_masked": False}
 
+# Fields of the records written instead of the ebuild paths
+WHICH_FIELDS = ('cpv', 'path')
+
 # =========
 # Functions
 # =========
@@ -87,6 +90,8 @@ def main(input_args):
 		print_help()
 		sys.exit(2)
 
+	writer = record_writer(WHICH_FIELDS)
+
 	for query in (Query(x) for x in queries):
 		matches = query.find(
 			include_masked=QUERY_OPTS['include_masked'],
@@ -95,7 +100,9 @@ def main(input_args):
 		if matches:
 			pkg = sorted(matches).pop()
 			ebuild_path = pkg.ebuild_path()
-			if ebuild_path:
+			if ebuild_path and writer is not None:
+				writer.write(str(pkg.cpv), os.path.normpath(ebuild_path))
+			elif ebuild_path:
 				pp.uprint(os.path.normpath(ebuild_path))
 			else:
 				sys.stderr.write(
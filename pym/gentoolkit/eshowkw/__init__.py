@@ -8,6 +8,7 @@ __author__ = "Tomáš Chvátal <scarabeus@gentoo.org>"
 
 import sys, os, fnmatch
 import argparse
+from multiprocessing.pool import ThreadPool
 from portage import output as porto
 from portage import settings as ports
 from portage import config as portc
@@ -16,19 +17,33 @@ from portage import db as portdb
 
 from .keywords_header import keywords_header
 from .keywords_content import keywords_content
+from .keywords_content import query_package
 from .display_pretty import string_rotator
 from .display_pretty import display
+from .export import matrix_rows, write_csv, write_json, EXPORT_FORMATS
 
 ignore_slots = False
 bold = False
 order = 'bottom'
 topper = 'versionlist'
 
-def process_display(package, keywords, dbapi):
-	portdata = keywords_content(package, keywords.keywords, dbapi, ignore_slots, order, bold, topper)
+def rotate_header(keywords):
+	"""Rotate the arch header, which is the same for every package"""
+	header = string_rotator().rotateContent(keywords.content, keywords.length, bold)
+	extra = string_rotator().rotateContent(keywords.extra, keywords.length, bold, False)
+	return header, extra
+
+def process_display(package, keywords, dbapi, metadata = None, rotated = None):
+	"""
+	Display the keywords of package.
+	metadata is the result of query_package and rotated the result of
+	rotate_header, when they are already known.
+	"""
+	portdata = keywords_content(package, keywords.keywords, dbapi, ignore_slots, order, bold, topper, metadata)
 	if topper == 'archlist':
-		header = string_rotator().rotateContent(keywords.content, keywords.length, bold)
-		extra = string_rotator().rotateContent(keywords.extra, keywords.length, bold, False)
+		if rotated is None:
+			rotated = rotate_header(keywords)
+		header, extra = rotated
 		# -1 : space is taken in account and appended by us
 		filler = ''.ljust(portdata.slot_length-1)
 		header = ['%s%s%s' % (x, filler, y) for x, y in zip(header, extra)]
@@ -37,7 +52,8 @@ def process_display(package, keywords, dbapi):
 		content_length = keywords.length
 	else:
 		header = string_rotator().rotateContent(portdata.content, portdata.content_length, bold)
-		content = keywords.content
+		# the header is shared by all packages, do not extend it
+		content = list(keywords.content)
 		sep = [''.ljust(keywords.length) for x in range(portdata.slot_length-1)]
 		content.extend(sep)
 		content.extend(keywords.extra)
@@ -45,6 +61,49 @@ def process_display(package, keywords, dbapi):
 		content_length = portdata.version_length
 	display(content, header, header_length, content_length, portdata.cp, topper)
 
+def expand_packages(packages, dbapi):
+	"""Replace each category/* by all the packages of that category"""
+	result = []
+	for package in packages:
+		if package.endswith('/*'):
+			result.extend(sorted(dbapi.cp_all(categories=[package[:-2]])))
+		else:
+			result.append(package)
+	return result
+
+def query_packages(packages, dbapi, jobs = 1, failed = None):
+	"""
+	Query the metadata of packages with a pool of jobs threads.
+	Yields (package, metadata) in order, as soon as they are available.
+	A package which can not be queried is reported on stderr and skipped,
+	and appended to failed if it is given.
+	"""
+	def query(package):
+		# SystemExit would kill the worker thread, pass it along
+		try:
+			return package, query_package(package, dbapi), None
+		except SystemExit as e:
+			return package, None, e
+
+	if jobs <= 1 or len(packages) <= 1:
+		results = (query(x) for x in packages)
+		pool = None
+	else:
+		pool = ThreadPool(min(jobs, len(packages)))
+		results = pool.imap(query, packages)
+	try:
+		for package, metadata, error in results:
+			if error is not None:
+				sys.stderr.write('%s: %s\n' % (package, error))
+				if failed is not None:
+					failed.append(package)
+				continue
+			yield package, metadata
+	finally:
+		if pool is not None:
+			pool.terminate()
+			pool.join()
+
 def process_args(argv):
 	"""Option parsing via argc"""
 	parser = argparse.ArgumentParser(prog=__package__,
@@ -53,7 +112,7 @@ def process_args(argv):
 
 	parser.add_argument('-v', '--version', action='version', version=__version__, help='show package version and exit')
 
-	parser.add_argument('package', nargs='*', default=None, help='Packages to check.')
+	parser.add_argument('package', nargs='*', default=None, help='Packages to check, category/* for all packages of a category.')
 
 	parser.add_argument('-a', '--arch', nargs='+', default=[], help='Display only specified arch(s)')
 
@@ -72,6 +131,10 @@ def process_args(argv):
 		help='Display prefix keywords in output.')
 	parser.add_argument('-S', '--ignore-slot', action='store_true', default=False,
 		help='Treat slots as irelevant during detection of redundant pacakges.')
+	parser.add_argument('-F', '--format', default='pretty', choices=['pretty'] + EXPORT_FORMATS,
+		help='Output format, csv and json give one row per version with the state of each arch.')
+	parser.add_argument('-j', '--jobs', type=int, default=1,
+		help='Number of packages to query at once (default: 1).')
 
 	return parser.parse_args(args=argv)
 
@@ -107,7 +170,22 @@ def main(argv, indirect = False):
 		dbapi = portdb[ports['ROOT']]['porttree'].dbapi
 		if not use_overlays:
 			dbapi.porttrees = [dbapi.porttree_root]
-		map(lambda x: process_display(x, keywords, dbapi), package)
+		packages = expand_packages(package, dbapi)
+		failed = []
+		results = query_packages(packages, dbapi, opts.jobs, failed)
+		if opts.format == 'csv':
+			write_csv(sys.stdout, matrix_rows(results, keywords.keywords), keywords.keywords)
+		elif opts.format == 'json':
+			write_json(sys.stdout, matrix_rows(results, keywords.keywords), keywords.keywords)
+		else:
+			# the arch header is rendered once for all packages
+			rotated = None
+			if topper == 'archlist':
+				rotated = rotate_header(keywords)
+			for x, metadata in results:
+				process_display(x, keywords, dbapi, metadata, rotated)
+		if failed:
+			return 1
 	else:
 		currdir = os.getcwd()
 		# check if there are actualy some ebuilds
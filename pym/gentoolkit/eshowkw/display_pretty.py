@@ -3,7 +3,11 @@
 # Distributed under the terms of the GNU General Public License v2
 
 from portage.output import colorize
-from itertools import izip_longest
+try:
+	from itertools import izip_longest
+except ImportError:
+	# python-3.x
+	from itertools import zip_longest as izip_longest
 
 __all__ = ['string_rotator', 'colorize_string', 'align_string', 'rotate_dash', 'print_content', 'display']
 
@@ -0,0 +1,59 @@
+#	vim:fileencoding=utf-8
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import csv
+import json
+
+__all__ = ['matrix_rows', 'write_csv', 'write_json', 'EXPORT_FORMATS']
+
+from .keywords_content import keyword_state
+from .keywords_content import get_install_status
+
+EXPORT_FORMATS = ['csv', 'json']
+
+def matrix_rows(results, keywords_list):
+	"""
+	Turn the (package, metadata) pairs yielded by query_packages into one
+	row per version: a dict with the cpv, slot, repository, mask and
+	install status, and the state of each arch of keywords_list
+	(see keyword_state).  The mask status comes with the metadata, it is
+	looked up by the workers of query_packages.
+	"""
+	for package, (packages, keywords, slots, repositories, masks) in results:
+		for cpv, kw, slot, repo, mask in zip(packages, keywords, slots,
+				repositories, masks):
+			kw = kw.split()
+			yield {
+				'cpv': cpv,
+				'slot': slot,
+				'repository': repo,
+				'masked': mask,
+				'installed': bool(get_install_status(cpv)),
+				'keywords': dict((arch, keyword_state(arch, kw))
+					for arch in keywords_list)
+			}
+
+def write_csv(out, rows, keywords_list):
+	"""Write the rows as CSV, one column per arch, empty when not keyworded"""
+	writer = csv.writer(out)
+	writer.writerow(['cpv', 'slot', 'repository', 'masked', 'installed'] + list(keywords_list))
+	for row in rows:
+		writer.writerow([row['cpv'], row['slot'], row['repository'],
+			int(row['masked']), int(row['installed'])]
+			+ [row['keywords'][arch] or '' for arch in keywords_list])
+
+def write_json(out, rows, keywords_list):
+	"""
+	Write the rows as a JSON list, each row as soon as it is known.
+	The list is closed even if getting the rows fails, so what was
+	written is still valid JSON.
+	"""
+	out.write('[')
+	sep = '\n'
+	try:
+		for row in rows:
+			out.write(sep + json.dumps(row, sort_keys=True))
+			sep = ',\n'
+	finally:
+		out.write('\n]\n')
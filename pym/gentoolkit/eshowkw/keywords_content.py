@@ -2,99 +2,208 @@
 # Copyright 2010 Gentoo Foundation
 # Distributed under the terms of the GNU General Public License v2
 
+import threading
+
 import portage as port
 from portage.output import colorize
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+__all__ = ['keywords_content', 'query_package', 'keyword_state']
+
+from .display_pretty import colorize_string
+from .display_pretty import align_string
+
+# portdbapi.aux_get regenerates the stale cache entries with the
+# doebuild_settings shared by all the threads of query_packages, so all
+# the calls which may end up there are serialized, xmatch included since
+# it looks up the metadata of slot and repository atoms.
+_metadata_lock = threading.Lock()
+
+def check_exist(pdb, package):
+	"""Check if specified package even exists."""
+	try:
+		with _metadata_lock:
+			matches = pdb.xmatch('match-all', package)
+	except port.exception.AmbiguousPackageName as Arg:
+		msg_err = 'Ambiguous package name "%s".\n' % package
+		found = 'Possibilities: %s' % Arg
+		raise SystemExit('%s%s' % (msg_err, found))
+	except port.exception.InvalidAtom:
+		msg_err = 'No such package "%s"' % package
+		raise SystemExit(msg_err)
+	if len(matches) <= 0:
+		msg_err = 'No such package "%s"' % package
+		raise SystemExit(msg_err)
+	return matches
+
+def get_metadata(pdb, packages):
+	"""Obtain all KEYWORDS and SLOT from metadata"""
+	try:
+		with _metadata_lock:
+			metadata = [pdb.aux_get(x, ['KEYWORDS', 'SLOT', 'repository'])
+				for x in packages]
+	except KeyError:
+		# portage prints out more verbose error for us if we were lucky
+		raise SystemExit('Failed to obtain metadata')
+	return list(zip(*metadata))
 
-__all__ = ['keywords_content']
+def keyword_state(arch, keywords):
+	"""
+	Return the state of arch in the list of keywords of a version:
+	# ~arch -> testing
+	# -arch -> unsupported
+	# arch -> stable
+	# -* -> disabled
+	or None when arch is not keyworded.
+	"""
+	for k, state in (('~%s' % arch, 'testing'), ('-%s' % arch, 'unsupported'),
+			(arch, 'stable'), ('-*', 'disabled')):
+		if k in keywords:
+			return state
+	return None
 
-from display_pretty import colorize_string
-from display_pretty import align_string
+def get_mask_status(cpv):
+	"""
+	Figure out if package is pmasked.
+	This also uses user settings in /etc/ so local changes are important.
+	"""
+	try:
+		with _metadata_lock:
+			status = port.getmaskingstatus(cpv)
+		if status == ['package.mask']:
+			return True
+	except:
+		# occurs when package is not known by portdb
+		# so we consider it unmasked
+		pass
+	return False
+
+def get_install_status(cpv):
+	"""Check if package version we test is installed."""
+	vartree = port.db[port.settings['ROOT']]['vartree'].dbapi
+	return vartree.cpv_exists(cpv)
+
+def query_package(package, pdb):
+	"""
+	Obtain all versions of package, their KEYWORDS, SLOT and repository
+	and whether they are package.masked.
+	This is all keywords_content needs from portdb, so it can be queried
+	apart, from a worker thread.
+	"""
+	packages = check_exist(pdb, package)
+	keywords, slots, repositories = get_metadata(pdb, packages)
+	masks = tuple(get_mask_status(x) for x in packages)
+	return packages, keywords, slots, repositories, masks
 
 class keywords_content:
 	class RedundancyChecker:
+		"""
+		A version is redundant when every keyword it has is shadowed by
+		the newer versions (of its slot): a stable arch by a newer stable
+		arch, a testing arch by a newer testing or stable one.
+		The keywords are encoded as a version x arch matrix of states, so
+		a version is redundant when none of its states exceeds the reverse
+		cumulative maximum of the newer rows.
+		"""
+		# states of an arch in the matrix
+		MISSING, TESTING, STABLE = 0, 1, 2
+		# use numpy from that many versions on, it is slower on small packages
+		NUMPY_THRESHOLD = 32
+
 		def __listRedundant(self, keywords, ignoreslots, slots):
 			"""List all redundant packages."""
 			if ignoreslots:
-				return self.__listRedundantAll(keywords)
-			else:
-				return self.__listRedundantSlots(keywords, slots)
-
-		def __listRedundantSlots(self, keywords, slots):
-			"""Search for redundant packages walking per keywords for specified slot."""
-			result = [self.__compareSelected([k for k, s in zip(keywords, slots)
-				if s == slot])
-					for slot in self.__uniq(slots)]
-			# this is required because the list itself is not just one level depth
-			return list(''.join(result))
-
-		def __uniq(self, seq):
-			"""Remove all duplicate elements from list."""
-			seen = {}
+				return list(self.__compareSelected(list(keywords)))
+			# versions grouped per slot, in order of first appearance
+			groups = {}
+			order = []
+			for k, s in zip(keywords, slots):
+				if s not in groups:
+					groups[s] = []
+					order.append(s)
+				groups[s].append(k)
 			result = []
-			for item in seq:
-				if item in seen:
-					continue
-				seen[item] = 1
-				result.append(item)
+			for slot in order:
+				result.extend(self.__compareSelected(groups[slot]))
 			return result
 
-		def __cleanKeyword(self, keyword):
-			"""Remove masked arches and hardmasks from keywords since we don't care about that."""
-			return ["%s" % x for x in keyword.split()
-				if x != '-*' and not x.startswith('-')]
+		def __buildMatrix(self, kws):
+			"""
+			Encode the keywords of each version as a sparse row
+			{arch column: state}, ignoring masked arches and hardmasks.
+			Returns (rows, number of arch columns).
+			"""
+			columns = {}
+			rows = []
+			for keyword in kws:
+				row = {}
+				for x in keyword.split():
+					if x.startswith('-'):
+						continue
+					if x.startswith('~'):
+						arch, state = x[1:], self.TESTING
+					else:
+						arch, state = x, self.STABLE
+					col = columns.setdefault(arch, len(columns))
+					if row.get(col, self.MISSING) < state:
+						row[col] = state
+				rows.append(row)
+			return rows, len(columns)
 
-		def __listRedundantAll(self, keywords):
-			"""Search for redundant packages using all versions ignoring its slotting."""
-			return list(self.__compareSelected(list(keywords)))
+		def __shadowedPython(self, rows, width):
+			"""Walk the rows from the newest keeping the best state per arch."""
+			best = [self.MISSING] * width
+			result = []
+			for row in reversed(rows):
+				result.append(bool(result) and
+					all(best[col] >= state for col, state in row.items()))
+				for col, state in row.items():
+					if best[col] < state:
+						best[col] = state
+			result.reverse()
+			return result
+
+		def __shadowedNumpy(self, rows, width):
+			"""Compare each row with the reverse cumulative maximum of the newer ones."""
+			matrix = numpy.zeros((len(rows) + 1, width), dtype=numpy.int8)
+			for i, row in enumerate(rows):
+				for col, state in row.items():
+					matrix[i, col] = state
+			# the extra last row stays empty, it is the "newer" of the newest row
+			best = numpy.maximum.accumulate(matrix[::-1], axis=0)[::-1]
+			shadowed = (matrix[:-1] <= best[1:]).all(axis=1)
+			shadowed[-1] = False
+			return shadowed.tolist()
 
 		def __compareSelected(self, kws):
 			"""
-			Rotate over list of keywords and compare each element with others.
-			Selectively remove each already compared list from the remaining keywords.
+			Compare the keywords of each version with those of the newer ones.
 			"""
-			result = []
-			kws.reverse()
-			for i in range(len(kws)):
-				kw = kws.pop()
-				if self.__compareKeywordWithRest(kw, kws):
-					result.append('#')
-				else:
-					result.append('o')
-			if len(result) == 0:
-				result.append('o')
-			return ''.join(result)
-
-		def __compareKeywordWithRest(self, keyword, keywords):
-			"""Compare keywords with list of keywords."""
-			kw = self.__cleanKeyword(keyword)
-			for kwi in keywords:
-				kwi = self.__cleanKeyword(kwi)
-				if kwi:
-					kw = self.__checkShadow(kw, kwi)
-				if not kw:
-					return True
-			return False
-
-		def __checkShadow(self, old, new):
-			"""Check if package version is overshadowed by other package version."""
-			tmp = set(new)
-			tmp.update("~%s" % x for x in new
-				if not x.startswith("~"))
-			return list(set(old).difference(tmp))
+			if len(kws) == 0:
+				return 'o'
+			rows, width = self.__buildMatrix(kws)
+			if numpy is not None and len(rows) >= self.NUMPY_THRESHOLD:
+				shadowed = self.__shadowedNumpy(rows, width)
+			else:
+				shadowed = self.__shadowedPython(rows, width)
+			return ''.join([x and '#' or 'o' for x in shadowed])
 
 		def __init__(self, keywords, slots, ignore_slots = False):
 			"""Query all relevant data for redundancy package checking"""
 			self.redundant = self.__listRedundant(keywords, ignore_slots, slots)
 
 	class VersionChecker:
-		def __getVersions(self, packages):
+		def __getVersions(self, packages, masks):
 			"""Obtain properly aligned version strings without colors."""
-			return map(lambda x: self.__separateVersion(x), packages)
+			return [self.__separateVersion(x, m) for x, m in zip(packages, masks)]
 
-		def __separateVersion(self, cpv):
+		def __separateVersion(self, cpv, mask):
 			"""Get version string for specfied cpv"""
 			#pv = port.versions.cpv_getversion(cpv)
-			return self.__prependVersionInfo(cpv, self.cpv_getversion(cpv))
+			return self.__prependVersionInfo(cpv, self.cpv_getversion(cpv), mask)
 
 		# remove me when portage 2.1.9 is stable
 		def cpv_getversion(self, mycpv):
@@ -104,10 +213,9 @@ class keywords_content:
 				return None
 			return mycpv[len(cp+"-"):]
 
-		def __prependVersionInfo(self, cpv, pv):
+		def __prependVersionInfo(self, cpv, pv, mask):
 			"""Prefix version with string based on whether version is installed or masked."""
-			mask = self.__getMaskStatus(cpv)
-			install = self.__getInstallStatus(cpv)
+			install = get_install_status(cpv)
 
 			if mask and install:
 				pv = '[M][I]%s' % pv
@@ -117,53 +225,9 @@ class keywords_content:
 				pv = '[I]%s' % pv
 			return pv
 
-		def __getMaskStatus(self, cpv):
-			"""
-			Figure out if package is pmasked.
-			This also uses user settings in /etc/ so local changes are important.
-			"""
-			try:
-				if port.getmaskingstatus(cpv) == ['package.mask']:
-					return True
-			except:
-				# occurs when package is not known by portdb
-				# so we consider it unmasked
-				pass
-			return False
-
-		def __getInstallStatus(self, cpv):
-			"""Check if package version we test is installed."""
-			vartree = port.db[port.settings['ROOT']]['vartree'].dbapi
-			return vartree.cpv_exists(cpv)
-
-		def __init__(self, packages):
+		def __init__(self, packages, masks):
 			"""Query all relevant data for version data formatting"""
-			self.versions = self.__getVersions(packages)
-
-	def __checkExist(self, pdb, package):
-		"""Check if specified package even exists."""
-		try:
-			matches = pdb.xmatch('match-all', package)
-		except port.exception.AmbiguousPackageName as Arg:
-			msg_err = 'Ambiguous package name "%s".\n' % package
-			found = 'Possibilities: %s' % Arg
-			raise SystemExit('%s%s' % (msg_err, found))
-		except port.exception.InvalidAtom:
-			msg_err = 'No such package "%s"' % package
-			raise SystemExit(msg_err)
-		if len(matches) <= 0:
-			msg_err = 'No such package "%s"' % package
-			raise SystemExit(msg_err)
-		return matches
-
-	def __getMetadata(self, pdb, packages):
-		"""Obtain all KEYWORDS and SLOT from metadata"""
-		try:
-			metadata = map(lambda x: pdb.aux_get(x, ['KEYWORDS', 'SLOT', 'repository']), packages)
-		except KeyError:
-			# portage prints out more verbose error for us if we were lucky
-			raise SystemExit('Failed to obtain metadata')
-		return list(zip(*metadata))
+			self.versions = self.__getVersions(packages, masks)
 
 	def __formatKeywords(self, keywords, keywords_list, usebold = False, toplist = 'archlist'):
 		"""Loop over all keywords and replace them with nice visual identifier"""
@@ -182,20 +246,15 @@ class keywords_content:
 		# arch -> green +
 		# -* -> red *
 		"""
-		keys = [ '~%s' % arch, '-%s' % arch, '%s' % arch, '-*' ]
-		values = [
-			colorize('darkyellow', '~'),
-			colorize('darkred', '-'),
-			colorize('darkgreen', '+'),
-			colorize('darkred', '*')
-		]
+		values = {
+			'testing': colorize('darkyellow', '~'),
+			'unsupported': colorize('darkred', '-'),
+			'stable': colorize('darkgreen', '+'),
+			'disabled': colorize('darkred', '*')
+		}
 		# check what keyword we have
 		# here we cant just append space because it would get stripped later
-		char = colorize('darkgray','o')
-		for k, v in zip(keys, values):
-			if k in keywords:
-				char = v
-				break
+		char = values.get(keyword_state(arch, keywords), colorize('darkgray','o'))
 		if toplist == 'archlist' and usebold and (field)%2 == 0 and char != ' ':
 			char = colorize('bold', char)
 		return char
@@ -247,14 +306,19 @@ class keywords_content:
 			content.append('%s%s%s%s%s%s%s%s%s' % (v, fieldsep, k, fieldsep, r, normsep, s, fieldsep, t))
 		return content
 
-	def __init__(self, package, keywords_list, porttree, ignoreslots = False, content_align = 'bottom', usebold = False, toplist = 'archlist'):
-		"""Query all relevant data from portage databases."""
-		packages = self.__checkExist(porttree, package)
-		self.keywords, self.slots, self.repositories = self.__getMetadata(porttree, packages)
+	def __init__(self, package, keywords_list, porttree, ignoreslots = False, content_align = 'bottom', usebold = False, toplist = 'archlist', metadata = None):
+		"""
+		Query all relevant data from portage databases.
+		metadata is the result of query_package when it was already queried.
+		"""
+		if metadata is None:
+			metadata = query_package(package, porttree)
+		packages, keywords, slots, repositories, masks = metadata
+		self.keywords, self.slots, self.repositories = keywords, slots, repositories
 		self.slot_length = max([len(x) for x in self.slots])
 		repositories_length = max([len(x) for x in self.repositories])
 		self.keyword_length = len(keywords_list)
-		self.versions = self.VersionChecker(packages).versions
+		self.versions = self.VersionChecker(packages, masks).versions
 		self.version_length = max([len(x) for x in self.versions])
 		self.version_count = len(self.versions)
 		self.redundant = self.RedundancyChecker(self.keywords, self.slots, ignoreslots).redundant
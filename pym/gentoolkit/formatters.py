@@ -7,10 +7,13 @@
 # $Header$
 
 import errno
+import json
+import locale
 import sys
 import time
 
 import gentoolkit
+from gentoolkit.profiler import PROFILER
 from gentoolkit.textwrap_ import TextWrapper
 import gentoolkit.pprinter as pp
 
@@ -97,3 +100,118 @@ def format_timestamp(timestamp):
 
 	return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(int(timestamp)))
 
+
+RECORD_FORMATS = ('ndjson', 'tsv')
+
+try:
+	unicode
+except NameError:
+	unicode = str
+
+class RecordWriter(object):
+	"""Write records (tuples of values in the order of C{fields}) as
+	newline delimited JSON objects or tab separated values, for consumption
+	by other programs.
+
+	Lines are encoded and kept in a buffer written out every C{bufsize}
+	bytes, instead of being written one by one like L{pp.uprint} does.
+
+	Example usage:
+		>>> writer = RecordWriter('ndjson', ('cpv', 'slot'))
+		>>> writer.write('sys-devel/gcc-4.3.2-r3', '4.3')
+		>>> writer.close()
+		{"cpv": "sys-devel/gcc-4.3.2-r3", "slot": "4.3"}
+
+	@type fmt: str
+	@param fmt: one of L{RECORD_FORMATS}
+	@type fields: tuple
+	@param fields: the names of the values of a record; for tsv, they are
+		written as a header line
+	@type out: file
+	@param out: where to write the records, defaults to sys.stdout
+	@type bufsize: int
+	@param bufsize: how many bytes to buffer before writing them out
+	"""
+
+	def __init__(self, fmt, fields, out=None, bufsize=65536):
+		if fmt not in RECORD_FORMATS:
+			raise ValueError("unknown record format %r" % fmt)
+		self.fields = tuple(fields)
+		if out is None:
+			out = sys.stdout
+		self.out = getattr(out, 'buffer', out)
+		self.bufsize = bufsize
+		self._buffer = []
+		self._buffered = 0
+		if fmt == 'ndjson':
+			# JSON is ASCII only with the default ensure_ascii
+			self.encoding = 'ascii'
+			self._keys = [json.dumps(x) + ': ' for x in self.fields]
+			self._format = self._format_ndjson
+		else:
+			self.encoding = locale.getpreferredencoding()
+			self._format = self._format_tsv
+			self._append('\t'.join(self.fields))
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	def _format_ndjson(self, values):
+		dumps = json.dumps
+		return '{' + ', '.join(
+			key + dumps(value) for key, value in zip(self._keys, values)
+		) + '}'
+
+	@staticmethod
+	def _tsv_value(value):
+		if value is None:
+			return ''
+		if isinstance(value, bool):
+			return '1' if value else '0'
+		if isinstance(value, (list, tuple)):
+			value = ','.join(unicode(x) for x in value)
+		value = unicode(value)
+		if '\\' in value or '\t' in value or '\n' in value or '\r' in value:
+			value = value.replace('\\', '\\\\').replace('\t', '\\t'
+				).replace('\n', '\\n').replace('\r', '\\r')
+		return value
+
+	def _format_tsv(self, values):
+		return '\t'.join(self._tsv_value(x) for x in values)
+
+	def _append(self, line):
+		line = (line + '\n').encode(self.encoding, 'replace')
+		self._buffer.append(line)
+		self._buffered += len(line)
+		if self._buffered >= self.bufsize:
+			self.flush()
+
+	def write(self, *values):
+		"""Write a record, a value for each field."""
+
+		if len(values) != len(self.fields):
+			raise TypeError("expected %d values, got %d" %
+				(len(self.fields), len(values)))
+		self._append(self._format(values))
+
+	def flush(self):
+		"""Write out the buffered records."""
+
+		with PROFILER.phase("output"):
+			if self._buffer:
+				data = b''.join(self._buffer)
+				self._buffer = []
+				self._buffered = 0
+				self.out.write(data)
+			try:
+				self.out.flush()
+			except AttributeError:
+				pass
+
+	def close(self):
+		"""Write out the buffered records, the writer can still be used."""
+
+		self.flush()
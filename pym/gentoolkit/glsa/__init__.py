@@ -126,6 +126,8 @@ def checkconfig(myconfig):
 		"GLSA_PREFIX": "glsa-",
 		"GLSA_SUFFIX": ".xml",
 		"CHECKFILE": "/var/lib/portage/glsa_injected",
+		"GLSA_STORE": "/var/cache/glsa-check/glsa.store",
+		"GLSA_STATE": "/var/cache/glsa-check/glsa.state",
 		"GLSA_SERVER": "www.gentoo.org/security/en/glsa/",	# not completely implemented yet
 		"CHECKMODE": "local",								# not completely implemented yet
 		"PRINTWIDTH": "76"
@@ -135,6 +137,32 @@ def checkconfig(myconfig):
 			myconfig[k] = mysettings[k]
 	return myconfig
 
+_injected = {}
+
+def getInjectedList(myconfig):
+	"""
+	Returns the GLSA IDs in the GLSA checkfile. The file is only read
+	again when it changed.
+
+	@type	myconfig: portage.config
+	@param	myconfig: a GLSA aware config instance (see L{checkconfig})
+	@rtype:		frozenset of Strings
+	@return:	the IDs of the injected GLSAs
+	"""
+	checkfile = myconfig["CHECKFILE"]
+	if not os.access(checkfile, os.R_OK):
+		return frozenset()
+	try:
+		st = os.stat(checkfile)
+	except OSError:
+		return frozenset()
+	signature = (st.st_ino, st.st_mtime, st.st_size)
+	cached = _injected.get(checkfile)
+	if cached is None or cached[0] != signature:
+		cached = _injected[checkfile] = (signature,
+			frozenset(portage.grabfile(checkfile)))
+	return cached[1]
+
 def get_glsa_list(repository, myconfig):
 	"""
 	Returns a list of all available GLSAs in the given repository
@@ -336,7 +364,15 @@ def match(atom, portdbname, match_type="default"):
 	@rtype:		list of strings
 	@return:	a list with the matching versions
 	"""
-	db = portage.db[portage.root][portdbname].dbapi
+	return dbMatch(atom, portage.db[portage.root][portdbname].dbapi, match_type)
+
+def dbMatch(atom, db, match_type="default"):
+	"""
+	Same as L{match}, with a dbapi instead of its name.
+
+	@type	db: portage.dbapi
+	@param	db: the database to use as information source
+	"""
 	if atom[2] == "~":
 		return revisionMatch(atom, db, match_type=match_type)
 	elif match_type == "default" or not hasattr(db, "xmatch"):
@@ -344,6 +380,150 @@ def match(atom, portdbname, match_type="default"):
 	else:
 		return db.xmatch(match_type, atom)
 
+class Matcher(object):
+	"""
+	A L{match} replacement that remembers its results, so the atoms
+	shared by many GLSAs are only matched once per run. It must not
+	outlive changes to the databases.
+	"""
+	def __init__(self, dbapis=None):
+		"""
+		@type	dbapis: Dict
+		@param	dbapis: {portdbname: dbapi} overriding the databases
+					of portage.db[portage.root]
+		"""
+		self.dbapis = dbapis or {}
+		self.cache = {}
+		self.slots = {}
+
+	def db(self, portdbname):
+		"""
+		@rtype:		portage.dbapi
+		@return:	the database called I{portdbname}
+		"""
+		if portdbname in self.dbapis:
+			return self.dbapis[portdbname]
+		return portage.db[portage.root][portdbname].dbapi
+
+	def __call__(self, atom, portdbname, match_type="default"):
+		key = (atom, portdbname, match_type)
+		try:
+			return list(self.cache[key])
+		except KeyError:
+			pass
+		result = self.cache[key] = tuple(dbMatch(atom, self.db(portdbname),
+			match_type))
+		return list(result)
+
+	def getSlot(self, cpv, portdbname):
+		"""
+		@rtype:		String
+		@return:	the SLOT of I{cpv} in the database I{portdbname}
+		"""
+		key = (cpv, portdbname)
+		try:
+			return self.slots[key]
+		except KeyError:
+			slot = self.slots[key] = self.db(portdbname).aux_get(cpv, ["SLOT"])[0]
+			return slot
+
+def isVulnerableAtom(vulnerableAtom, unaffectedList, matcher=match):
+	"""
+	Checks if an installed package version matches I{vulnerableAtom}
+	but none of the atoms in I{unaffectedList}. This is the same test
+	as C{getMinUpgrade([vulnerableAtom], unaffectedList) != None}
+	without looking for upgrades in the porttree.
+
+	@type	matcher: Function
+	@param	matcher: L{match} or a L{Matcher}
+	@rtype:		Boolean
+	"""
+	v_installed = matcher(vulnerableAtom, "vartree")
+	if not v_installed:
+		return False
+	u_installed = set()
+	for u in unaffectedList:
+		u_installed.update(matcher(u, "vartree"))
+	return bool(set(v_installed).difference(u_installed))
+
+class RevisionMatcher(object):
+	"""
+	A compiled >=~, <=~, >~ or <~ atom. The atom is split once, the
+	revisions of the candidates are compared with an operator function.
+	Use L{getRevisionMatcher} to share the instances between GLSAs.
+	"""
+	_operators = {">=": operator.ge, "<=": operator.le, ">": operator.gt,
+		"<": operator.lt}
+
+	def __init__(self, revisionAtom):
+		"""
+		@type	revisionAtom: string
+		@param	revisionAtom: a <~ or >~ atom as returned by L{makeAtom}
+		@raise	ValueError: if I{revisionAtom} is not a revision range atom
+		"""
+		if revisionAtom[2:3] != "~" \
+				or revisionAtom[0:2].strip() not in self._operators:
+			raise ValueError("not a revision range atom: %s" % revisionAtom)
+		self.atom = revisionAtom
+		self.compare = self._operators[revisionAtom[0:2].strip()]
+		cpv, sep, slot = revisionAtom[3:].partition(":")
+		mysplit = portage.pkgsplit(cpv)
+		if not mysplit:
+			raise ValueError("not a revision range atom: %s" % revisionAtom)
+		self.cpv = mysplit[0] + "-" + mysplit[1]
+		self.version = mysplit[1]
+		self.revision = int(mysplit[2][1:])
+		# any revision of the version
+		self.baseAtom = "~" + self.cpv + sep + slot
+
+	def getRevision(self, cpv):
+		"""
+		@type	cpv: string
+		@param	cpv: a package version matching L{baseAtom}
+		@rtype:		int
+		@return:	the revision of I{cpv}
+		"""
+		if cpv.startswith(self.cpv):
+			suffix = cpv[len(self.cpv):]
+			if not suffix:
+				return 0
+			if suffix[:2] == "-r" and suffix[2:].isdigit():
+				return int(suffix[2:])
+		# same version, differently spelled
+		return int(portage.pkgsplit(cpv)[2][1:])
+
+	def match(self, portdb, match_type="default"):
+		"""
+		@type	portdb: portage.dbapi
+		@param	portdb:	one of the portage databases to use as information source
+		@type	match_type: string
+		@param	match_type: if != "default" passed as first argument to portdb.xmatch
+					to apply the wanted visibility filters
+		@rtype:		list of strings
+		@return:	a list with the matching versions
+		"""
+		if match_type == "default" or not hasattr(portdb, "xmatch"):
+			mylist = portdb.match(self.baseAtom)
+		else:
+			mylist = portdb.xmatch(match_type, self.baseAtom)
+		return [v for v in mylist
+			if self.compare(self.getRevision(v), self.revision)]
+
+_revisionMatchers = {}
+
+def getRevisionMatcher(revisionAtom):
+	"""
+	@type	revisionAtom: string
+	@param	revisionAtom: a <~ or >~ atom
+	@rtype:		RevisionMatcher
+	@return:	the (shared) compiled I{revisionAtom}
+	"""
+	try:
+		return _revisionMatchers[revisionAtom]
+	except KeyError:
+		matcher = _revisionMatchers[revisionAtom] = RevisionMatcher(revisionAtom)
+		return matcher
+
 def revisionMatch(revisionAtom, portdb, match_type="default"):
 	"""
 	handler for the special >~, >=~, <=~ and <~ atoms that are supposed to behave
@@ -361,26 +541,10 @@ def revisionMatch(revisionAtom, portdb, match_type="default"):
 	@rtype:		list of strings
 	@return:	a list with the matching versions
 	"""
-	if match_type == "default" or not hasattr(portdb, "xmatch"):
-		if ":" in revisionAtom:
-			mylist = portdb.match(re.sub(r'-r[0-9]+(:[^ ]+)?$', r'\1', revisionAtom[2:]))
-		else:
-			mylist = portdb.match(re.sub("-r[0-9]+$", "", revisionAtom[2:]))
-	else:
-		if ":" in revisionAtom:
-			mylist = portdb.xmatch(match_type, re.sub(r'-r[0-9]+(:[^ ]+)?$', r'\1', revisionAtom[2:]))
-		else:
-			mylist = portdb.xmatch(match_type, re.sub("-r[0-9]+$", "", revisionAtom[2:]))
-	rValue = []
-	for v in mylist:
-		r1 = portage.pkgsplit(v)[-1][1:]
-		r2 = portage.pkgsplit(revisionAtom[3:])[-1][1:]
-		if eval(r1+" "+revisionAtom[0:2]+" "+r2):
-			rValue.append(v)
-	return rValue
+	return getRevisionMatcher(revisionAtom).match(portdb, match_type)
 
 
-def getMinUpgrade(vulnerableList, unaffectedList, minimize=True):
+def getMinUpgrade(vulnerableList, unaffectedList, minimize=True, matcher=None):
 	"""
 	Checks if the systemstate is matching an atom in
 	I{vulnerableList} and returns string describing
@@ -397,14 +561,17 @@ def getMinUpgrade(vulnerableList, unaffectedList, minimize=True):
 	@param	unaffectedList: atoms matching unaffected package versions
 	@type	minimize:	Boolean
 	@param	minimize:	True for a least-change upgrade, False for emerge-like algorithm
+	@type	matcher: L{Matcher}
+	@param	matcher: the matches and slots to share with other calls
 
 	@rtype:		String | None
 	@return:	the lowest unaffected version that is greater than
 				the installed version.
 	"""
-	rValue = ""
-	v_installed = reduce(operator.add, [match(v, "vartree") for v in vulnerableList], [])
-	u_installed = reduce(operator.add, [match(u, "vartree") for u in unaffectedList], [])
+	if matcher is None:
+		matcher = Matcher()
+	v_installed = reduce(operator.add, [matcher(v, "vartree") for v in vulnerableList], [])
+	u_installed = reduce(operator.add, [matcher(u, "vartree") for u in unaffectedList], [])
 
 	# remove all unaffected atoms from vulnerable list
 	v_installed = list(set(v_installed).difference(set(u_installed)))
@@ -418,26 +585,74 @@ def getMinUpgrade(vulnerableList, unaffectedList, minimize=True):
 	for u in unaffectedList:
 		# TODO: This had match_type="match-all" before. I don't think it should
 		# since we disregarded masked items later anyway (match(=rValue, "porttree"))
-		avail_updates.update(match(u, "porttree"))
+		avail_updates.update(matcher(u, "porttree"))
 	# if an atom is already installed, we should not consider it for upgrades
 	avail_updates.difference_update(u_installed)
+	avail_updates = [(c, portage.catpkgsplit(c)) for c in avail_updates]
 
 	for vuln in v_installed:
 		update = ""
-		for c in avail_updates:
-			c_pv = portage.catpkgsplit(c)
-			i_pv = portage.catpkgsplit(vuln)
+		update_pv = None
+		i_pv = portage.catpkgsplit(vuln)
+		i_slot = matcher.getSlot(vuln, "vartree")
+		for c, c_pv in avail_updates:
 			if portage.pkgcmp(c_pv[1:], i_pv[1:]) > 0 \
 					and (update == "" \
-						or (minimize ^ (portage.pkgcmp(c_pv[1:], portage.catpkgsplit(update)[1:]) > 0))) \
-					and portage.db[portage.root]["porttree"].dbapi.aux_get(c, ["SLOT"]) == portage.db[portage.root]["vartree"].dbapi.aux_get(vuln, ["SLOT"]):
+						or (minimize ^ (portage.pkgcmp(c_pv[1:], update_pv[1:]) > 0))) \
+					and matcher.getSlot(c, "porttree") == i_slot:
 				update = c_pv[0]+"/"+c_pv[1]+"-"+c_pv[2]
+				update_pv = c_pv
 				if c_pv[3] != "r0":		# we don't like -r0 for display
 					update += "-"+c_pv[3]
 		vuln_update.append([vuln, update])
 
 	return vuln_update
 
+class UpgradeCalculator(object):
+	"""
+	Memoizes L{getMinUpgrade} per (vulnerable atoms, unaffected atoms,
+	minimize), and shares the matches on both databases between all
+	calls. Like the L{Matcher}, it must not outlive changes to the
+	databases, so it can not be used while GLSAs are being fixed.
+	"""
+	def __init__(self, matcher=None):
+		"""
+		@type	matcher: L{Matcher}
+		@param	matcher: defaults to a new L{Matcher}
+		"""
+		if matcher is None:
+			matcher = Matcher()
+		self.matcher = matcher
+		self.cache = {}
+
+	def getMinUpgrade(self, vulnerableList, unaffectedList, minimize=True):
+		"""
+		Same as L{getMinUpgrade}.
+		"""
+		key = (frozenset(vulnerableList), frozenset(unaffectedList), minimize)
+		try:
+			result = self.cache[key]
+		except KeyError:
+			result = self.cache[key] = getMinUpgrade(vulnerableList,
+				unaffectedList, minimize, self.matcher)
+		if result is None:
+			return None
+		return [list(x) for x in result]
+
+	def getAffectionTables(self, myglsas, least_change=True):
+		"""
+		Computes the affection tables of many GLSAs at once.
+
+		@type	myglsas: List of Glsa
+		@param	myglsas: the GLSAs
+		@type	least_change: Boolean
+		@param	least_change: see L{Glsa.getAffectionTable}
+		@rtype:		List of Lists
+		@return:	the affection table of each GLSA of I{myglsas}
+		"""
+		return [myglsa.getAffectionTable(least_change, self)
+			for myglsa in myglsas]
+
 def format_date(datestr):
 	"""
 	Takes a date (announced, revised) date from a GLSA and formats
@@ -659,24 +874,25 @@ class Glsa:
 		outstream.write("\n"+wrap(myreferences, width, caption="References:       "))
 		outstream.write("\n")
 
-	def isVulnerable(self):
+	def isVulnerable(self, matcher=match):
 		"""
 		Tests if the system is affected by this GLSA by checking if any
 		vulnerable package versions are installed. Also checks for affected
 		architectures.
 
+		@type	matcher: Function
+		@param	matcher: L{match} or a L{Matcher} shared between GLSAs
 		@rtype:		Boolean
 		@returns:	True if the system is affected, False if not
 		"""
-		rValue = False
 		for k in self.packages.keys():
 			pkg = self.packages[k]
 			for path in pkg:
 				if path["arch"] == "*" or self.config["ARCH"] in path["arch"].split():
 					for v in path["vul_atoms"]:
-						rValue = rValue \
-							or (None != getMinUpgrade([v,], path["unaff_atoms"]))
-		return rValue
+						if isVulnerableAtom(v, path["unaff_atoms"], matcher):
+							return True
+		return False
 
 	def isInjected(self):
 		"""
@@ -686,10 +902,7 @@ class Glsa:
 		@rtype:		Boolean
 		@returns:	True if the GLSA is in the inject file, False if not
 		"""
-		if not os.access(self.config["CHECKFILE"], os.R_OK):
-			return False
-		aList = portage.grabfile(self.config["CHECKFILE"])
-		return (self.nr in aList)
+		return (self.nr in getInjectedList(self.config))
 
 	def inject(self):
 		"""
@@ -706,7 +919,7 @@ class Glsa:
 			checkfile.close()
 		return None
 
-	def getMergeList(self, least_change=True):
+	def getMergeList(self, least_change=True, calculator=None):
 		"""
 		Returns the list of package-versions that have to be merged to
 		apply this GLSA properly. The versions are as low as possible
@@ -715,21 +928,76 @@ class Glsa:
 		@type	least_change: Boolean
 		@param	least_change: True if the smallest possible upgrade should be selected,
 					False for an emerge-like algorithm
+		@type	calculator: L{UpgradeCalculator}
+		@param	calculator: the upgrades to share with other GLSAs
 		@rtype:		List of Strings
 		@return:	list of package-versions that have to be merged
 		"""
-		return list(set(update for (vuln, update) in self.getAffectionTable(least_change) if update))
+		return list(set(update for (vuln, update) in self.getAffectionTable(least_change, calculator) if update))
 
-	def getAffectionTable(self, least_change=True):
+	def getAffectionTable(self, least_change=True, calculator=None):
 		"""
 		Will initialize the self.systemAffection list of
 		atoms installed on the system that are affected
 		by this GLSA, and the atoms that are minimal upgrades.
+
+		@type	calculator: L{UpgradeCalculator}
+		@param	calculator: the upgrades to share with other GLSAs
 		"""
+		if calculator is None:
+			# still share the matches between the packages of this GLSA
+			calculator = UpgradeCalculator()
 		systemAffection = []
 		for pkg in self.packages.keys():
 			for path in self.packages[pkg]:
-				update = getMinUpgrade(path["vul_atoms"], path["unaff_atoms"], minimize=least_change)
+				update = calculator.getMinUpgrade(path["vul_atoms"], path["unaff_atoms"], minimize=least_change)
 				if update:
 					systemAffection.extend(update)
 		return systemAffection
+
+class VulnerabilityTester(object):
+	"""
+	Tests many GLSAs against the installed packages. The installed
+	packages are indexed once, so GLSAs about packages which are not
+	installed are dismissed without any version matching, and the
+	matches are shared between all GLSAs.
+	"""
+	def __init__(self, myconfig, vardb=None, matcher=None):
+		"""
+		@type	myconfig: portage.config
+		@param	myconfig: a GLSA aware config instance (see L{checkconfig})
+		@type	vardb: portage.dbapi
+		@param	vardb: defaults to portage.db[portage.root]["vartree"].dbapi
+		@type	matcher: L{Matcher}
+		@param	matcher: defaults to a new L{Matcher} of I{vardb}
+		"""
+		self.config = myconfig
+		if vardb is None:
+			vardb = portage.db[portage.root]["vartree"].dbapi
+		if matcher is None:
+			matcher = Matcher({"vartree": vardb})
+		self.matcher = matcher
+		# the installed package versions and packages
+		self.cpvs = frozenset(vardb.cpv_all())
+		self.installed = frozenset(portage.cpv_getkey(cpv) for cpv in self.cpvs)
+
+	def isAffected(self, myglsa):
+		"""
+		@rtype:		Boolean
+		@return:	True if any package of I{myglsa} is installed,
+					whatever its version
+		"""
+		for k in myglsa.packages:
+			if k in self.installed:
+				return True
+		return False
+
+	def isVulnerable(self, myglsa):
+		"""
+		Same as L{Glsa.isVulnerable}.
+
+		@rtype:		Boolean
+		"""
+		if not self.isAffected(myglsa):
+			return False
+		return myglsa.isVulnerable(matcher=self.matcher)
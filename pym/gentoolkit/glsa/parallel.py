@@ -0,0 +1,136 @@
+# $Header$
+
+# This program is licensed under the GPL, version 2
+
+"""
+Parsing and testing of GLSAs in a pool of worker processes.
+
+Each worker builds its own config, L{GlsaStore} and L{VulnerabilityTester}
+(and so its own portage dbapi), the records of the GLSAs it parsed are
+sent back and stored by the main process, along with the verdicts.  The
+results are yielded in the order of the GLSA IDs, as soon as they are
+available.
+"""
+
+from __future__ import unicode_literals
+
+from multiprocessing import Pool
+
+import portage
+
+from gentoolkit.glsa import checkconfig, GlsaTypeException, \
+	GlsaFormatException, VulnerabilityTester
+from gentoolkit.glsa.store import compileGlsa, CompiledGlsa, GlsaStore
+
+
+# (store, tester) of a worker process
+_worker = None
+
+def _initWorker(myconfig, vardb):
+	global _worker
+	if myconfig is None:
+		myconfig = checkconfig(portage.config(clone=portage.settings))
+	store = GlsaStore(myconfig)
+	store.load()
+	_worker = (store, VulnerabilityTester(myconfig, vardb))
+
+def _testItem(myid):
+	store, tester = _worker
+	signature = store.signature(myid)
+	try:
+		myglsa = store.get(myid)
+	except (GlsaTypeException, GlsaFormatException) as e:
+		return myid, signature, None, None, e
+	return myid, signature, compileGlsa(myglsa), tester.isVulnerable(myglsa), \
+		None
+
+
+class ParallelTester(object):
+	"""
+	Tests GLSAs with I{jobs} worker processes. The GLSAs which are not
+	stored (filenames, remote GLSAs) are tested in the main process.
+	"""
+	def __init__(self, store, tester, jobs=1, workerconfig=None,
+			workervardb=None):
+		"""
+		@type	store: GlsaStore
+		@param	store: the store of the main process, updated with the
+					GLSAs parsed by the workers
+		@type	tester: VulnerabilityTester
+		@param	tester: the tester of the main process
+		@type	jobs: Integer
+		@param	jobs: the number of worker processes, 1 to test in the
+					main process only
+		@type	workerconfig: Dict
+		@param	workerconfig: the config of the workers, by default they
+					build it from the portage settings
+		@type	workervardb: portage.dbapi
+		@param	workervardb: the vdb of the workers, by default they use
+					portage.db[portage.root]["vartree"].dbapi
+		"""
+		self.store = store
+		self.tester = tester
+		self.jobs = jobs
+		self.workerconfig = workerconfig
+		self.workervardb = workervardb
+		# {id: Boolean} of the GLSAs tested so far
+		self.verdicts = {}
+
+	def _testLocal(self, myid):
+		try:
+			myglsa = self.store.get(myid)
+		except (GlsaTypeException, GlsaFormatException) as e:
+			return myid, None, None, e
+		if myid not in self.verdicts:
+			self.verdicts[myid] = self.tester.isVulnerable(myglsa)
+		return myid, myglsa, self.verdicts[myid], None
+
+	def _merge(self, result):
+		myid, signature, record, vulnerable, error = result
+		if error is not None:
+			return myid, None, None, error
+		entry = self.store.entries.get(myid)
+		if entry is not None and entry[:2] == signature:
+			myglsa = CompiledGlsa(myid, self.store.config, entry[2])
+		else:
+			myglsa = self.store.add(myid, signature, record)
+		self.verdicts[myid] = vulnerable
+		return myid, myglsa, vulnerable, None
+
+	def test(self, myids):
+		"""
+		Tests the GLSAs I{myids}.
+
+		@type	myids: List
+		@param	myids: GLSA IDs or filenames
+		@rtype:		Iterator
+		@return:	(id, glsa, vulnerable, error) tuples in the order of
+					I{myids}, where glsa and vulnerable are None if the
+					GLSA could not be parsed, and error is the exception
+		"""
+		myids = list(myids)
+		pending = []
+		for myid in myids:
+			if myid not in self.verdicts and myid not in pending \
+					and self.store.isStorable(myid):
+				pending.append(myid)
+		if self.jobs < 2 or len(pending) < 2:
+			for myid in myids:
+				yield self._testLocal(myid)
+			return
+
+		pool = Pool(min(self.jobs, len(pending)), _initWorker,
+			(self.workerconfig, self.workervardb))
+		try:
+			chunksize = max(1, len(pending) // (4 * self.jobs))
+			results = pool.imap(_testItem, pending, chunksize)
+			pending = set(pending)
+			for myid in myids:
+				if myid in pending:
+					pending.discard(myid)
+					yield self._merge(next(results))
+				else:
+					yield self._testLocal(myid)
+		finally:
+			pool.terminate()
+			pool.join()
@@ -0,0 +1,143 @@
+# $Header$
+
+# This program is licensed under the GPL, version 2
+
+"""
+The state of the last glsa-check run, for incremental runs.
+
+The verdict of every tested GLSA is kept along with the signature of its
+file and the packages it is about, and the installed package versions
+are remembered.  On the next run, the verdict of a GLSA still holds if
+its file did not change and none of its packages was merged or unmerged
+in between, so only the other GLSAs have to be tested again.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import os
+
+import portage
+
+
+STATE_VERSION = 1
+
+
+class CheckState(object):
+	"""
+	The verdicts of the last runs, see the module documentation.
+	"""
+	def __init__(self, myconfig, filepath=None):
+		"""
+		@type	myconfig: portage.config
+		@param	myconfig: a GLSA aware config instance (see L{checkconfig})
+		@type	filepath: String
+		@param	filepath: the state file, defaults to the GLSA_STATE setting
+		"""
+		self.config = myconfig
+		if filepath is None:
+			filepath = myconfig["GLSA_STATE"]
+		self.filepath = filepath
+		# the installed package versions when the verdicts were made
+		self.installed = frozenset()
+		# {id: [mtime, size, verdict, [cp, ...]]}
+		self.glsas = {}
+
+	def load(self):
+		"""
+		Reads the state file, an unreadable or outdated state is
+		treated as empty.
+
+		@rtype:		Boolean
+		@return:	True if the state was loaded
+		"""
+		try:
+			myfile = open(self.filepath, "r")
+			try:
+				data = json.load(myfile)
+			finally:
+				myfile.close()
+		except (EnvironmentError, ValueError):
+			return False
+		if not isinstance(data, dict) or data.get("version") != STATE_VERSION \
+				or data.get("arch") != self.config["ARCH"]:
+			return False
+		self.installed = frozenset(data.get("installed", []))
+		self.glsas = data.get("glsas", {})
+		return True
+
+	def save(self):
+		"""
+		Writes the state file. Failures are silently ignored, as not
+		every user can write it.
+
+		@rtype:		Boolean
+		@return:	True if the state was written
+		"""
+		data = {"version": STATE_VERSION, "arch": self.config["ARCH"],
+			"installed": sorted(self.installed), "glsas": self.glsas}
+		tmp_path = self.filepath + ".new"
+		try:
+			dirname = os.path.dirname(self.filepath)
+			if dirname and not os.path.isdir(dirname):
+				os.makedirs(dirname)
+			myfile = open(tmp_path, "w")
+			try:
+				json.dump(data, myfile)
+			finally:
+				myfile.close()
+			os.rename(tmp_path, self.filepath)
+		except EnvironmentError:
+			return False
+		return True
+
+	def changedPackages(self, installed):
+		"""
+		@type	installed: Set
+		@param	installed: the package versions installed now
+		@rtype:		Set
+		@return:	the packages (cat/pkg) merged or unmerged since the
+					verdicts were made
+		"""
+		return set(portage.cpv_getkey(cpv)
+			for cpv in self.installed.symmetric_difference(installed))
+
+	def start(self, installed, store):
+		"""
+		Drops the verdicts which do not hold anymore.
+
+		@type	installed: Set
+		@param	installed: the package versions installed now
+		@type	store: GlsaStore
+		@param	store: the store giving the signatures of the GLSA files
+		@rtype:		Dict
+		@return:	{id: verdict} of the GLSAs which do not have to be
+					tested again
+		"""
+		installed = frozenset(installed)
+		changed = self.changedPackages(installed)
+		valid = {}
+		for myid, entry in self.glsas.items():
+			if entry[:2] != store.signature(myid) \
+					or changed.intersection(entry[3]):
+				continue
+			valid[myid] = entry
+		self.glsas = valid
+		self.installed = installed
+		return dict((myid, entry[2]) for myid, entry in valid.items())
+
+	def finish(self, verdicts, store):
+		"""
+		Remembers the verdicts of this run, for the GLSAs of the store.
+
+		@type	verdicts: Dict
+		@param	verdicts: {id: verdict} of the GLSAs tested since L{start}
+		@type	store: GlsaStore
+		@param	store: the store the GLSAs were taken from
+		"""
+		for myid, verdict in verdicts.items():
+			entry = store.entries.get(myid)
+			if entry is None:
+				continue
+			self.glsas[myid] = entry[:2] + [verdict,
+				sorted(entry[2]["packages"])]
@@ -0,0 +1,214 @@
+# $Header$
+
+# This program is licensed under the GPL, version 2
+
+"""
+A persistent store of pre-parsed GLSAs.
+
+Parsing an advisory with xml.dom.minidom is slow, so the fields needed to
+list and test GLSAs are extracted once and stored along with the mtime
+and size of the XML file.  Later runs build L{CompiledGlsa} objects from
+the store and only parse the files which changed.  The long text fields
+(description, workaround, ...) are not stored, they are read from the XML
+file when they are first accessed.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import os
+import re
+
+from gentoolkit.glsa import Glsa
+
+
+STORE_VERSION = 1
+
+# the fields of a Glsa which are kept in the store
+RECORD_FIELDS = ("title", "synopsis", "announced", "revised", "count",
+	"access", "bugs", "references", "glsatype", "product", "impact_type",
+	"packages", "dtdversion")
+
+# the fields which are only loaded from the XML file on demand
+LAZY_FIELDS = ("description", "workaround", "resolution", "impact_text",
+	"background", "DOM", "affected", "services")
+
+
+def compileGlsa(myglsa):
+	"""
+	Extracts the stored fields of a parsed GLSA.
+
+	@type	myglsa: Glsa
+	@param	myglsa: the parsed GLSA
+	@rtype:		Dict
+	@return:	the record of I{myglsa}
+	"""
+	return dict((key, getattr(myglsa, key)) for key in RECORD_FIELDS)
+
+
+class CompiledGlsa(Glsa):
+	"""
+	A L{Glsa} built from a stored record instead of its XML file. The
+	fields in L{LAZY_FIELDS} are read from the XML file on first access.
+	"""
+	def __init__(self, myid, myconfig, record):
+		"""
+		@type	myid: String
+		@param	myid: the GLSA ID
+		@type	myconfig: portage.config
+		@param	myconfig: the config that should be used for this object.
+		@type	record: Dict
+		@param	record: the record returned by L{compileGlsa}
+		"""
+		self.type = "id"
+		self.nr = myid
+		self.config = myconfig
+		for key in RECORD_FIELDS:
+			setattr(self, key, record[key])
+
+	def __getattr__(self, name):
+		if name not in LAZY_FIELDS:
+			raise AttributeError(name)
+		# parse() sets all the lazy fields
+		self.read()
+		return self.__dict__[name]
+
+
+class GlsaStore(object):
+	"""
+	The pre-parsed GLSAs of the GLSA_DIR, keyed by ID and by the mtime
+	and size of their files.
+	"""
+	def __init__(self, myconfig, filepath=None):
+		"""
+		@type	myconfig: portage.config
+		@param	myconfig: a GLSA aware config instance (see L{checkconfig})
+		@type	filepath: String
+		@param	filepath: the store file, defaults to the GLSA_STORE setting
+		"""
+		self.config = myconfig
+		if filepath is None:
+			filepath = myconfig["GLSA_STORE"]
+		self.filepath = filepath
+		# {id: [mtime, size, record]}
+		self.entries = {}
+		self.dirty = False
+
+	def load(self):
+		"""
+		Reads the store file, an unreadable or outdated store is
+		treated as empty.
+
+		@rtype:		Boolean
+		@return:	True if the store was loaded
+		"""
+		try:
+			myfile = open(self.filepath, "r")
+			try:
+				data = json.load(myfile)
+			finally:
+				myfile.close()
+		except (EnvironmentError, ValueError):
+			return False
+		if not isinstance(data, dict) or data.get("version") != STORE_VERSION:
+			return False
+		self.entries = data.get("glsas", {})
+		return True
+
+	def save(self):
+		"""
+		Writes the store file if GLSAs were parsed since it was loaded.
+		Failures are silently ignored, as not every user can write it.
+
+		@rtype:		Boolean
+		@return:	True if the store is up to date on disk
+		"""
+		if not self.dirty:
+			return True
+		data = {"version": STORE_VERSION, "glsas": self.entries}
+		tmp_path = self.filepath + ".new"
+		try:
+			dirname = os.path.dirname(self.filepath)
+			if dirname and not os.path.isdir(dirname):
+				os.makedirs(dirname)
+			myfile = open(tmp_path, "w")
+			try:
+				json.dump(data, myfile)
+			finally:
+				myfile.close()
+			os.rename(tmp_path, self.filepath)
+		except EnvironmentError:
+			return False
+		self.dirty = False
+		return True
+
+	def filename(self, myid):
+		"""
+		@rtype:		String
+		@return:	the path of the XML file of the GLSA I{myid}
+		"""
+		return os.path.join(self.config["GLSA_DIR"],
+			self.config["GLSA_PREFIX"] + myid + self.config["GLSA_SUFFIX"])
+
+	def signature(self, myid):
+		"""
+		@rtype:		List
+		@return:	the [mtime, size] of the XML file of the GLSA
+					I{myid}, or None if it does not exist
+		"""
+		try:
+			st = os.stat(self.filename(myid))
+		except EnvironmentError:
+			return None
+		return [st.st_mtime, st.st_size]
+
+	def isStorable(self, myid):
+		"""
+		@rtype:		Boolean
+		@return:	True if I{myid} is the ID of a local GLSA, which
+					can be stored
+		"""
+		return self.config["CHECKMODE"] == "local" \
+			and re.match(r'\d{6}-\d{2}$', myid) is not None
+
+	def add(self, myid, signature, record):
+		"""
+		Stores the record of a GLSA parsed elsewhere.
+
+		@type	myid: String
+		@param	myid: the GLSA ID
+		@type	signature: List
+		@param	signature: the [mtime, size] of its file when it was parsed
+		@type	record: Dict
+		@param	record: the record returned by L{compileGlsa}
+		@rtype:		CompiledGlsa
+		@return:	the GLSA
+		"""
+		self.entries[myid] = list(signature) + [record]
+		self.dirty = True
+		return CompiledGlsa(myid, self.config, record)
+
+	def get(self, myid):
+		"""
+		Returns the GLSA I{myid}, from the store if its file did not
+		change, else parsed from the file (and stored). Filenames and
+		remote GLSAs are not stored.
+
+		@type	myid: String
+		@param	myid: a GLSA ID or filename, like for L{Glsa}
+		@rtype:		Glsa
+		@return:	the GLSA
+		@raise GlsaTypeException, GlsaFormatException: see L{Glsa}
+		"""
+		if not self.isStorable(myid):
+			return Glsa(myid, self.config)
+		signature = self.signature(myid)
+		if signature is None:
+			return Glsa(myid, self.config)
+		entry = self.entries.get(myid)
+		if entry is not None and entry[:2] == signature:
+			return CompiledGlsa(myid, self.config, entry[2])
+		myglsa = Glsa(myid, self.config)
+		self.entries[myid] = signature + [compileGlsa(myglsa)]
+		self.dirty = True
+		return myglsa
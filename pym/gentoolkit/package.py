@@ -25,9 +25,12 @@ Example usage:
 """
 
 __all__ = (
+	'MaskEvaluator',
 	'Package',
 	'PackageFormatter',
-	'FORMAT_TMPL_VARS'
+	'FORMAT_TMPL_VARS',
+	'get_masking_status',
+	'template_fields'
 )
 
 # =======
@@ -44,6 +47,7 @@ FORMAT_TMPL_VARS = (
 # =======
 
 import os
+from itertools import groupby
 from string import Template
 
 import portage
@@ -56,6 +60,7 @@ from gentoolkit.cpv import CPV
 from gentoolkit.dbapi import PORTDB, VARDB
 from gentoolkit.keyword import determine_keyword
 from gentoolkit.flag import get_flags
+from gentoolkit.profiler import PROFILER
 
 # =======
 # Classes
@@ -177,28 +182,29 @@ class Package(CPV):
 		if isinstance(envvars, str):
 			got_string = True
 			envvars = (envvars,)
-		if prefer_vdb:
-			try:
-				result = VARDB.aux_get(self.cpv, envvars)
-			except KeyError:
+		with PROFILER.phase("metadata fetch"):
+			if prefer_vdb:
 				try:
-					if not fallback:
-						raise KeyError
-					result = PORTDB.aux_get(self.cpv, envvars)
+					result = VARDB.aux_get(self.cpv, envvars)
 				except KeyError:
-					err = "aux_get returned unexpected results"
-					raise errors.GentoolkitFatalError(err)
-		else:
-			try:
-				result = PORTDB.aux_get(self.cpv, envvars)
-			except KeyError:
+					try:
+						if not fallback:
+							raise KeyError
+						result = PORTDB.aux_get(self.cpv, envvars)
+					except KeyError:
+						err = "aux_get returned unexpected results"
+						raise errors.GentoolkitFatalError(err)
+			else:
 				try:
-					if not fallback:
-						raise KeyError
-					result = VARDB.aux_get(self.cpv, envvars)
+					result = PORTDB.aux_get(self.cpv, envvars)
 				except KeyError:
-					err = "aux_get returned unexpected results"
-					raise errors.GentoolkitFatalError(err)
+					try:
+						if not fallback:
+							raise KeyError
+						result = VARDB.aux_get(self.cpv, envvars)
+					except KeyError:
+						err = "aux_get returned unexpected results"
+						raise errors.GentoolkitFatalError(err)
 
 		if got_string:
 			return result[0]
@@ -234,18 +240,7 @@ class Package(CPV):
 			'missing keyword'
 		"""
 
-		if settings.locked:
-			settings.unlock()
-		try:
-			result = portage.getmaskingstatus(self.cpv,
-				settings=settings,
-				portdb=PORTDB)
-		except KeyError:
-			# getmaskingstatus doesn't support packages without ebuilds in the
-			# Portage tree.
-			result = None
-
-		return result
+		return get_masking_status(self.cpv)
 
 	def mask_reason(self):
 		"""Shortcut to L{portage.getmaskingreason}.
@@ -329,7 +324,8 @@ class Package(CPV):
 		@return: {'/full/path/to/obj': ['type', 'timestamp', 'md5sum'], ...}
 		"""
 
-		return self.dblink.getcontents()
+		with PROFILER.phase("contents parsing"):
+			return self.dblink.getcontents()
 
 	def size(self):
 		"""Estimates the installed size of the contents of this package.
@@ -385,6 +381,88 @@ class Package(CPV):
 		return self.cpv not in unmasked
 
 
+class MaskEvaluator(object):
+	"""Evaluate the masking status of many packages, sharing the work done
+	for the versions of a same cat/pkg.
+
+	The visible (unmasked) versions of a cat/pkg are found with a single
+	match-visible lookup, so L{portage.getmaskingstatus}, which looks up
+	package.mask, keywords and licenses again for each version, is only
+	called for the masked versions.
+
+	Example usage:
+		>>> evaluator = MaskEvaluator()
+		>>> evaluator.evaluate(['sys-devel/gcc-4.3.2-r3', 'sys-devel/gcc-4.4.3'])
+		{'sys-devel/gcc-4.3.2-r3': [], 'sys-devel/gcc-4.4.3': ['~amd64 keyword']}
+		>>> evaluator('sys-devel/gcc-4.4.3')
+		['~amd64 keyword']
+
+	@type portdb: portage.dbapi.porttree.portdbapi
+	@param portdb: the tree to look the ebuilds up in, defaults to PORTDB
+	"""
+
+	def __init__(self, portdb=None):
+		if portdb is None:
+			portdb = PORTDB
+		self.portdb = portdb
+		self.arch = Package.settings("ARCH")
+		# {cp: frozenset of the visible cpvs}
+		self._visible = {}
+		# {cpv: masking status}
+		self._status = {}
+
+	def __call__(self, cpv):
+		"""Return the masking status of a package.
+
+		@see: L{Package.mask_status}
+		@type cpv: str
+		@param cpv: cat/pkg-ver of the package
+		"""
+
+		try:
+			return self._status[cpv]
+		except KeyError:
+			pass
+		cp = portage.cpv_getkey(cpv)
+		if cp not in self._visible:
+			self._visible[cp] = self._match_visible(cp)
+		return self._evaluate(cpv, self._visible[cp])
+
+	def _match_visible(self, cp):
+		with PROFILER.phase("mask evaluation"):
+			return frozenset(self.portdb.xmatch("match-visible", cp))
+
+	def _evaluate(self, cpv, visible):
+		if cpv in visible:
+			result = []
+		else:
+			result = get_masking_status(cpv, self.portdb)
+		self._status[cpv] = result
+		return result
+
+	def evaluate(self, cpvs):
+		"""Evaluate the masking status of many packages at once.
+
+		@type cpvs: iterable
+		@param cpvs: cat/pkg-ver strings, sorted (or at least grouped by
+			cat/pkg)
+		@rtype: dict
+		@return: {cpv: masking status}
+		"""
+
+		result = {}
+		for cp, group in groupby(cpvs, portage.cpv_getkey):
+			visible = self._visible.get(cp)
+			if visible is None:
+				visible = self._visible[cp] = self._match_visible(cp)
+			for cpv in group:
+				if cpv in self._status:
+					result[cpv] = self._status[cpv]
+				else:
+					result[cpv] = self._evaluate(cpv, visible)
+		return result
+
+
 class PackageFormatter(object):
 	"""When applied to a L{gentoolkit.package.Package} object, determine the
 	location (Portage Tree vs. overlay), install status and masked status. That
@@ -409,22 +487,40 @@ class PackageFormatter(object):
 		Essentially C{do_format} should be set to False when piping or when
 		quiet output is desired. If C{do_format} is False, only the location
 		attribute will be created to save time.
+	@type mask_evaluator: L{MaskEvaluator}
+	@param mask_evaluator: if given, the masking status is taken from it
+		instead of being evaluated for this package only; share one between
+		the formatters of many packages.
+
+	Only the variables used by the template are evaluated, and only when
+	the package is first turned into a string.
 	"""
 
 	_tmpl_verbose = "[$location] [$mask] $cpv:$slot"
 	_tmpl_quiet = "$cpv"
 
-	def __init__(self, pkg, do_format=True, custom_format=None):
+	# {template string: (Template, variables used)}
+	_templates = {}
+
+	def __init__(self, pkg, do_format=True, custom_format=None,
+		mask_evaluator=None):
 		self._pkg = None
 		self._do_format = do_format
 		self._str = None
 		self._location = None
+		self._masking_status = None
+		self.mask_evaluator = mask_evaluator
 		if not custom_format:
 			if do_format:
 				custom_format = self._tmpl_verbose
 			else:
 				custom_format = self._tmpl_quiet
-		self.tmpl = Template(custom_format)
+		try:
+			self.tmpl, self.fields = self._templates[custom_format]
+		except KeyError:
+			self.tmpl = Template(custom_format)
+			self.fields = template_fields(self.tmpl)
+			self._templates[custom_format] = (self.tmpl, self.fields)
 		self.format_vars = LazyItemsDict()
 		self.pkg = pkg
 
@@ -442,6 +538,17 @@ class PackageFormatter(object):
 			self._location = self.format_package_location()
 		return self._location
 
+	@property
+	def masking_status(self):
+		"""Masking status of the package, see L{Package.mask_status}"""
+		if self._masking_status is None:
+			if self.mask_evaluator is not None:
+				status = self.mask_evaluator(self.pkg.cpv)
+			else:
+				status = self.pkg.mask_status()
+			self._masking_status = (status,)
+		return self._masking_status[0]
+
 	@property
 	def pkg(self):
 		"""Package to format"""
@@ -452,24 +559,28 @@ class PackageFormatter(object):
 		if self._pkg == value:
 			return
 		self._pkg = value
+		self._str = None
 		self._location = None
+		self._masking_status = None
 
 		fmt_vars = self.format_vars
 		self.format_vars.clear()
-		fmt_vars.addLazySingleton("location",
-			lambda: getattr(self, "location"))
-		fmt_vars.addLazySingleton("mask", self.format_mask)
-		fmt_vars.addLazySingleton("mask2", self.format_mask_status2)
-		fmt_vars.addLazySingleton("cpv", self.format_cpv)
-		fmt_vars.addLazySingleton("cp", self.format_cpv, "cp")
-		fmt_vars.addLazySingleton("category", self.format_cpv, "category")
-		fmt_vars.addLazySingleton("name", self.format_cpv, "name")
-		fmt_vars.addLazySingleton("version", self.format_cpv, "version")
-		fmt_vars.addLazySingleton("revision", self.format_cpv, "revision")
-		fmt_vars.addLazySingleton("fullversion", self.format_cpv,
-			"fullversion")
-		fmt_vars.addLazySingleton("slot", self.format_slot)
-		fmt_vars.addLazySingleton("repo", self.pkg.repo_name)
+		for name, func, args in (
+			("location", lambda: getattr(self, "location"), ()),
+			("mask", self.format_mask, ()),
+			("mask2", self.format_mask_status2, ()),
+			("cpv", self.format_cpv, ()),
+			("cp", self.format_cpv, ("cp",)),
+			("category", self.format_cpv, ("category",)),
+			("name", self.format_cpv, ("name",)),
+			("version", self.format_cpv, ("version",)),
+			("revision", self.format_cpv, ("revision",)),
+			("fullversion", self.format_cpv, ("fullversion",)),
+			("slot", self.format_slot, ()),
+			("repo", self.pkg.repo_name, ())
+		):
+			if name in self.fields:
+				fmt_vars.addLazySingleton(name, func, *args)
 
 	def format_package_location(self):
 		"""Get the install status (in /var/db/?) and origin (from an overlay
@@ -517,11 +628,15 @@ class PackageFormatter(object):
 		"""
 
 		result = 0
-		masking_status = self.pkg.mask_status()
+		masking_status = self.masking_status
 		if masking_status is None:
 			return (6, [])
 
-		if ("~%s keyword" % self.pkg.settings("ARCH")) in masking_status:
+		if self.mask_evaluator is not None:
+			arch = self.mask_evaluator.arch
+		else:
+			arch = self.pkg.settings("ARCH")
+		if ("~%s keyword" % arch) in masking_status:
 			result += 1
 		if "missing keyword" in masking_status:
 			result += 2
@@ -533,7 +648,7 @@ class PackageFormatter(object):
 	def format_mask_status2(self):
 		"""Get the mask status of a given package.
 		"""
-		mask = self.pkg.mask_status()
+		mask = self.masking_status
 		if mask:
 			return pp.masking(mask)
 		else:
@@ -571,4 +686,49 @@ class PackageFormatter(object):
 			return value
 
 
+# =========
+# Functions
+# =========
+
+def get_masking_status(cpv, portdb=None):
+	"""Shortcut to L{portage.getmaskingstatus}.
+
+	@see: L{Package.mask_status}
+	@type portdb: portage.dbapi.porttree.portdbapi
+	@param portdb: the tree to look the ebuild up in, defaults to PORTDB
+	@rtype: None or list
+	@return: None if the ebuild is not in the tree
+	"""
+
+	if portdb is None:
+		portdb = PORTDB
+	if settings.locked:
+		settings.unlock()
+	try:
+		with PROFILER.phase("mask evaluation"):
+			result = portage.getmaskingstatus(cpv,
+				settings=settings,
+				portdb=portdb)
+	except KeyError:
+		# getmaskingstatus doesn't support packages without ebuilds in the
+		# Portage tree.
+		result = None
+
+	return result
+
+
+def template_fields(tmpl):
+	"""Return the names of the variables used by a template.
+
+	@type tmpl: string.Template
+	@rtype: frozenset
+	"""
+
+	result = set()
+	for match in tmpl.pattern.finditer(tmpl.template):
+		name = match.group('named') or match.group('braced')
+		if name is not None:
+			result.add(name)
+	return frozenset(result)
+
 # vim: set ts=4 sw=4 tw=79:
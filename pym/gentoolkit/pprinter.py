@@ -38,6 +38,8 @@ import sys
 import locale
 
 import portage.output as output
+
+from gentoolkit.profiler import PROFILER
 from portage import archlist
 
 # =========
@@ -177,9 +179,10 @@ def uprint(*args, **kw):
 			else:
 				yield unicode(arg).encode(encoding, 'replace')
 
-	sep = sep.encode(encoding, 'replace')
-	end = end.encode(encoding, 'replace')
-	text = sep.join(encoded_args())
-	file.write(text + end)
+	with PROFILER.phase("output"):
+		sep = sep.encode(encoding, 'replace')
+		end = end.encode(encoding, 'replace')
+		text = sep.join(encoded_args())
+		file.write(text + end)
 
 # vim: set ts=4 sw=4 tw=79:
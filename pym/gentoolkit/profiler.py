@@ -0,0 +1,284 @@
+#!/usr/bin/python
+#
+# Copyright(c) 2010, Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+#
+# $Header$
+
+"""Phase timings and counters, to see where the time of a run goes.
+
+The tools start the L{PROFILER} when given --profile. The code worth
+measuring is wrapped in C{PROFILER.phase(name)} and events are counted with
+C{PROFILER.count(name)}; while the profiler is stopped, both return at once.
+
+Example usage:
+	>>> from gentoolkit.profiler import PROFILER
+	>>> PROFILER.start()
+	>>> with PROFILER.phase("query resolution"):
+	...     matches = Query('gcc').find()
+	>>> PROFILER.count("files hashed", 3)
+	>>> PROFILER.stop()
+	>>> PROFILER.report()
+"""
+
+__all__ = (
+	'PROFILER',
+	'Profiler'
+)
+__docformat__ = 'epytext'
+
+# =======
+# Imports
+# =======
+
+import os
+import sys
+import time
+
+try:
+	_cpu_time = time.process_time
+except AttributeError:
+	def _cpu_time():
+		times = os.times()
+		return times[0] + times[1]
+
+# =======
+# Classes
+# =======
+
+class _NullPhase(object):
+	"""What L{Profiler.phase} returns while the profiler is stopped."""
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		return False
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase(object):
+	"""Adds the wall and CPU time spent in a with block to a phase."""
+
+	def __init__(self, profiler, name):
+		self.profiler = profiler
+		self.name = name
+		self.wall = self.cpu = None
+
+	def __enter__(self):
+		active = self.profiler._active
+		depth = active.get(self.name, 0)
+		active[self.name] = depth + 1
+		if not depth:
+			# Only the outermost of nested phases of the same name is timed
+			self.profiler._record(self.name)
+			self.wall = time.time()
+			self.cpu = _cpu_time()
+		return self
+
+	def __exit__(self, *exc_info):
+		active = self.profiler._active
+		active[self.name] -= 1
+		if self.wall is not None:
+			self.profiler.add_time(self.name, time.time() - self.wall,
+				_cpu_time() - self.cpu)
+		return False
+
+
+class Profiler(object):
+	"""Records the wall and CPU time spent in named phases, counters of
+	events, and, if asked for, a cProfile dump of the whole run.
+
+	Phases are reported in the order they were first entered. Phases of
+	different names may nest, the time of the inner ones is then included in
+	the outer ones.
+	"""
+
+	def __init__(self):
+		self.enabled = False
+		# {name: [calls, wall time, CPU time]}
+		self.phases = {}
+		self.phase_order = []
+		# {name: count}
+		self.counters = {}
+		self.wall = self.cpu = 0.0
+		self.dump_path = None
+		self._active = {}
+		self._start = None
+		self._profile = None
+		# [(object, attribute, original value or None)]
+		self._patches = []
+
+	def start(self, dump_path=None):
+		"""Start recording.
+
+		@type dump_path: str
+		@param dump_path: if given, also run cProfile and write its stats
+			there (see the pstats module) when stopped
+		"""
+
+		if self.enabled:
+			return
+		self.enabled = True
+		self.dump_path = dump_path
+		self.count_calls(os, 'stat', 'stat calls')
+		self.count_calls(os, 'lstat', 'stat calls')
+		self._start = (time.time(), _cpu_time())
+		if dump_path:
+			import cProfile
+			self._profile = cProfile.Profile()
+			self._profile.enable()
+
+	def stop(self):
+		"""Stop recording, restore what was wrapped by L{count_calls} and
+		write the cProfile dump.
+
+		@raise EnvironmentError: if the dump could not be written
+		"""
+
+		if not self.enabled:
+			return
+		self.enabled = False
+		if self._profile is not None:
+			self._profile.disable()
+		self.wall += time.time() - self._start[0]
+		self.cpu += _cpu_time() - self._start[1]
+		while self._patches:
+			obj, attr, orig = self._patches.pop()
+			if orig is None:
+				delattr(obj, attr)
+			else:
+				setattr(obj, attr, orig)
+		if self._profile is not None:
+			profile, self._profile = self._profile, None
+			profile.dump_stats(self.dump_path)
+
+	def phase(self, name):
+		"""Return a context manager timing its block as part of phase name.
+
+		@type name: str
+		@rtype: context manager
+		"""
+
+		if not self.enabled:
+			return _NULL_PHASE
+		return _Phase(self, name)
+
+	def add_time(self, name, wall, cpu):
+		"""Add a call of phase name, which took wall and cpu seconds."""
+
+		record = self._record(name)
+		record[0] += 1
+		record[1] += wall
+		record[2] += cpu
+
+	def _record(self, name):
+		"""Return the [calls, wall, cpu] record of phase name."""
+
+		try:
+			return self.phases[name]
+		except KeyError:
+			record = self.phases[name] = [0, 0.0, 0.0]
+			self.phase_order.append(name)
+			return record
+
+	def count(self, name, increment=1):
+		"""Add increment to counter name."""
+
+		if self.enabled:
+			self.counters[name] = self.counters.get(name, 0) + increment
+
+	def count_calls(self, obj, attr, name):
+		"""Count the calls of obj.attr (a function of a module or a method of
+		an instance) in counter name, until the profiler is stopped.
+
+		@rtype: bool
+		@return: False if obj.attr can not be wrapped
+		"""
+
+		if not self.enabled:
+			return False
+		try:
+			func = getattr(obj, attr)
+		except AttributeError:
+			return False
+		# Restore module functions, remove wrappers shadowing methods
+		orig = getattr(obj, '__dict__', {}).get(attr)
+		counters = self.counters
+
+		def wrapper(*args, **kwargs):
+			counters[name] = counters.get(name, 0) + 1
+			return func(*args, **kwargs)
+
+		try:
+			setattr(obj, attr, wrapper)
+		except (AttributeError, TypeError):
+			return False
+		self._patches.append((obj, attr, orig))
+		return True
+
+	def count_dbapi_calls(self):
+		"""Count the aux_get calls of the Portage dbapis, initializing them
+		in the "dbapi init" phase if needed.
+		"""
+
+		with self.phase("dbapi init"):
+			from gentoolkit import dbapi
+		for db in (dbapi.PORTDB, dbapi.VARDB, dbapi.BINDB):
+			self.count_calls(db, 'aux_get', 'aux_get calls')
+
+	def summary(self):
+		"""Return the phase timings and counters as lines of text.
+
+		@rtype: list
+		"""
+
+		result = ["Profile: %.3fs wall, %.3fs CPU" % (self.wall, self.cpu)]
+		if self.phases:
+			width = max(len(x) for x in self.phase_order)
+			result.append("  %s  %8s  %9s  %9s" %
+				("phase".ljust(width), "calls", "wall", "CPU"))
+			for name in self.phase_order:
+				calls, wall, cpu = self.phases[name]
+				result.append("  %s  %8d  %8.3fs  %8.3fs" %
+					(name.ljust(width), calls, wall, cpu))
+		if self.counters:
+			width = max(len(x) for x in self.counters)
+			for name in sorted(self.counters):
+				result.append("  %s  %8d" %
+					(name.ljust(width), self.counters[name]))
+		if self.dump_path:
+			result.append("cProfile stats written to %s" % self.dump_path)
+		return result
+
+	def report(self, out=None):
+		"""Write the L{summary} to out, stderr by default."""
+
+		if out is None:
+			out = sys.stderr
+		out.write('\n'.join(self.summary()) + '\n')
+
+	def finish(self, out=None):
+		"""Stop and L{report}, at the end of the run of a tool. Does nothing
+		if the profiler was not started."""
+
+		if not self.enabled:
+			return
+		if out is None:
+			out = sys.stderr
+		try:
+			self.stop()
+		except EnvironmentError as err:
+			out.write("!!! Could not write the cProfile stats to %s: %s\n" %
+				(self.dump_path, err))
+			self.dump_path = None
+		self.report(out)
+
+# =======
+# Globals
+# =======
+
+PROFILER = Profiler()
+
+# vim: set ts=4 sw=4 tw=79:
@@ -31,6 +31,7 @@ from gentoolkit.atom import Atom
 from gentoolkit.cpv import CPV
 from gentoolkit.dbapi import PORTDB, VARDB
 from gentoolkit.package import Package
+from gentoolkit.profiler import PROFILER
 from gentoolkit.sets import get_set_atoms, SETPREFIX
 
 # =======
@@ -156,18 +157,19 @@ class Query(CPV):
 				"Nothing to do."
 			)
 
-		if self.query_type == "set":
-			self.package_finder = simple_package_finder
-			matches = self._do_set_lookup(show_progress=show_progress)
-		elif self.query_type == "simple":
-			self.package_finder = simple_package_finder
-			matches = self._do_simple_lookup(
-				in_installed=in_installed,
-				show_progress=show_progress
-			)
-		else:
-			self.package_finder = complex_package_finder
-			matches = self._do_complex_lookup(show_progress=show_progress)
+		with PROFILER.phase("query resolution"):
+			if self.query_type == "set":
+				self.package_finder = simple_package_finder
+				matches = self._do_set_lookup(show_progress=show_progress)
+			elif self.query_type == "simple":
+				self.package_finder = simple_package_finder
+				matches = self._do_simple_lookup(
+					in_installed=in_installed,
+					show_progress=show_progress
+				)
+			else:
+				self.package_finder = complex_package_finder
+				matches = self._do_complex_lookup(show_progress=show_progress)
 
 		if self.repo_filter is not None:
 			matches = self._filter_by_repository(matches)
@@ -188,12 +190,13 @@ class Query(CPV):
 			return []
 
 		try:
-			if include_masked:
-				matches = PORTDB.xmatch("match-all", self.query)
-			else:
-				matches = PORTDB.match(self.query)
-			if in_installed:
-				matches.extend(VARDB.match(self.query))
+			with PROFILER.phase("query resolution"):
+				if include_masked:
+					matches = PORTDB.xmatch("match-all", self.query)
+				else:
+					matches = PORTDB.match(self.query)
+				if in_installed:
+					matches.extend(VARDB.match(self.query))
 		except portage.exception.InvalidAtom as err:
 			message = "query.py: find(), query=%s, InvalidAtom=%s" %(
 				self.query, str(err))
@@ -205,7 +208,8 @@ class Query(CPV):
 		"""Return a list of Package objects that matched the search key."""
 
 		try:
-			matches = VARDB.match(self.query)
+			with PROFILER.phase("query resolution"):
+				matches = VARDB.match(self.query)
 		# catch the ambiguous package Exception
 		except portage.exception.AmbiguousPackageName as err:
 			matches = []
@@ -231,7 +235,8 @@ class Query(CPV):
 
 		best = keyworded = masked = None
 		try:
-			best = PORTDB.xmatch("bestmatch-visible", self.query)
+			with PROFILER.phase("query resolution"):
+				best = PORTDB.xmatch("bestmatch-visible", self.query)
 		except portage.exception.InvalidAtom as err:
 			message = "query.py: find_best(), bestmatch-visible, " + \
 				"query=%s, InvalidAtom=%s" %(self.query, str(err))
@@ -241,7 +246,8 @@ class Query(CPV):
 			if not (include_keyworded or include_masked):
 				return None
 			try:
-				matches = PORTDB.xmatch("match-all", self.query)
+				with PROFILER.phase("query resolution"):
+					matches = PORTDB.xmatch("match-all", self.query)
 			except portage.exception.InvalidAtom as err:
 				message = "query.py: find_best(), match-all, query=%s, InvalidAtom=%s" %(
 					self.query, str(err))
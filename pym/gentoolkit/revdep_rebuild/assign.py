@@ -0,0 +1,100 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright 2003-2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""Assignment of the broken files to the installed packages owning them.
+
+Portage's own path to owner index is used when the vardb provides one,
+otherwise the CONTENTS files are read until every broken file has been
+assigned.
+"""
+
+import io
+import os
+
+from portage.exception import PortageException
+from portage.output import bold, red
+
+
+VDB_PATH = '/var/db/pkg'
+
+
+def _contents_owned(contents, broken):
+    ''' Returns the paths of broken listed as obj entries in the
+        CONTENTS file contents
+    '''
+
+    owned = []
+    with io.open(contents, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if not line.startswith('obj '):
+                continue
+            # obj <path> <md5> <mtime>, the path may contain spaces
+            path = line[4:].rsplit(' ', 2)[0]
+            if path in broken:
+                owned.append(path)
+    return owned
+
+
+def _assign_from_vdb(broken, output, vdb_path):
+    assigned = set()
+    remaining = set(broken)
+    for group in sorted(os.listdir(vdb_path)):
+        group_path = os.path.join(vdb_path, group)
+        if not os.path.isdir(group_path):
+            continue
+        for pkg in sorted(os.listdir(group_path)):
+            f = os.path.join(group_path, pkg, 'CONTENTS')
+            if not os.path.exists(f):
+                continue
+            try:
+                owned = _contents_owned(f, remaining)
+            except EnvironmentError:
+                output(1, red(' !! Failed to read ' + f))
+                continue
+            if not owned:
+                continue
+            found = group + '/' + pkg
+            assigned.add(found)
+            for m in owned:
+                output(1, '\t' + m + ' -> ' + bold(found))
+            remaining.difference_update(owned)
+            if not remaining:
+                return assigned
+    return assigned
+
+
+def _assign_from_index(broken, output, vardb):
+    ''' The index also matches the sym and dir entries, only the obj
+        entries are kept, as _assign_from_vdb does
+    '''
+
+    owners = []
+    for dblink, path in vardb._owners.iter_owners(sorted(broken)):
+        entry = dblink.getcontents().get(path)
+        if entry is not None and entry[0] == 'obj':
+            owners.append((path, dblink.mycpv))
+    for path, found in owners:
+        output(1, '\t' + path + ' -> ' + bold(found))
+    return set(found for path, found in owners)
+
+
+def assign_packages(broken, output, vdb_path=VDB_PATH, vardb=None):
+    ''' Finds and returns packages that owns files placed in broken.
+        Broken is list of files
+        When vardb is given and has an owners index, it is used instead
+        of reading the CONTENTS files under vdb_path
+    '''
+
+    broken = set(broken)
+    if not broken:
+        return set()
+    if vardb is not None and getattr(vardb, '_owners', None) is not None:
+        try:
+            return _assign_from_index(broken, output, vardb)
+        except (EnvironmentError, KeyError, PortageException) as e:
+            output(2, red(' !! Failed to use the vdb owners index: %s: %s'
+                % (e.__class__.__name__, e)))
+    return _assign_from_vdb(broken, output, vdb_path)
@@ -0,0 +1,185 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright 2003-2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""Per-file caches of the ELF dynamic linking information and of the
+libtool archive dependencies.
+
+Every scanned file is stored with its (inode, mtime, size) signature, so a
+later run only reads the files which appeared or changed since, and the
+caches never have to expire as a whole.
+"""
+
+import json
+import os
+
+from gentoolkit.revdep_rebuild.elf import ElfInfo, scan_files
+from gentoolkit.revdep_rebuild.la import DEFAULT_JOBS, iter_la_files
+
+
+CACHE_VERSION = 1
+
+
+def file_signature(path):
+    ''' Returns the [inode, mtime, size] of the file at path (following
+        symlinks), or None if it can not be stat'ed
+    '''
+
+    try:
+        st = os.stat(path)
+    except EnvironmentError:
+        return None
+    return [st.st_ino, st.st_mtime, st.st_size]
+
+
+def _to_info(values):
+    if values is None:
+        return None
+    elfclass, machine, soname, needed, rpath, runpath = values
+    return ElfInfo(elfclass, machine, soname, tuple(needed), tuple(rpath),
+        tuple(runpath))
+
+
+class FileCache(object):
+    ''' Base class of the caches of per-file data, keyed by path and
+        signature.  Subclasses convert the stored data with _decode.
+    '''
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        # {path: [inode, mtime, size, data]}
+        self.entries = {}
+        # statistics of the last scan()
+        self.reused = 0
+        self.read = 0
+
+    def _decode(self, data):
+        return data
+
+    def load(self):
+        ''' Reads the cache file, an unreadable or outdated cache
+            is treated as empty.
+            Returns True if the cache was loaded
+        '''
+
+        try:
+            with open(self.filepath, 'r') as f:
+                data = json.load(f)
+        except (EnvironmentError, ValueError):
+            return False
+        if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+            return False
+        entries = {}
+        try:
+            for path, entry in data.get('files', {}).items():
+                entries[path] = entry[:3] + [self._decode(entry[3])]
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+            # a malformed entry, the cache was not written by us
+            return False
+        self.entries = entries
+        return True
+
+    def save(self):
+        ''' Writes the cache file, atomically.
+            Returns True if it was written
+        '''
+
+        data = {'version': CACHE_VERSION, 'files': self.entries}
+        tmp_path = self.filepath + '.new'
+        try:
+            dirname = os.path.dirname(self.filepath)
+            if dirname and not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.rename(tmp_path, self.filepath)
+        except EnvironmentError:
+            return False
+        return True
+
+
+class ElfCache(FileCache):
+    ''' ElfInfo of the scanned files, keyed by path and signature.
+        Non ELF files are remembered as well, so they are not read again.
+    '''
+
+    def _decode(self, data):
+        return _to_info(data)
+
+    def scan(self, paths, jobs=None):
+        ''' Like elf.scan_files, but only reads the files whose signature
+            changed since they were cached.  Entries of the files which
+            are not in paths anymore are dropped.
+            Returns a dict of {path: ElfInfo}, without the non ELF files
+        '''
+
+        result = {}
+        entries = {}
+        stale = {}
+        for path in paths:
+            signature = file_signature(path)
+            if signature is None:
+                continue
+            entry = self.entries.get(path)
+            if entry is not None and entry[:3] == signature:
+                entries[path] = entry
+                if entry[3] is not None:
+                    result[path] = entry[3]
+            else:
+                stale[path] = signature
+
+        scanned = scan_files(stale, jobs)
+        for path, signature in stale.items():
+            info = scanned.get(path)
+            entries[path] = signature + [info]
+            if info is not None:
+                result[path] = info
+
+        self.entries = entries
+        self.reused = len(entries) - len(stale)
+        self.read = len(stale)
+        return result
+
+
+class LaCache(FileCache):
+    ''' dependency_libs of the libtool archives, keyed by path and
+        signature.
+    '''
+
+    def _decode(self, data):
+        if data is None:
+            return None
+        return tuple(data)
+
+    def scan(self, paths, jobs=DEFAULT_JOBS):
+        ''' Like la.iter_la_files, but only parses the files whose
+            signature changed since they were cached, the cached ones
+            are yielded first.  The entries are updated once the
+            iteration completes.
+            Yields (path, dependencies) of the readable archives
+        '''
+
+        entries = {}
+        stale = {}
+        for path in paths:
+            signature = file_signature(path)
+            if signature is None:
+                continue
+            entry = self.entries.get(path)
+            if entry is not None and entry[:3] == signature:
+                entries[path] = entry
+                if entry[3] is not None:
+                    yield path, entry[3]
+            else:
+                stale[path] = signature
+
+        for path, dependencies in iter_la_files(sorted(stale), jobs):
+            entries[path] = stale[path] + [dependencies]
+            if dependencies is not None:
+                yield path, dependencies
+
+        self.entries = entries
+        self.reused = len(entries) - len(stale)
+        self.read = len(stale)
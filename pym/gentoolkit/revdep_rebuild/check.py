@@ -0,0 +1,159 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright 2003-2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""Detection of the NEEDED entries which no system library satisfies.
+
+The libraries of one ABI are indexed once in a LibraryIndex, by file name
+(which is what the dynamic linker looks a NEEDED soname up by) and by full
+path, so every NEEDED entry is checked with a single hash lookup.
+
+The scanned objects are partitioned by ELF class once, and the ABI's are
+checked concurrently, in one process each.
+"""
+
+import os
+import re
+from multiprocessing import Pool
+
+from gentoolkit.revdep_rebuild.resolver import Resolver
+
+
+class LibraryIndex(object):
+    ''' Hash index of the libraries of one ABI, by file name and path '''
+
+    def __init__(self, libraries):
+        self.paths = frozenset(libraries)
+        self.names = frozenset(os.path.basename(l) for l in self.paths)
+
+    def __contains__(self, lib):
+        ''' lib is either a soname, as found in NEEDED entries,
+            or an absolute path
+        '''
+        if '/' in lib:
+            return lib in self.paths
+        return lib in self.names
+
+    def __len__(self):
+        return len(self.paths)
+
+
+def find_broken(found_libs, system_libraries, to_check):
+    ''' Search for broken libraries.
+        Check if system_libraries contains found_libs, where
+        system_libraries is a LibraryIndex (or a list of absolute paths)
+        and found_libs is list of library names.
+        With to_check, found_libs containing any of its names are returned
+        whether they are available or not.
+        Returns the ids of the broken found_libs, in increasing order
+    '''
+
+    if not to_check:
+        if not isinstance(system_libraries, LibraryIndex):
+            system_libraries = LibraryIndex(system_libraries)
+        return [i for i, f in enumerate(found_libs)
+            if f not in system_libraries]
+
+    # exact names are a hash lookup, the substring matches of all the
+    # names are found by a single scan of each found lib
+    to_check = frozenset(to_check)
+    contains = re.compile('|'.join(re.escape(tc) for tc in to_check)).search
+    return [i for i, f in enumerate(found_libs)
+        if f in to_check or os.path.basename(f) in to_check or contains(f)]
+
+
+def elf_files(files, elf_info, bits):
+    ''' Returns the files which are ELF objects of class bits (32 or 64),
+        like scanelf -M bits would do.
+        elf_info is the dict returned by elf.scan_files
+    '''
+
+    return [f for f in files if f in elf_info and elf_info[f].elfclass == bits]
+
+
+def prepare_checks(files_to_check, elf_info, bits):
+    ''' Returns found libraries and dependencies of the files_to_check
+        of ELF class bits, using the NEEDED entries from elf_info
+    '''
+
+    libs = [] # libs found in NEEDED entries
+    dependencies = [] # list of lists of files (from file_to_check) that uses
+                      # library (for dependencies[id] and libs[id] => id==id)
+    indexes = {} # library -> id
+
+    for f in elf_files(files_to_check, elf_info, bits):
+        for d in elf_info[f].needed:
+            if d in indexes:
+                dependencies[indexes[d]].append(f)
+            else:
+                indexes[d] = len(libs)
+                libs.append(d)
+                dependencies.append([f,])
+    return (libs, dependencies)
+
+
+def partition(elf_info):
+    ''' Splits elf_info by ELF class.
+        Returns a dict of {bits: {path: ElfInfo}}
+    '''
+
+    abis = {}
+    for path, info in elf_info.items():
+        abis.setdefault(info.elfclass, {})[path] = info
+    return abis
+
+
+def check_abi(bits, elf_info, files, libraries, conf_dirs, to_check,
+        scanned_dirs=()):
+    ''' Checks the files of the ABI of ELF class bits.
+        elf_info is the partition of that class, libraries the paths of
+        the libraries (and their symlinks) to look for NEEDED entries in,
+        with to_check the NEEDED entries are matched against its names
+        instead of being resolved.
+        Returns (libs, dependencies) of the broken libraries only
+    '''
+
+    libraries = LibraryIndex(elf_files(libraries, elf_info, bits))
+    if to_check:
+        found_libs, dependencies = prepare_checks(files, elf_info, bits)
+        broken = find_broken(found_libs, libraries, to_check)
+        return ([found_libs[b] for b in broken],
+            [dependencies[b] for b in broken])
+    # only the NEEDED entries ld.so would not resolve
+    resolver = Resolver(elf_info, bits, conf_dirs, scanned_dirs)
+    return resolver.unresolved(files, libraries.paths)
+
+
+def _check_abi_item(args):
+    return args[0], check_abi(*args)
+
+
+def check_abis(elf_info, files, libraries, conf_dirs, to_check, jobs=None):
+    ''' Checks every ABI found in elf_info, concurrently when there are
+        several of them.
+        Returns a list of (bits, libs, dependencies) sorted by bits,
+        with the broken libraries of each ABI
+    '''
+
+    scanned_dirs = frozenset(os.path.dirname(path) for path in elf_info)
+    abis = partition(elf_info)
+    tasks = []
+    for bits in sorted(abis):
+        abi_info = abis[bits]
+        tasks.append((bits, abi_info, [f for f in files if f in abi_info],
+            [l for l in libraries if l in abi_info], conf_dirs, to_check,
+            scanned_dirs))
+
+    if len(tasks) < 2 or jobs == 1:
+        results = [_check_abi_item(task) for task in tasks]
+    else:
+        pool = Pool(jobs or len(tasks))
+        try:
+            results = pool.map(_check_abi_item, tasks, 1)
+        finally:
+            pool.close()
+            pool.join()
+    return [(bits, libs, dependencies)
+        for bits, (libs, dependencies) in results]
@@ -0,0 +1,191 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright 2003-2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""Discovery of the libraries and binaries to check.
+
+Directories are read with scandir, so file types come from the directory
+entries instead of separate isdir/isfile/islink/stat calls, and each level
+of the tree is read by a pool of threads.  Found files are indexed in sets
+and dicts, so the membership tests do not grow with the number of files.
+"""
+
+import os
+import stat
+from multiprocessing.pool import ThreadPool
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+
+# number of directories read concurrently
+DEFAULT_JOBS = 8
+
+_EXEC_BITS = stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+
+# kinds of directory entries reported by _scan_dir
+LIBRARY = 0
+LIBRARY_LINK = 1
+LA_LIBRARY = 2
+EXECUTABLE = 3
+
+
+def _is_library(path):
+    return path.endswith('.so') or '.so.' in path
+
+
+def _iter_dir(d):
+    ''' Yields (path, is_dir, is_file, is_link, mode) of the entries of d,
+        is_dir and is_file follow symlinks, mode is None for symlinks
+    '''
+
+    if scandir is not None:
+        for entry in scandir(d):
+            try:
+                is_link = entry.is_symlink()
+                is_dir = entry.is_dir()
+                is_file = not is_dir and entry.is_file()
+                mode = None
+                if is_file and not is_link:
+                    mode = entry.stat(follow_symlinks=False).st_mode
+            except EnvironmentError:
+                continue
+            yield entry.path, is_dir, is_file, is_link, mode
+        return
+    for name in os.listdir(d):
+        path = os.path.join(d, name)
+        try:
+            lmode = os.lstat(path).st_mode
+            is_link = stat.S_ISLNK(lmode)
+            mode = is_link and os.stat(path).st_mode or lmode
+        except EnvironmentError:
+            continue
+        is_dir = stat.S_ISDIR(mode)
+        is_file = stat.S_ISREG(mode)
+        if is_link:
+            mode = None
+        yield path, is_dir, is_file, is_link, mode
+
+
+def _scan_dir(args):
+    ''' Reads one directory.
+        Returns (subdirectories, [(kind, path, realpath),...])
+    '''
+
+    d, mask, libraries = args
+    subdirs = []
+    found = []
+    try:
+        for l, is_dir, is_file, is_link, mode in _iter_dir(d):
+            if l in mask:
+                continue
+            if is_dir:
+                #we do not want scan symlink-directories
+                if not is_link:
+                    subdirs.append(l)
+            elif not is_file:
+                continue
+            elif libraries and _is_library(l):
+                if is_link:
+                    found.append((LIBRARY_LINK, l, os.path.realpath(l)))
+                else:
+                    found.append((LIBRARY, l, None))
+            elif libraries and l.endswith('.la'):
+                found.append((LA_LIBRARY, l, None))
+            elif not is_link and mode & _EXEC_BITS:
+                # sometimes there are binaries in libs' subdir,
+                # for example in nagios
+                found.append((EXECUTABLE, l, None))
+    except EnvironmentError:
+        pass
+    return subdirs, found
+
+
+def _walk(dirs, mask, libraries, jobs):
+    ''' Yields the entries found in dirs and their subdirectories,
+        reading each level of the tree in parallel threads
+    '''
+
+    mask = frozenset(mask)
+    level = [d for d in dirs if d not in mask]
+    pool = ThreadPool(max(1, jobs))
+    try:
+        while level:
+            next_level = []
+            for subdirs, found in pool.imap(_scan_dir,
+                    [(d, mask, libraries) for d in level]):
+                next_level.extend(subdirs)
+                for entry in found:
+                    yield entry
+            level = next_level
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+class _IndexedList(object):
+    ''' A list with a path -> position index '''
+
+    def __init__(self):
+        self.items = []
+        self.index = {}
+
+    def add(self, path):
+        ''' Appends path if missing, returns its position '''
+        try:
+            return self.index[path]
+        except KeyError:
+            i = self.index[path] = len(self.items)
+            self.items.append(path)
+            return i
+
+    def __contains__(self, path):
+        return path in self.index
+
+
+def collect_libraries(dirs, mask, jobs=DEFAULT_JOBS):
+    ''' Collects all libraries from specified list of directories.
+        mask is list of pathes, that are ommited in scanning, can be eighter single file or entire directory
+        Returns tuple composed of: list of libraries, list of la libraries,
+        list of symlinks, and list of pairs (symlink_id, library_id) for
+        resolving dependencies
+    '''
+
+    found_files = _IndexedList()
+    found_symlinks = _IndexedList()
+    found_la_files = _IndexedList()
+    symlink_pairs = []  # list of pairs symlink_id->library_id
+
+    for kind, l, abs_path in _walk(dirs, mask, True, jobs):
+        if kind == LA_LIBRARY:
+            found_la_files.add(l)
+            continue
+        if l in found_files or l in found_symlinks:
+            continue
+        if kind == LIBRARY_LINK:
+            symlink_pairs.append((found_symlinks.add(l),
+                found_files.add(abs_path)))
+        else:
+            found_files.add(l)
+
+    return (found_files.items, found_la_files.items, found_symlinks.items,
+        symlink_pairs)
+
+
+def collect_binaries(dirs, mask, jobs=DEFAULT_JOBS):
+    ''' Collects all binaries from specified list of directories.
+        mask is list of pathes, that are ommited in scanning, can be eighter single file or entire directory
+        Returns list of binaries
+    '''
+
+    found_files = _IndexedList()
+    for kind, l, abs_path in _walk(dirs, mask, False, jobs):
+        found_files.add(l)
+    return found_files.items
@@ -0,0 +1,198 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright 2003-2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""In-process reader for the dynamic linking information of ELF objects.
+
+Only the ELF header, the program headers and the dynamic section are read
+(through mmap), which is all revdep-rebuild needs: the ELF class, DT_NEEDED,
+DT_SONAME, DT_RPATH and DT_RUNPATH.  It replaces forking scanelf with huge
+argument lists once per ABI.
+"""
+
+import mmap
+import struct
+from collections import namedtuple
+from multiprocessing import Pool, cpu_count
+
+
+ELFMAG = b'\x7fELF'
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+ELFDATA2LSB = 1
+ELFDATA2MSB = 2
+
+PT_LOAD = 1
+PT_DYNAMIC = 2
+
+DT_NULL = 0
+DT_NEEDED = 1
+DT_STRTAB = 5
+DT_SONAME = 14
+DT_RPATH = 15
+DT_RUNPATH = 29
+
+# below this number of files, a process pool costs more than it saves
+MIN_PARALLEL_FILES = 64
+
+
+# elfclass is 32 or 64, like the scanelf -M argument
+ElfInfo = namedtuple('ElfInfo',
+    'elfclass machine soname needed rpath runpath')
+
+
+class _Layout(object):
+    ''' struct formats of one ELF class and byte order '''
+
+    def __init__(self, elfclass, endian):
+        if elfclass == ELFCLASS32:
+            self.bits = 32
+            # e_type .. e_shstrndx, following e_ident
+            self.ehdr = struct.Struct(endian + 'HHIIIIIHHHHHH')
+            self.phdr = struct.Struct(endian + 'IIIIIIII')
+            self.dyn = struct.Struct(endian + 'iI')
+        else:
+            self.bits = 64
+            self.ehdr = struct.Struct(endian + 'HHIQQQIHHHHHH')
+            self.phdr = struct.Struct(endian + 'IIQQQQQQ')
+            self.dyn = struct.Struct(endian + 'qQ')
+
+    def program_header(self, data, offset):
+        ''' Returns (p_type, p_offset, p_vaddr, p_filesz) '''
+        fields = self.phdr.unpack_from(data, offset)
+        if self.bits == 32:
+            return fields[0], fields[1], fields[2], fields[4]
+        return fields[0], fields[2], fields[3], fields[5]
+
+
+_LAYOUTS = {}
+for _class in (ELFCLASS32, ELFCLASS64):
+    _LAYOUTS[(_class, ELFDATA2LSB)] = _Layout(_class, '<')
+    _LAYOUTS[(_class, ELFDATA2MSB)] = _Layout(_class, '>')
+
+
+def _read_string(data, offset):
+    end = data.find(b'\0', offset)
+    if end < 0:
+        end = len(data)
+    return data[offset:end].decode('utf-8', 'replace')
+
+
+def parse_elf(data):
+    ''' Parses the dynamic linking information out of the content of
+        an ELF object (a string or mmap).
+        Returns an ElfInfo, or None if data is not a valid ELF object
+    '''
+
+    if len(data) < 16 or data[:4] != ELFMAG:
+        return None
+    ident = bytearray(data[4:6])
+    layout = _LAYOUTS.get((ident[0], ident[1]))
+    if layout is None:
+        return None
+
+    try:
+        (e_type, e_machine, e_version, e_entry, e_phoff, e_shoff, e_flags,
+            e_ehsize, e_phentsize, e_phnum, e_shentsize, e_shnum,
+            e_shstrndx) = layout.ehdr.unpack_from(data, 16)
+
+        loads = []
+        dynamic = None
+        for i in range(e_phnum):
+            header = layout.program_header(data, e_phoff + i * e_phentsize)
+            if header[0] == PT_LOAD:
+                loads.append(header)
+            elif header[0] == PT_DYNAMIC:
+                dynamic = header
+    except struct.error:
+        return None
+
+    if dynamic is None:
+        # statically linked
+        return ElfInfo(layout.bits, e_machine, None, (), (), ())
+
+    entries = []
+    strtab = None
+    offset = dynamic[1]
+    end = min(offset + dynamic[3], len(data))
+    while offset + layout.dyn.size <= end:
+        tag, val = layout.dyn.unpack_from(data, offset)
+        offset += layout.dyn.size
+        if tag == DT_NULL:
+            break
+        elif tag == DT_STRTAB:
+            strtab = val
+        elif tag in (DT_NEEDED, DT_SONAME, DT_RPATH, DT_RUNPATH):
+            entries.append((tag, val))
+
+    # DT_STRTAB is a virtual address, find its offset in the file
+    strtab_offset = None
+    if strtab is not None:
+        for p_type, p_offset, p_vaddr, p_filesz in loads:
+            if p_vaddr <= strtab < p_vaddr + p_filesz:
+                strtab_offset = strtab - p_vaddr + p_offset
+                break
+    if strtab_offset is None:
+        return ElfInfo(layout.bits, e_machine, None, (), (), ())
+
+    soname = None
+    needed = []
+    rpath = []
+    runpath = []
+    for tag, val in entries:
+        string = _read_string(data, strtab_offset + val)
+        if tag == DT_NEEDED:
+            needed.append(string)
+        elif tag == DT_SONAME:
+            soname = string
+        elif tag == DT_RPATH:
+            rpath.extend(p for p in string.split(':') if p)
+        else:
+            runpath.extend(p for p in string.split(':') if p)
+
+    return ElfInfo(layout.bits, e_machine, soname, tuple(needed),
+        tuple(rpath), tuple(runpath))
+
+
+def read_elf(path):
+    ''' Reads the dynamic linking information of the file at path.
+        Returns an ElfInfo, or None if it is not a readable ELF object
+    '''
+
+    try:
+        with open(path, 'rb') as f:
+            if f.read(4) != ELFMAG:
+                return None
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (EnvironmentError, ValueError):
+        return None
+    try:
+        return parse_elf(data)
+    finally:
+        data.close()
+
+
+def _read_elf_item(path):
+    return path, read_elf(path)
+
+
+def scan_files(paths, jobs=None):
+    ''' Reads the dynamic linking information of all paths, in a pool
+        of jobs processes (defaults to the number of CPUs).
+        Returns a dict of {path: ElfInfo}, without the non ELF files
+    '''
+
+    paths = list(paths)
+    if len(paths) < MIN_PARALLEL_FILES or jobs == 1:
+        results = [_read_elf_item(path) for path in paths]
+    else:
+        pool = Pool(jobs)
+        try:
+            chunksize = max(1, len(paths) // (4 * (jobs or cpu_count())))
+            results = pool.map(_read_elf_item, paths, chunksize)
+        finally:
+            pool.close()
+            pool.join()
+    return dict((path, info) for path, info in results if info is not None)
@@ -0,0 +1,94 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright 2003-2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""Dependency analysis of libtool archives (.la files).
+
+The archives are parsed by a pool of threads and their dependency_libs
+are checked against hash sets of the known archives and libraries.
+"""
+
+import io
+import re
+from multiprocessing.pool import ThreadPool
+
+
+# number of files read concurrently
+DEFAULT_JOBS = 8
+
+_DEPENDENCY_LIBS = re.compile("dependency_libs='([^']+)'")
+
+
+def parse_la(path):
+    ''' Returns the tuple of libraries listed in the dependency_libs of
+        the libtool archive at path, without the linker flags,
+        or None if it can not be read
+    '''
+
+    dependencies = []
+    try:
+        with io.open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if not line.startswith('dependency_libs='):
+                    continue
+                m = _DEPENDENCY_LIBS.match(line)
+                if m is None:
+                    continue
+                for el in m.group(1).split(' '):
+                    el = el.strip()
+                    if el and not el.startswith('-'):
+                        dependencies.append(el)
+    except EnvironmentError:
+        return None
+    return tuple(dependencies)
+
+
+def _parse_la_item(path):
+    return path, parse_la(path)
+
+
+def iter_la_files(paths, jobs=DEFAULT_JOBS):
+    ''' Yields (path, dependencies) of the libtool archives in paths,
+        in order, as a pool of jobs threads parses them.
+        dependencies is None for the unreadable files
+    '''
+
+    paths = list(paths)
+    if not paths:
+        return
+    pool = ThreadPool(max(1, jobs))
+    try:
+        chunksize = max(1, len(paths) // (4 * max(1, jobs)))
+        for item in pool.imap(_parse_la_item, paths, chunksize):
+            yield item
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def broken_la(parsed, la_files, libraries, to_check):
+    ''' Yields (path, dependency) for every dependency of the parsed
+        archives which is neither a known archive nor a library.
+        parsed is an iterable of (path, dependencies), la_files the paths
+        of all the archives, libraries a LibraryIndex (or set of paths),
+        with to_check only the dependencies matching one of its names
+        are considered
+    '''
+
+    known = frozenset(la_files)
+    for path, dependencies in parsed:
+        if not dependencies:
+            continue
+        for el in dependencies:
+            if el in known or el in libraries:
+                continue
+            if to_check:
+                for tc in to_check:
+                    if tc in el:
+                        break
+                else:
+                    continue
+            yield path, el
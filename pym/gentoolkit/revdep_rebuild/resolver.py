@@ -0,0 +1,238 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright 2003-2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""Resolution of NEEDED entries the way the dynamic linker does it.
+
+Each NEEDED soname of an object is looked up in its DT_RPATH (unless it
+has a DT_RUNPATH), its DT_RUNPATH, the ld.so.conf directories in their
+order and the default directories, accepting only libraries of the same
+ELF class and machine.  LD_LIBRARY_PATH is deliberately ignored.  The
+RPATH's inherited from the loading executable are not known, so the
+NEEDED entries of libraries may also be satisfied by a library of that
+name anywhere in the ABI, as the consumer may have loaded it already.
+
+The scanned libraries are indexed per directory, and every resolution is
+memoized per (soname, search path), which most objects share.
+"""
+
+import glob
+import os
+import re
+
+from gentoolkit.revdep_rebuild.elf import read_elf
+
+try:
+    _string_types = (basestring,)
+except NameError:
+    # python-3.x
+    _string_types = (str,)
+
+
+_CONF_SEPARATORS = re.compile('[:,\\s]+')
+_INCLUDE = re.compile('include\\s')
+_DST = re.compile('\\$(ORIGIN|LIB|PLATFORM)\\b|\\$\\{(ORIGIN|LIB|PLATFORM)\\}')
+
+
+def parse_ld_conf(conf_file, visited=None):
+    ''' Parses an ld.so.conf file (or list of files) and its includes.
+        Returns the list of library directories, in the order ld.so
+        searches them
+    '''
+
+    if isinstance(conf_file, _string_types):
+        conf_file = [conf_file]
+    if visited is None:
+        visited = set()
+
+    lib_dirs = []
+    for conf in conf_file:
+        real_conf = os.path.realpath(conf)
+        if real_conf in visited:
+            continue
+        visited.add(real_conf)
+        try:
+            with open(conf) as f:
+                lines = f.readlines()
+        except EnvironmentError:
+            continue
+        for line in lines:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            if _INCLUDE.match(line):
+                for included in line.split()[1:]:
+                    if not included.startswith('/'):
+                        included = os.path.join(os.path.dirname(conf),
+                            included)
+                    lib_dirs.extend(parse_ld_conf(sorted(glob.glob(included)),
+                        visited))
+            elif line.startswith('hwcap'):
+                continue
+            else:
+                lib_dirs.extend(d for d in _CONF_SEPARATORS.split(line) if d)
+
+    return _unique(lib_dirs)
+
+
+def default_dirs(bits):
+    ''' Returns the trusted directories searched last for the libraries
+        of ELF class bits
+    '''
+
+    return ('/lib%d' % bits, '/usr/lib%d' % bits, '/lib', '/usr/lib')
+
+
+def _unique(dirs):
+    seen = set()
+    result = []
+    for d in dirs:
+        d = d.rstrip('/') or '/'
+        if d not in seen:
+            seen.add(d)
+            result.append(d)
+    return result
+
+
+class Resolver(object):
+    ''' Resolves the NEEDED entries of the objects of one ELF class.
+
+        elf_info is the dict returned by elf.scan_files, conf_dirs
+        the list returned by parse_ld_conf.  scanned_dirs are the
+        directories whose objects are all in elf_info, it defaults to
+        the directories of the objects in elf_info
+    '''
+
+    def __init__(self, elf_info, bits, conf_dirs, scanned_dirs=()):
+        self.elf_info = elf_info
+        self.bits = bits
+        self.conf_dirs = tuple(_unique(conf_dirs))
+        self.trusted_dirs = tuple(d for d in _unique(default_dirs(bits))
+            if d not in self.conf_dirs)
+        lib = 'lib%d' % bits
+        if not os.path.isdir('/' + lib):
+            lib = 'lib'
+        self._dst = {'LIB': lib, 'PLATFORM': os.uname()[4]}
+        # soname map of this ABI: {directory: {file name: machine}}
+        self._dirs = dict((d, {}) for d in scanned_dirs)
+        # (file name or soname, machine) of all the libraries of this ABI
+        self._provided = set()
+        for path, info in elf_info.items():
+            dirname, name = os.path.split(path)
+            names = self._dirs.setdefault(dirname, {})
+            if info.elfclass == bits:
+                names[name] = info.machine
+                self._provided.add((name, info.machine))
+                if info.soname:
+                    self._provided.add((info.soname, info.machine))
+        # {path: machine or None} of the files read outside of the map
+        self._extra = {}
+        # {(soname, search path, machine): path or None}
+        self._resolved = {}
+
+    def _expand(self, dirs, origin):
+        expanded = []
+        for d in dirs:
+            if '$' in d:
+                def replace(m):
+                    name = m.group(1) or m.group(2)
+                    if name == 'ORIGIN':
+                        return origin
+                    return self._dst[name]
+                d = _DST.sub(replace, d)
+            if not d.startswith('/'):
+                # relative entries are relative to the working directory
+                # of the process, they can not be checked
+                continue
+            expanded.append(os.path.normpath(d))
+        return expanded
+
+    def search_path(self, path, info):
+        ''' Returns the tuple of directories searched for the NEEDED
+            entries of the object at path
+        '''
+
+        dirs = []
+        origin = os.path.dirname(path)
+        if info.rpath and not info.runpath:
+            dirs.extend(self._expand(info.rpath, origin))
+        if info.runpath:
+            dirs.extend(self._expand(info.runpath, origin))
+        if not dirs:
+            return self.conf_dirs + self.trusted_dirs
+        return tuple(_unique(dirs)) + self.conf_dirs + self.trusted_dirs
+
+    def _machine(self, dirname, name):
+        names = self._dirs.get(dirname)
+        if names is not None:
+            return names.get(name)
+        # a directory which was not scanned
+        path = os.path.join(dirname, name)
+        try:
+            return self._extra[path]
+        except KeyError:
+            pass
+        machine = None
+        info = os.path.isfile(path) and read_elf(path)
+        if info and info.elfclass == self.bits:
+            machine = info.machine
+        self._extra[path] = machine
+        return machine
+
+    def resolve(self, soname, search_path, machine=None):
+        ''' Returns the path soname resolves to in search_path, or None.
+            With machine, libraries of other machines are skipped.
+        '''
+
+        key = (soname, search_path, machine)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+        result = None
+        if '/' in soname:
+            dirname, name = os.path.split(soname)
+            found = self._machine(dirname, name)
+            if found is not None and machine in (None, found):
+                result = soname
+        else:
+            for d in search_path:
+                found = self._machine(d, soname)
+                if found is not None and machine in (None, found):
+                    result = os.path.join(d, soname)
+                    break
+        self._resolved[key] = result
+        return result
+
+    def unresolved(self, files, libraries=()):
+        ''' Checks the NEEDED entries of the files of this ELF class.
+            A library may rely on its consumers' search path: the NEEDED
+            entries of the files in libraries are also satisfied by any
+            library of this ABI with that name, wherever it is.
+            Returns (libs, dependencies) like prepare_checks, with only
+            the libraries which could not be resolved and the files
+            needing them
+        '''
+
+        libs = []
+        dependencies = []
+        indexes = {}
+        for f in files:
+            info = self.elf_info.get(f)
+            if info is None or info.elfclass != self.bits or not info.needed:
+                continue
+            search_path = self.search_path(f, info)
+            for d in info.needed:
+                if self.resolve(d, search_path, info.machine) is not None:
+                    continue
+                if (d, info.machine) in self._provided and f in libraries:
+                    continue
+                if d in indexes:
+                    dependencies[indexes[d]].append(f)
+                else:
+                    indexes[d] = len(libs)
+                    libs.append(d)
+                    dependencies.append([f,])
+        return (libs, dependencies)
@@ -16,14 +16,19 @@ import sys
 import re
 import getopt
 import signal
-import stat
-import time
 import glob
 import portage
-import platform
 from portage import portdb
 from portage.output import bold, red, blue, yellow, green, nocolor
 
+from gentoolkit.revdep_rebuild.assign import assign_packages
+from gentoolkit.revdep_rebuild.cache import ElfCache, LaCache
+from gentoolkit.revdep_rebuild.collect import collect_binaries, collect_libraries
+from gentoolkit.revdep_rebuild.check import LibraryIndex, check_abis
+from gentoolkit.revdep_rebuild.elf import scan_files
+from gentoolkit.revdep_rebuild.la import broken_la, iter_la_files
+from gentoolkit.revdep_rebuild.resolver import parse_ld_conf
+
 APP_NAME = sys.argv[0]
 VERSION = '0.1-r3'
 
@@ -44,6 +49,8 @@ PRETEND = False     #pretend only
 EXACT = False      #exact package version
 USE_TMP_FILES = True #if program should use temporary files from previous run
 DEFAULT_TMP_DIR = '/tmp/revdep-rebuild' #cache default location
+DEFAULT_CACHE_FILE = os.path.join(DEFAULT_TMP_DIR, 'elf.cache')
+DEFAULT_LA_CACHE_FILE = os.path.join(DEFAULT_TMP_DIR, 'la.cache')
 VERBOSITY = 1      #verbosity level; 0-quiet, 1-norm., 2-verbose
 
 IS_DEV = True       #True for dev. version, False for stable
@@ -123,43 +130,7 @@ def parse_conf(conf_file=None, visited=None):
     if conf_file is None:
         conf_file = os.path.join(portage.root, DEFAULT_LD_FILE)
 
-    lib_dirs = set()
-    to_parse = set()
-
-    if isinstance(conf_file, basestring):
-        conf_file = [conf_file]
-
-    for conf in conf_file:
-        try:
-            with open(conf) as f:
-                for line in f.readlines():
-                    line = line.strip()
-                    if line.startswith('#'):
-                        continue
-                    elif line.startswith('include'):
-                        include_line = line.split()[1:]
-                        for included in include_line:
-                            if not included.startswith('/'):
-                                path = os.path.join(os.path.dirname(conf), \
-                                                    included)
-                            else:
-                                path = included
-
-                            to_parse = to_parse.union(glob.glob(path))
-                    else:
-                        lib_dirs.add(line)
-        except EnvironmentError:
-            print_v(2, 'Error when parsing file %s' %conf)
-
-    if visited is None:
-        visited = set()
-
-    visited = visited.union(conf_file)
-    to_parse = to_parse.difference(visited)
-    if to_parse:
-        lib_dirs = lib_dirs.union(parse_conf(to_parse, visited))
-
-    return lib_dirs
+    return set(parse_ld_conf(conf_file, visited))
 
 
 def prepare_search_dirs():
@@ -224,73 +195,7 @@ def collect_libraries_from_dir(dirs, mask):
         (symlink_id, library_id) for resolving dependencies
     '''
 
-
-    found_directories = []  # contains list of directories found; allow us to reduce number of fnc calls
-    found_files = []
-    found_symlinks = []
-    found_la_files = [] # la libraries
-    symlink_pairs = []  # list of pairs symlink_id->library_id
-
-    for d in dirs:
-        if d in mask:
-            continue
-
-        try:
-            for l in os.listdir(d):
-                l = os.path.join(d, l)
-                if l in mask:
-                    continue
-
-                if os.path.isdir(l):
-                    if os.path.islink(l):
-                        #we do not want scan symlink-directories
-                        pass
-                    else:
-                        found_directories.append(l)
-                elif os.path.isfile(l):
-                    if l.endswith('.so') or '.so.' in l:
-                        if l in found_files or l in found_symlinks:
-                            continue
-
-                        if os.path.islink(l):
-                            found_symlinks.append(l)
-                            abs_path = os.path.realpath(l)
-                            if abs_path in found_files:
-                                i = found_files.index(abs_path)
-                            else:
-                                found_files.append(abs_path)
-                                i = len(found_files)-1
-                            symlink_pairs.append((len(found_symlinks)-1, i,))
-                        else:
-                            found_files.append(l)
-                        continue
-                    elif l.endswith('.la'):
-                        if l in found_la_files:
-                            continue
-
-                        found_la_files.append(l)
-                    else:
-                        # sometimes there are binaries in libs' subdir, for example in nagios
-                        if not os.path.islink(l):
-                            if l in found_files or l in found_symlinks:
-                                continue
-                            prv = os.stat(l)[stat.ST_MODE]
-                            if prv & stat.S_IXUSR == stat.S_IXUSR or \
-                                    prv & stat.S_IXGRP == stat.S_IXGRP or \
-                                    prv & stat.S_IXOTH == stat.S_IXOTH:
-                                found_files.append(l)
-        except:
-            pass
-
-
-    if found_directories:
-        f,a,l,p = collect_libraries_from_dir(found_directories, mask)
-        found_files+=f
-        found_la_files+=a
-        found_symlinks+=l
-        symlink_pairs+=p
-
-    return (found_files, found_la_files, found_symlinks, symlink_pairs)
+    return collect_libraries(dirs, mask)
 
 
 def collect_binaries_from_dir(dirs, mask):
@@ -299,40 +204,7 @@ def collect_binaries_from_dir(dirs, mask):
         Returns list of binaries
     '''
 
-    found_directories = []  # contains list of directories found; allow us to reduce number of fnc calls
-    found_files = []
-
-    for d in dirs:
-        if d in mask:
-            continue
-
-        try:
-            for l in os.listdir(d):
-                l = os.path.join(d, l)
-                if d in mask:
-                    continue
-
-                if os.path.isdir(l):
-                    if os.path.islink(l):
-                        #we do not want scan symlink-directories
-                        pass
-                    else:
-                        found_directories.append(l)
-                elif os.path.isfile(l):
-                    #we're looking for binaries, and with binaries we do not need links, thus we can optimize a bit
-                    if not os.path.islink(l):
-                        prv = os.stat(l)[stat.ST_MODE]
-                        if prv & stat.S_IXUSR == stat.S_IXUSR or \
-                                prv & stat.S_IXGRP == stat.S_IXGRP or \
-                                prv & stat.S_IXOTH == stat.S_IXOTH:
-                            found_files.append(l)
-        except:
-            pass
-
-    if found_directories:
-        found_files += collect_binaries_from_dir(found_directories, mask)
-
-    return found_files
+    return collect_binaries(dirs, mask)
 
 
 def _match_str_in_list(lst, stri):
@@ -342,86 +214,22 @@ def _match_str_in_list(lst, stri):
     return False
 
 
-def prepare_checks(files_to_check, libraries, bits):
-    ''' Calls scanelf for all files_to_check, then returns found libraries and dependencies
+def extract_dependencies_from_la(la, libraries, to_check, cache=None):
+    ''' Checks the dependency_libs of the la archives.
+        libraries is a LibraryIndex of the known libraries, cache
+        a LaCache to reuse the archives parsed by previous runs
+        Returns the list of broken archives
     '''
 
-    libs = [] # libs found by scanelf
-    dependencies = [] # list of lists of files (from file_to_check) that uses
-                      # library (for dependencies[id] and libs[id] => id==id)
-
-    for line in call_program(['scanelf', '-M', str(bits), '-nBF', '%F %n',]+files_to_check).strip().split('\n'):
-        r = line.strip().split(' ')
-        if len(r) < 2: # no dependencies?
-            continue
-
-        deps = r[1].split(',')
-        for d in deps:
-            if d in libs:
-                i = libs.index(d)
-                dependencies[i].append(r[0])
-            else:
-                libs.append(d)
-                dependencies.append([r[0],])
-    return (libs, dependencies)
-
-
-def extract_dependencies_from_la(la, libraries, to_check):
-    broken = []
-    for f in la:
-        if not os.path.exists(f):
-            continue
-
-        for line in open(f, 'r').readlines():
-            line = line.strip()
-            if line.startswith('dependency_libs='):
-                m = re.match("dependency_libs='([^']+)'", line)
-                if m is not None:
-                    for el in m.group(1).split(' '):
-                        el = el.strip()
-                        if len(el) < 1 or el.startswith('-'):
-                            continue
-
-                        if el in la or el in libraries:
-                            pass
-                        else:
-                            if to_check:
-                                _break = False
-                                for tc in to_check:
-                                    if tc in el:
-                                        _break = True
-                                        break
-                                if not _break:
-                                    continue
-
-                            print_v(1, yellow(' * ') + f + ' is broken (requires: ' + bold(el))
-                            broken.append(f)
-    return broken
-
-
-
-def find_broken(found_libs, system_libraries, to_check):
-    ''' Search for broken libraries.
-        Check if system_libraries contains found_libs, where
-        system_libraries is list of obsolute pathes and found_libs
-        is list of library names.
-    '''
-
-    # join libraries and looking at it as string is way too faster than for-jumping
-
-    broken = []
-    sl = '|'.join(system_libraries)
-
-    if not to_check:
-        for f in found_libs:
-            if f+'|' not in sl:
-                broken.append(found_libs.index(f))
+    if cache is not None:
+        parsed = cache.scan(la)
     else:
-        for tc in to_check:
-            for f in found_libs:
-                if tc in f:# and f+'|' not in sl:
-                    broken.append(found_libs.index(f))
+        parsed = iter_la_files(la)
 
+    broken = []
+    for f, el in broken_la(parsed, la, libraries, to_check):
+        print_v(1, yellow(' * ') + f + ' is broken (requires: ' + bold(el))
+        broken.append(f)
     return broken
 
 
@@ -443,32 +251,6 @@ def main_checks(found_libs, broken, dependencies):
     return broken_pathes
 
 
-def assign_packages(broken, output):
-    ''' Finds and returns packages that owns files placed in broken.
-        Broken is list of files
-    '''
-    assigned = set()
-    for group in os.listdir('/var/db/pkg'):
-        for pkg in os.listdir('/var/db/pkg/' + group):
-            f = '/var/db/pkg/' + group + '/' + pkg + '/CONTENTS'
-            if os.path.exists(f):
-                try:
-                    with open(f, 'r') as cnt:
-                        for line in cnt.readlines():
-                            m = re.match('^obj (/[^ ]+)', line)
-                            if m is not None:
-                                m = m.group(1)
-                                if m in broken:
-                                    found = group+'/'+pkg
-                                    if found not in assigned:
-                                        assigned.add(found)
-                                    print_v(1, '\t' + m + ' -> ' + bold(found))
-                except:
-                    output(1, red(' !! Failed to read ' + f))
-
-    return assigned
-
-
 def get_best_match(cpv, cp):
     """Tries to find another version of the pkg with the same slot
     as the deprecated installed version.  Failing that attempt to get any version
@@ -522,48 +304,7 @@ def get_slotted_cps(cpvs):
     return cps
 
 
-def read_cache(temp_path=DEFAULT_TMP_DIR):
-    ''' Reads cache information needed by analyse function.
-        This function does not checks if files exists nor timestamps,
-        check_temp_files should be called first
-        @param temp_path: directory where all temp files should reside
-        @return tuple with values of: libraries, la_libraries, libraries_links, symlink_pairs, binaries
-    '''
-
-    ret = {'libraries':[], 'la_libraries':[], 'libraries_links':[], 'binaries':[]}
-    try:
-        for key,val in ret.iteritems():
-            f = open(os.path.join(temp_path, key))
-            for line in f.readlines():
-                val.append(line.strip())
-            #libraries.remove('\n')
-            f.close()
-    except EnvironmentError:
-        pass
-
-    return (ret['libraries'], ret['la_libraries'], ret['libraries_links'], ret['binaries'])
-
-
-def save_cache(to_save, temp_path=DEFAULT_TMP_DIR):
-    ''' Tries to store caching information.
-        @param to_save have to be dict with keys: libraries, la_libraries, libraries_links and binaries
-    '''
-
-    if not os.path.exists(temp_path):
-        os.makedirs(temp_path)
-
-    f = open(os.path.join(temp_path, 'timestamp'), 'w')
-    f.write(str(int(time.time())))
-    f.close()
-
-    for key,val in to_save.iteritems():
-        f = open(os.path.join(temp_path, key), 'w')
-        for line in val:
-            f.write(line + '\n')
-        f.close()
-
-
-def analyse(output=print_v, libraries=None, la_libraries=None, libraries_links=None, binaries=None):
+def analyse(output=print_v):
     """Main program body.  It will collect all info and determine the
     pkgs needing rebuilding.
 
@@ -572,26 +313,17 @@ def analyse(output=print_v, libraries=None, la_libraries=None, libraries_links=N
     @rtype list: list of pkgs that need rebuilding
     """
 
-    if libraries and la_libraries and libraries_links and binaries:
-        output(1, blue(' * ') + bold('Found a valid cache, skipping collecting phase'))
-    else:
-        #TODO: add partial cache (for ex. only libraries) when found for some reason
-
-        output(1, green(' * ') + bold('Collecting system binaries and libraries'))
-        bin_dirs, lib_dirs = prepare_search_dirs()
-
-        masked_dirs, masked_files, ld = parse_revdep_config()
-        lib_dirs = lib_dirs.union(ld)
-        bin_dirs = bin_dirs.union(ld)
-        masked_dirs = masked_dirs.union(set(['/lib/modules', '/lib32/modules', '/lib64/modules',]))
+    output(1, green(' * ') + bold('Collecting system binaries and libraries'))
+    bin_dirs, lib_dirs = prepare_search_dirs()
 
-        output(1, green(' * ') + bold('Collecting dynamic linking informations'))
-        libraries, la_libraries, libraries_links, symlink_pairs = collect_libraries_from_dir(lib_dirs, masked_dirs)
-        binaries = collect_binaries_from_dir(bin_dirs, masked_dirs)
-
-        if USE_TMP_FILES:
-            save_cache(to_save={'libraries':libraries, 'la_libraries':la_libraries, 'libraries_links':libraries_links, 'binaries':binaries})
+    masked_dirs, masked_files, ld = parse_revdep_config()
+    lib_dirs = lib_dirs.union(ld)
+    bin_dirs = bin_dirs.union(ld)
+    masked_dirs = masked_dirs.union(set(['/lib/modules', '/lib32/modules', '/lib64/modules',]))
 
+    output(1, green(' * ') + bold('Collecting dynamic linking informations'))
+    libraries, la_libraries, libraries_links, symlink_pairs = collect_libraries_from_dir(lib_dirs, masked_dirs)
+    binaries = collect_binaries_from_dir(bin_dirs, masked_dirs)
 
     output(2, 'Found '+ str(len(libraries)) + ' libraries (+' + str(len(libraries_links)) + ' symlinks) and ' + str(len(binaries)) + ' binaries')
 
@@ -604,63 +336,42 @@ def analyse(output=print_v, libraries=None, la_libraries=None, libraries_links=N
         #l.append(line)
     #libraries = l
 
-    found_libs = []
-    dependencies = []
-
-
-    _bits, linkg = platform.architecture()
-    if _bits.startswith('32'):
-        bits = 32
-    elif _bits.startswith('64'):
-        bits = 64
-
-    for av_bits in glob.glob('/lib[0-9]*') or ('/lib32',):
-        bits = int(av_bits[4:])
-        _libraries = call_program(['scanelf', '-M', str(bits), '-BF', '%F',] + libraries+libraries_links).strip().split('\n')
-
-        found_libs, dependencies = prepare_checks(libs_and_bins, _libraries, bits)
-
-        broken = find_broken(found_libs, _libraries, _libs_to_check)
-        broken_la = extract_dependencies_from_la(la_libraries, _libraries, _libs_to_check)
+    output(1, green(' * ') + bold('Reading ELF headers'))
+    if USE_TMP_FILES:
+        # only the files changed since the previous run are read
+        cache = ElfCache(DEFAULT_CACHE_FILE)
+        if cache.load():
+            output(1, blue(' * ') + bold('Found a valid cache, reading changed files only'))
+        elf_info = cache.scan(set(libs_and_bins + libraries_links))
+        output(2, 'Reused ' + str(cache.reused) + ' cached entries, read ' + str(cache.read) + ' files')
+        if not cache.save():
+            output(1, red(' !! Failed to write the cache ' + DEFAULT_CACHE_FILE))
+    else:
+        elf_info = scan_files(set(libs_and_bins + libraries_links))
 
-        bits /= 2
-        bits = int(bits)
+    conf_dirs = parse_ld_conf(os.path.join(portage.root, DEFAULT_LD_FILE))
 
-    broken_pathes = main_checks(found_libs, broken, dependencies)
-    broken_pathes += broken_la
+    # every ELF class found is checked, concurrently
+    broken_pathes = []
+    for bits, found_libs, dependencies in check_abis(elf_info, libs_and_bins,
+            libraries+libraries_links, conf_dirs, _libs_to_check):
+        output(2, 'Checked ' + str(bits) + 'bit objects')
+        broken_pathes += main_checks(found_libs, range(len(found_libs)), dependencies)
+
+    # .la files do not belong to one ABI, they are checked against all libraries
+    la_cache = None
+    if USE_TMP_FILES:
+        la_cache = LaCache(DEFAULT_LA_CACHE_FILE)
+        la_cache.load()
+    broken_pathes += extract_dependencies_from_la(la_libraries,
+        LibraryIndex(libraries+libraries_links), _libs_to_check, la_cache)
+    if la_cache is not None and not la_cache.save():
+        output(1, red(' !! Failed to write the cache ' + DEFAULT_LA_CACHE_FILE))
 
     output(1, green(' * ') + bold('Assign files to packages'))
 
-    return assign_packages(broken_pathes, output)
-
-
-def check_temp_files(temp_path=DEFAULT_TMP_DIR, max_delay=3600):
-    ''' Checks if temporary files from previous run are still available
-        and if they aren't too old
-        @param temp_path is directory, where temporary files should be found
-        @param max_delay is maximum time difference (in seconds) when those files
-                are still considered fresh and useful
-        returns True, when files can be used, or False, when they don't
-        exists or they are too old
-    '''
-
-    if not os.path.exists(temp_path) or not os.path.isdir(temp_path):
-        return False
-
-    timestamp_path = os.path.join(temp_path, 'timestamp')
-    if not os.path.exists(timestamp_path) or not os.path.isfile(timestamp_path):
-        return False
-
-    try:
-        f = open(timestamp_path)
-        timestamp = int(f.readline())
-        f.close()
-    except:
-        timestamp = 0
-        return False
-
-    diff = int(time.time()) - timestamp
-    return max_delay > diff
+    return assign_packages(broken_pathes, output,
+        vardb=portage.db[portage.root]['vartree'].dbapi)
 
 
 # Runs from here
@@ -717,13 +428,7 @@ if __name__ == "__main__":
     signal.signal(signal.SIGTERM, exithandler)
     signal.signal(signal.SIGPIPE, signal.SIG_DFL)
 
-    analyze_cache = {}
-    if USE_TMP_FILES and check_temp_files():
-        libraries, la_libraries, libraries_links, binaries = read_cache()
-        assigned = analyse(libraries=libraries, la_libraries=la_libraries, \
-                       libraries_links=libraries_links, binaries=binaries)
-    else:
-        assigned = analyse()
+    assigned = analyse()
 
     if not assigned:
         print_v(1, '\n' + bold('Your system is consistent'))
@@ -16,7 +16,9 @@ from getopt import gnu_getopt, GetoptError
 
 import unittest
 import os
+import shutil
 import sys
+from tempfile import mkdtemp
 
 import gentoolkit.pprinter as pp
 try:
@@ -24,7 +26,8 @@ try:
 except ImportError:
 	from test import support as test_support
 
-from gentoolkit.eclean.clean import CleanUp
+from gentoolkit.eclean.clean import CleanUp, freed_size
+from gentoolkit.eclean.output import OutputControl
 
 
 class Controllers(object):
@@ -95,6 +98,119 @@ class Controllers(object):
 		
 
 
+class TestCleanUpBatch(unittest.TestCase):
+	"""Tests the batched deletion and inode based size accounting"""
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		self.data = []
+		self.file_a = self._mkfile('a-1.0.tar.gz', 100)
+		self.file_b = os.path.join(self.dir, 'b-1.0.tar.gz')
+		os.link(self.file_a, self.file_b)
+		self.file_c = self._mkfile('c-1.0.tar.gz', 10)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def _mkfile(self, name, size):
+		path = os.path.join(self.dir, name)
+		file_ = open(path, 'w')
+		file_.write('x' * size)
+		file_.close()
+		return path
+
+	def controller(self, size, key, clean_list, file_type):
+		self.data.append([size, key, clean_list])
+		return True
+
+	def test_freed_size(self):
+		stats = [os.lstat(self.file_a), os.lstat(self.file_c)]
+		self.failUnlessEqual(freed_size(stats), 10)
+		stats.append(os.lstat(self.file_b))
+		self.failUnlessEqual(freed_size(stats), 110)
+
+	def test_clean_dist(self):
+		clean_dict = {'a': [self.file_a], 'b': [self.file_b],
+			'c': [self.file_c]}
+		cleaner = CleanUp(self.controller, jobs=2)
+		self.failUnlessEqual(cleaner.pretend_clean(clean_dict), 110)
+		self.data = []
+		self.failUnlessEqual(cleaner.clean_dist(clean_dict), 110)
+		self.failUnlessEqual([d[1] for d in self.data], ['a', 'b', 'c'])
+		self.failUnlessEqual(os.listdir(self.dir), [])
+
+	def test_clean_stream(self):
+		candidates = [(os.path.basename(path), [path], [os.lstat(path)])
+			for path in (self.file_a, self.file_b, self.file_c)]
+		declined = []
+		def controller(size, key, file_, file_type):
+			if key == 'c-1.0.tar.gz':
+				declined.append(file_)
+				return False
+			return True
+		cleaner = CleanUp(controller, jobs=2)
+		self.failUnlessEqual(cleaner.clean_stream(iter(candidates)), (100, 3))
+		self.failUnlessEqual(declined, [self.file_c])
+		self.failUnlessEqual(os.listdir(self.dir), ['c-1.0.tar.gz'])
+
+	def test_progress(self):
+		progress = []
+		def record(size, done, total):
+			progress.append((size, done, total))
+		clean_dict = {'a': [self.file_a, self.file_b], 'c': [self.file_c]}
+		cleaner = CleanUp(self.controller, jobs=2, progress=record)
+		self.failUnlessEqual(cleaner.clean_dist(clean_dict), 110)
+		# the running totals only grow and end with everything done
+		self.failUnlessEqual([p[1] for p in progress],
+			list(range(1, len(progress) + 1)))
+		self.failUnlessEqual(progress[-1], (110, 3, 3))
+		self.failUnless(all(p[0] <= 110 for p in progress))
+
+
+class FakeTerminal(list):
+	"""Collects what is written to it, as a terminal would"""
+
+	def write(self, text):
+		self.append(text)
+
+	def flush(self):
+		pass
+
+	def isatty(self):
+		return True
+
+
+class TestProgressStatus(unittest.TestCase):
+	"""Tests the status line drawn by OutputControl.progress_totals"""
+
+	def setUp(self):
+		self.stderr = sys.stderr
+		sys.stderr = FakeTerminal()
+		self.output = OutputControl({'interactive': False, 'pretend': False,
+			'quiet': True, 'accept_all': True, 'nocolor': True})
+
+	def tearDown(self):
+		sys.stderr = self.stderr
+
+	def test_cleared(self):
+		self.output.options['quiet'] = False
+		self.output.progress_totals(100, 1, 3)
+		self.failUnless(sys.stderr[-1].endswith("1/3 files done"))
+		self.output.clear_status()
+		self.failUnlessEqual(sys.stderr[-1], "\r\x1b[K")
+		# nothing is left to erase
+		del sys.stderr[:]
+		self.output.clear_status()
+		self.failUnlessEqual(sys.stderr, [])
+		self.output.progress_totals(100, 2, 3)
+		self.output.progress_totals(110, 3, 3)
+		self.failUnlessEqual(sys.stderr[-1], "\r\x1b[K")
+
+	def test_quiet(self):
+		self.output.progress_totals(100, 1, 3)
+		self.failUnlessEqual(sys.stderr, [])
+
+
 def useage():
 	"""output run options"""
 	print("Useage: test_clean [OPTONS] path=test-dir")
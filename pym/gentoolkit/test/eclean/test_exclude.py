@@ -0,0 +1,63 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+
+from __future__ import print_function
+
+
+import re
+import unittest
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.eclean.exclude import ExcludeMatcher, compileExclude
+
+"""Tests for eclean's compiled exclusion matching."""
+
+
+class TestExcludeMatcher(unittest.TestCase):
+
+	def setUp(self):
+		self.exclude = {
+			'categories': {},
+			'packages': {'app-misc/foo': None},
+			'anti-packages': {},
+			'filenames': {
+				'bar-.*': re.compile('bar-.*'),
+				r'(qux)+-1': re.compile(r'(qux)+-1'),
+				r'(baz)-\1': re.compile(r'(baz)-\1')
+			}
+		}
+
+	def tearDown(self):
+		pass
+
+	def test_backreferences(self):
+		matcher = ExcludeMatcher(self.exclude)
+		self.failUnless(matcher.match_filename('bar-1.0.tar.gz'))
+		self.failUnless(matcher.match_filename('baz-baz.tar.gz'))
+		self.failUnless(matcher.match_filename('quxqux-1.tar.gz'))
+		self.failIf(matcher.match_filename('baz-bar.tar.gz'))
+		self.failIf(matcher.match_filename('foo-1.0.tar.gz'))
+
+	def test_compile_cache(self):
+		matcher = compileExclude(self.exclude)
+		self.failUnless(compileExclude(dict(self.exclude)) is matcher)
+		self.failUnless(matcher.match_cp('app-misc/foo'))
+		# a changed dict is compiled again
+		self.exclude['anti-packages'] = {'app-misc/foo': None}
+		matcher = compileExclude(self.exclude)
+		self.failIf(matcher.match_cp('app-misc/foo'))
+
+
+def test_main():
+	test_support.run_unittest(TestExcludeMatcher)
+
+
+if __name__ == '__main__':
+	test_main()
@@ -0,0 +1,83 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+
+from __future__ import print_function
+
+
+import os
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.test.eclean.distsupport import Dbapi
+from gentoolkit.eclean.hosts import (exportInstalled, readHostsDir,
+	ParseHostsDirException)
+
+"""Tests for eclean's shared DISTDIR host lists."""
+
+
+class TestHostsDir(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		self.hosts = {
+			'alpha': ['app-portage/gentoolkit-0.3.0', 'sys-apps/portage-2.2'],
+			'beta': ['sys-apps/portage-2.2', 'dev-lang/python-2.6.6'],
+		}
+		self.props = {
+			'app-portage/gentoolkit-0.3.0': {'SRC_URI':
+				'mirror://gentoo/gentoolkit-0.3.0.tar.gz'},
+			'sys-apps/portage-2.2': {'SRC_URI':
+				'mirror://gentoo/portage-2.2.tar.bz2 '
+				'http://example.org/p.patch -> portage-2.2-fix.patch'},
+			'dev-lang/python-2.6.6': {'SRC_URI': ''},
+		}
+		for host, cpvs in self.hosts.items():
+			vardb = Dbapi(cpv_all=cpvs, props=self.props)
+			exportInstalled(os.path.join(self.dir, host), vardb=vardb)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_read_hosts_dir(self):
+		cpvs = readHostsDir(self.dir, lambda x: None)
+		self.failUnlessEqual(cpvs, {
+			'app-portage/gentoolkit-0.3.0':
+				frozenset(['gentoolkit-0.3.0.tar.gz']),
+			'dev-lang/python-2.6.6': frozenset(),
+			'sys-apps/portage-2.2':
+				frozenset(['portage-2.2.tar.bz2', 'portage-2.2-fix.patch'])
+		})
+
+	def test_cpv_only(self):
+		# lists of older versions, or cpv's the host could not look up
+		file_ = open(os.path.join(self.dir, 'gamma'), 'w')
+		file_.write('sys-apps/portage-2.2\napp-misc/foo-1.0\n')
+		file_.close()
+		cpvs = readHostsDir(self.dir, lambda x: None)
+		self.failUnlessEqual(cpvs['app-misc/foo-1.0'], None)
+		self.failUnlessEqual(cpvs['sys-apps/portage-2.2'],
+			frozenset(['portage-2.2.tar.bz2', 'portage-2.2-fix.patch']))
+
+	def test_invalid_cpv(self):
+		file_ = open(os.path.join(self.dir, 'gamma'), 'w')
+		file_.write('not-a-cpv\n')
+		file_.close()
+		self.failUnlessRaises(ParseHostsDirException, readHostsDir,
+			self.dir, lambda x: None)
+
+
+def test_main():
+	test_support.run_unittest(TestHostsDir)
+
+
+if __name__ == '__main__':
+	test_main()
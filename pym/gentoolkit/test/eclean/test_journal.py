@@ -0,0 +1,122 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+
+from __future__ import print_function
+
+
+import os
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.test.eclean.distsupport import Dbapi
+from gentoolkit.eclean.search import DistfilesSearch
+from gentoolkit.eclean.journal import DistfilesJournal
+
+"""Tests for eclean's incremental distfiles journal."""
+
+
+class JournalDbapi(Dbapi):
+	"""Fake porttree dbapi counting the aux_get() calls"""
+
+	porttrees = []
+
+	def __init__(self, ebuild, **kwargs):
+		Dbapi.__init__(self, **kwargs)
+		self.ebuild = ebuild
+		self.aux_get_calls = 0
+
+	def findname(self, cpv):
+		if cpv in self._props:
+			return self.ebuild
+		return None
+
+	def aux_get(self, cpv, prop_list):
+		self.aux_get_calls += 1
+		return Dbapi.aux_get(self, cpv, prop_list)
+
+
+class TestDistfilesJournal(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		self.ebuild = os.path.join(self.dir, 'foo-1.ebuild')
+		open(self.ebuild, 'w').close()
+		props = {
+			'app-misc/foo-1': {'SRC_URI': 'http://a/foo-1.tgz ' +
+				'http://b/foo-data.tgz -> foo-data-1.tgz', 'RESTRICT': ''},
+			'app-misc/bar-2': {'SRC_URI': 'http://a/bar-2.tgz',
+				'RESTRICT': ''},
+		}
+		self.portdb = JournalDbapi(self.ebuild, cpv_all=sorted(props),
+			props=props)
+		self.vardb = Dbapi(cpv_all=[], props={})
+		self.journal_file = os.path.join(self.dir, 'distfiles.journal')
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def run_search(self, cpvs):
+		journal = DistfilesJournal(self.journal_file, self.portdb)
+		journal.load()
+		engine = DistfilesSearch(lambda x: None, self.portdb, self.vardb,
+			journal=journal)
+		pkgs, deprecated = engine._unrestricted({}, cpvs)
+		clean_me = dict.fromkeys(['foo-1.tgz', 'foo-data-1.tgz',
+			'bar-2.tgz', 'unknown.tgz'])
+		return engine._remove_journaled(pkgs, clean_me)
+
+	def test_incremental(self):
+		cpvs = ['app-misc/foo-1', 'app-misc/bar-2']
+		self.failUnlessEqual(sorted(self.run_search(cpvs)), ['unknown.tgz'])
+		self.failUnlessEqual(self.portdb.aux_get_calls, 2)
+		# nothing changed, everything comes from the journal
+		self.failUnlessEqual(sorted(self.run_search(cpvs)), ['unknown.tgz'])
+		self.failUnlessEqual(self.portdb.aux_get_calls, 2)
+		# bar is no longer protected
+		self.failUnlessEqual(sorted(self.run_search(cpvs[:1])),
+			['bar-2.tgz', 'unknown.tgz'])
+		self.failUnlessEqual(self.portdb.aux_get_calls, 2)
+
+	def test_stream(self):
+		distdir = os.path.join(self.dir, 'distfiles')
+		os.mkdir(distdir)
+		for name in ('foo-1.tgz', 'bar-2.tgz', 'unknown.tgz'):
+			file_ = open(os.path.join(distdir, name), 'w')
+			file_.write(name)
+			file_.close()
+		journal = DistfilesJournal(self.journal_file, self.portdb)
+		journal.load()
+		engine = DistfilesSearch(lambda x: None, self.portdb, self.vardb,
+			journal=journal)
+		pkgs, deprecated = engine._unrestricted({}, ['app-misc/foo-1'])
+		engine._get_pkgs = lambda *args: (pkgs, {})
+		results = engine.iterDistfiles(_distdir=distdir)
+		self.failUnlessEqual(sorted(r[0] for r in results),
+			['bar-2.tgz', 'unknown.tgz'])
+		# the streaming run journals the stats of every entry
+		journal = DistfilesJournal(self.journal_file, self.portdb)
+		self.failUnless(journal.load())
+		self.failUnlessEqual(journal.files['foo-1.tgz'],
+			[9, int(os.lstat(os.path.join(distdir, 'foo-1.tgz')).st_mtime),
+			['app-misc/foo-1']])
+		self.failUnlessEqual(journal.files['unknown.tgz'][0], 11)
+		file_stats = dict((path, os.lstat(path)) for path in
+			[os.path.join(distdir, name) for name in os.listdir(distdir)])
+		self.failUnlessEqual(journal.changed_files(file_stats), 0)
+
+
+def test_main():
+	test_support.run_unittest(TestDistfilesJournal)
+
+
+if __name__ == '__main__':
+	test_main()
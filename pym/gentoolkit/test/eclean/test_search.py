@@ -15,6 +15,7 @@ from __future__ import print_function
 from tempfile import NamedTemporaryFile, mkdtemp
 import unittest
 import re
+import shutil
 
 try:
 	from test import test_support
@@ -24,6 +25,7 @@ except ImportError:
 from gentoolkit.test.eclean.distsupport import *
 import gentoolkit.eclean.search as search
 from gentoolkit.eclean.search import DistfilesSearch
+from gentoolkit.eclean.clean import CleanUp
 from gentoolkit.eclean.exclude import parseExcludeFile
 
 """Tests for eclean's distfiles search functions."""
@@ -617,6 +619,137 @@ class TestRemoveProtected(unittest.TestCase):
 			str(results) + "\ntestdata=" + str(self.results))
 
 
+class StreamSearch(DistfilesSearch):
+	"""DistfilesSearch protecting a fixed set of packages"""
+
+	def __init__(self, pkgs, journal=None):
+		DistfilesSearch.__init__(self, lambda x: None, Dbapi(), Dbapi(),
+			journal=journal)
+		self.pkgs = pkgs
+
+	def _get_pkgs(self, exclude, destructive, fetch_restricted,
+			package_names, hosts_cpvs):
+		return dict(self.pkgs), {}
+
+
+class TestIterDistfiles(unittest.TestCase):
+	"""tests the streaming eclean.search.DistfilesSearch.iterDistfiles()
+	"""
+
+	def setUp(self):
+		self.distdir = mkdtemp()
+		for name in ('foo-1.0.tar.gz', 'foo-2.0.tar.gz', 'bar-1.0.tar.gz',
+				'baz-1.0.tar.gz', 'keep-me.patch'):
+			file_ = open(os.path.join(self.distdir, name), 'w')
+			file_.write(name)
+			file_.close()
+		os.mkdir(os.path.join(self.distdir, 'cvs-src'))
+		self.pkgs = {'app-misc/foo-2.0': 'mirror://gentoo/foo-2.0.tar.gz'}
+		self.exclude = {
+			'categories': {},
+			'packages': {'app-misc/baz': None},
+			'anti-packages': {},
+			'filenames': {'keep-me.patch': re.compile('keep-me.patch')}
+		}
+
+	def tearDown(self):
+		shutil.rmtree(self.distdir)
+
+	def test_protected(self):
+		engine = StreamSearch(self.pkgs)
+		results = list(engine.iterDistfiles(_distdir=self.distdir))
+		self.failUnlessEqual(sorted(r[0] for r in results),
+			['bar-1.0.tar.gz', 'baz-1.0.tar.gz', 'foo-1.0.tar.gz',
+			'keep-me.patch'])
+		for name, paths, stats in results:
+			self.failUnlessEqual(paths, [os.path.join(self.distdir, name)])
+			self.failUnlessEqual(stats[0].st_size, len(name))
+
+	def test_excludes(self):
+		engine = StreamSearch(self.pkgs)
+		results = engine.iterDistfiles(exclude=self.exclude,
+			_distdir=self.distdir)
+		self.failUnlessEqual(sorted(r[0] for r in results),
+			['bar-1.0.tar.gz', 'foo-1.0.tar.gz'])
+		# the package name exclusions are saved, not just skipped
+		self.failUnlessEqual(engine.saved,
+			{'baz-1.0.tar.gz': [os.path.join(self.distdir, 'baz-1.0.tar.gz')]})
+		self.failUnlessEqual(engine.deprecated, {})
+
+	def test_clean_stream(self):
+		controller = lambda size, key, files, file_type: True
+		engine = StreamSearch(self.pkgs)
+		candidates = engine.iterDistfiles(exclude=self.exclude,
+			_distdir=self.distdir)
+		# pretend only tallies the candidates
+		self.failUnlessEqual(CleanUp(controller).clean_stream(candidates,
+			pretend=True), (28, 2))
+		self.failUnlessEqual(len(os.listdir(self.distdir)), 6)
+		candidates = engine.iterDistfiles(exclude=self.exclude,
+			_distdir=self.distdir)
+		self.failUnlessEqual(CleanUp(controller, jobs=2).clean_stream(
+			candidates), (28, 2))
+		self.failUnlessEqual(sorted(os.listdir(self.distdir)),
+			['baz-1.0.tar.gz', 'cvs-src', 'foo-2.0.tar.gz', 'keep-me.patch'])
+
+
+class TestHostsCpvs(unittest.TestCase):
+	"""tests the protection of the packages installed on other hosts
+	"""
+
+	def setUp(self):
+		self.distdir = mkdtemp()
+		for name in ('foo-1.0.tar.gz', 'foo-2.0.tar.gz', 'gone-1.0.tar.gz',
+				'gone-1.0-fix.patch'):
+			file_ = open(os.path.join(self.distdir, name), 'w')
+			file_.write(name)
+			file_.close()
+		props = {'app-misc/foo-2.0': {'SRC_URI':
+			'mirror://gentoo/foo-2.0.tar.gz', 'RESTRICT': ''}}
+		self.portdb = Dbapi(cp_all=['app-misc/foo'],
+			cpv_all=['app-misc/foo-2.0'], props=props, name='portdb')
+		self.vardb = Dbapi(cp_all=['app-misc/foo'],
+			cpv_all=['app-misc/foo-2.0'], props=props, name='vardb')
+		# app-misc/gone is only installed on a host, the server
+		# knows nothing about it anymore
+		self.hosts_cpvs = {
+			'app-misc/foo-1.0': frozenset(['foo-1.0.tar.gz']),
+			'app-misc/gone-1.0': frozenset(['gone-1.0.tar.gz'])
+		}
+		self.messages = []
+
+	def tearDown(self):
+		shutil.rmtree(self.distdir)
+
+	def search(self):
+		return DistfilesSearch(self.messages.append, self.portdb, self.vardb)
+
+	def test_host_only(self):
+		for destructive in (False, True):
+			clean_me, saved, deprecated = self.search().findDistfiles(
+				destructive=destructive, _distdir=self.distdir,
+				hosts_cpvs=self.hosts_cpvs)
+			self.failUnlessEqual(list(clean_me), ['gone-1.0-fix.patch'])
+			self.failUnlessEqual(deprecated, {})
+		self.failIf([x for x in self.messages if 'Key Error' in x])
+
+	def test_stream(self):
+		results = self.search().iterDistfiles(destructive=True,
+			_distdir=self.distdir, hosts_cpvs=self.hosts_cpvs)
+		self.failUnlessEqual([r[0] for r in results], ['gone-1.0-fix.patch'])
+
+	def test_unlisted(self):
+		# a host list without the source files is looked up on the server
+		self.hosts_cpvs['app-misc/gone-1.0'] = None
+		clean_me, saved, deprecated = self.search().findDistfiles(
+			destructive=True, _distdir=self.distdir,
+			hosts_cpvs=self.hosts_cpvs)
+		self.failUnlessEqual(sorted(clean_me),
+			['gone-1.0-fix.patch', 'gone-1.0.tar.gz'])
+		self.failUnless('   - Key Error looking up: app-misc/gone-1.0'
+			in self.messages)
+
+
 def test_main():
 
 	# Run tests
@@ -626,6 +759,8 @@ def test_main():
 	test_support.run_unittest( TestNonDestructive('test_non_destructive'))
 	test_support.run_unittest( TestNonDestructive('test_destructive'))
 	test_support.run_unittest( TestRemoveProtected('test_remove_protected'))
+	test_support.run_unittest(TestIterDistfiles)
+	test_support.run_unittest(TestHostsCpvs)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,113 @@
+import json
+import unittest
+from io import BytesIO
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit import equery
+from gentoolkit.equery import files, CONFIG
+from gentoolkit.formatters import RecordWriter
+
+
+class FakePackage(object):
+
+	cpv = 'app-misc/foo-1.0'
+
+
+class TestRecordWriter(unittest.TestCase):
+
+	def setUp(self):
+		self.out = BytesIO()
+
+	def tearDown(self):
+		pass
+
+	def lines(self):
+		return self.out.getvalue().decode('ascii').splitlines()
+
+	def test_ndjson(self):
+		writer = RecordWriter('ndjson', ('cpv', 'slot', 'mask'), self.out)
+		writer.write('app-misc/foo-1.0', '0', ['~amd64 keyword'])
+		writer.write('app-misc/foo-1.1', '0', None)
+		writer.close()
+		records = [json.loads(x) for x in self.lines()]
+		self.failUnlessEqual(records, [
+			{'cpv': 'app-misc/foo-1.0', 'slot': '0', 'mask': ['~amd64 keyword']},
+			{'cpv': 'app-misc/foo-1.1', 'slot': '0', 'mask': None}
+		])
+		# Keys are kept in the order of the fields
+		self.failUnless(self.lines()[0].startswith('{"cpv": '))
+
+	def test_tsv(self):
+		writer = RecordWriter('tsv', ('path', 'size', 'masked', 'mask'),
+			self.out)
+		writer.write('/tmp/a\tb\nc\\d', 12, True, ['a', 'b'])
+		writer.write('/tmp/e', None, False, [])
+		writer.close()
+		self.failUnlessEqual(self.lines(), [
+			'path\tsize\tmasked\tmask',
+			'/tmp/a\\tb\\nc\\\\d\t12\t1\ta,b',
+			'/tmp/e\t\t0\t'
+		])
+
+	def test_buffered(self):
+		writer = RecordWriter('ndjson', ('cpv',), self.out, bufsize=100)
+		writer.write('app-misc/foo-1.0')
+		self.failUnlessEqual(self.out.getvalue(), b'')
+		for i in range(10):
+			writer.write('app-misc/foo-1.0')
+		self.failUnless(self.out.getvalue())
+		writer.flush()
+		self.failUnlessEqual(len(self.lines()), 11)
+
+	def test_errors(self):
+		self.failUnlessRaises(ValueError, RecordWriter, 'xml', ('cpv',))
+		writer = RecordWriter('tsv', ('cpv', 'slot'), self.out)
+		self.failUnlessRaises(TypeError, writer.write, 'app-misc/foo-1.0')
+
+
+class TestEqueryRecords(unittest.TestCase):
+
+	def setUp(self):
+		self.out = BytesIO()
+
+	def tearDown(self):
+		CONFIG['format'] = None
+
+	def test_record_writer(self):
+		CONFIG['format'] = None
+		self.failUnless(equery.record_writer(('cpv',)) is None)
+		CONFIG['format'] = 'tsv'
+		writer = equery.record_writer(('cpv',))
+		self.failUnlessEqual(writer.fields, ('cpv',))
+
+	def test_files(self):
+		contents = {
+			'/usr/bin/foo': ['obj', '1262304000', 'd41d8cd98f00b204e9800998ecf8427e'],
+			'/usr/bin': ['dir'],
+			'/usr/bin/f': ['sym', '1262304000', 'foo']
+		}
+		writer = RecordWriter('ndjson', files.FILE_FIELDS, self.out)
+		files.write_records(writer, FakePackage(), contents)
+		writer.close()
+		records = [json.loads(x)
+			for x in self.out.getvalue().decode('ascii').splitlines()]
+		self.failUnlessEqual([x['path'] for x in records],
+			['/usr/bin', '/usr/bin/f', '/usr/bin/foo'])
+		self.failUnlessEqual(records[0]['timestamp'], None)
+		self.failUnlessEqual(records[1]['target'], 'foo')
+		self.failUnlessEqual(records[2]['timestamp'], 1262304000)
+		self.failUnlessEqual(records[2]['md5'],
+			'd41d8cd98f00b204e9800998ecf8427e')
+		self.failUnless(all(x['cpv'] == 'app-misc/foo-1.0' for x in records))
+
+
+def test_main():
+	test_support.run_unittest(TestRecordWriter, TestEqueryRecords)
+
+
+if __name__ == '__main__':
+	test_main()
@@ -0,0 +1,146 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""Benchmark of the eshowkw redundancy detection.
+
+Compares the keyword matrix implementation (with and without numpy) with
+the former pairwise comparison on generated packages with many versions
+and arches.  Not part of the test suite, run it with:
+
+	python -m gentoolkit.test.eshowkw.bench_redundancy [versions] [arches]
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import time
+
+from gentoolkit.eshowkw.keywords_content import keywords_content, numpy
+
+
+DEFAULT_VERSIONS = 200
+DEFAULT_ARCHES = 30
+RUNS = 5
+
+
+class OldRedundancyChecker(object):
+	"""The RedundancyChecker of eshowkw 0.5.0"""
+
+	def __init__(self, keywords, slots, ignore_slots=False):
+		if ignore_slots:
+			self.redundant = list(self.compareSelected(list(keywords)))
+		else:
+			result = [self.compareSelected([k for k, s in zip(keywords, slots)
+				if s == slot]) for slot in self.uniq(slots)]
+			self.redundant = list(''.join(result))
+
+	def uniq(self, seq):
+		seen = {}
+		result = []
+		for item in seq:
+			if item in seen:
+				continue
+			seen[item] = 1
+			result.append(item)
+		return result
+
+	def cleanKeyword(self, keyword):
+		return ["%s" % x for x in keyword.split()
+			if x != '-*' and not x.startswith('-')]
+
+	def compareSelected(self, kws):
+		result = []
+		kws.reverse()
+		for i in range(len(kws)):
+			kw = kws.pop()
+			if self.compareKeywordWithRest(kw, kws):
+				result.append('#')
+			else:
+				result.append('o')
+		if len(result) == 0:
+			result.append('o')
+		return ''.join(result)
+
+	def compareKeywordWithRest(self, keyword, keywords):
+		kw = self.cleanKeyword(keyword)
+		for kwi in keywords:
+			kwi = self.cleanKeyword(kwi)
+			if kwi:
+				kw = self.checkShadow(kw, kwi)
+			if not kw:
+				return True
+		return False
+
+	def checkShadow(self, old, new):
+		tmp = set(new)
+		tmp.update("~%s" % x for x in new
+			if not x.startswith("~"))
+		return list(set(old).difference(tmp))
+
+
+def make_package(versions, arches, slots=3, seed=0):
+	"""
+	Returns (keywords, slots) of a generated package, whose newer
+	versions tend to have more and more stable keywords.
+	"""
+	rand = random.Random(seed)
+	names = ['arch%d' % i for i in range(arches)]
+	keywords = []
+	slot_list = []
+	for v in range(versions):
+		maturity = float(v) / max(1, versions)
+		kw = []
+		if rand.random() < 0.05:
+			kw.append('-*')
+		for name in names:
+			r = rand.random()
+			if r < 0.3 * (1 - maturity):
+				kw.append(name)
+			elif r < 0.8:
+				kw.append('~' + name)
+			elif r < 0.85:
+				kw.append('-' + name)
+		keywords.append(' '.join(kw))
+		slot_list.append(str(rand.randrange(slots)))
+	return keywords, slot_list
+
+
+def timed(threshold, keywords, slots, ignore_slots):
+	"""Run the current checker with the given numpy threshold"""
+	checker = keywords_content.RedundancyChecker
+	saved = checker.NUMPY_THRESHOLD
+	checker.NUMPY_THRESHOLD = threshold
+	try:
+		start = time.time()
+		for i in range(RUNS):
+			result = checker(keywords, slots, ignore_slots).redundant
+		return result, (time.time() - start) / RUNS
+	finally:
+		checker.NUMPY_THRESHOLD = saved
+
+
+def main(versions=DEFAULT_VERSIONS, arches=DEFAULT_ARCHES):
+	keywords, slots = make_package(versions, arches)
+	print("%d versions, %d arches" % (versions, arches))
+	for ignore_slots in (False, True):
+		start = time.time()
+		for i in range(RUNS):
+			old = OldRedundancyChecker(keywords, slots, ignore_slots).redundant
+		old_time = (time.time() - start) / RUNS
+		label = ignore_slots and 'all versions' or 'per slot'
+		print("%s, %d redundant:" % (label, old.count('#')))
+		print("  pairwise:  %8.4fs" % old_time)
+		new, new_time = timed(versions + 1, keywords, slots, ignore_slots)
+		assert new == old
+		print("  matrix:    %8.4fs" % new_time)
+		if numpy is not None:
+			new, new_time = timed(0, keywords, slots, ignore_slots)
+			assert new == old
+			print("  numpy:     %8.4fs" % new_time)
+
+
+if __name__ == '__main__':
+	main(*[int(x) for x in sys.argv[1:3]])
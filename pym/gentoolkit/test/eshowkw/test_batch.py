@@ -0,0 +1,85 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import sys
+import unittest
+try:
+	from StringIO import StringIO
+except ImportError:
+	from io import StringIO
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.eshowkw import expand_packages, query_packages
+
+
+class FakePortdbapi(object):
+	"""Two versions of every package"""
+
+	def cp_all(self, categories=None):
+		packages = ["app-misc/foo", "app-portage/gentoolkit", "app-misc/bar"]
+		if categories is None:
+			return packages
+		return [x for x in packages if x.split('/')[0] in categories]
+
+	def xmatch(self, level, package):
+		if package == "app-misc/missing":
+			return []
+		return ["%s-1.0" % package, "%s-2.0" % package]
+
+	def aux_get(self, cpv, keys):
+		return ["amd64 ~x86", "0", "gentoo"]
+
+
+class TestBatch(unittest.TestCase):
+
+	def setUp(self):
+		self.dbapi = FakePortdbapi()
+
+	def test_expand_packages(self):
+		self.assertEqual(expand_packages(["dev-lang/python", "app-misc/*"],
+			self.dbapi), ["dev-lang/python", "app-misc/bar", "app-misc/foo"])
+		self.assertEqual(expand_packages(["app-portage/*", "sys-apps/*"],
+			self.dbapi), ["app-portage/gentoolkit"])
+
+	def test_query_packages(self):
+		packages = ["app-misc/pkg%d" % i for i in range(20)]
+		for jobs in (1, 4):
+			results = list(query_packages(packages, self.dbapi, jobs))
+			self.assertEqual([x[0] for x in results], packages)
+			cpvs, keywords, slots, repositories, masks = results[0][1]
+			self.assertEqual(cpvs, ["app-misc/pkg0-1.0", "app-misc/pkg0-2.0"])
+			self.assertEqual(keywords, ("amd64 ~x86", "amd64 ~x86"))
+			self.assertEqual(slots, ("0", "0"))
+			self.assertEqual(repositories, ("gentoo", "gentoo"))
+			self.assertEqual(len(masks), 2)
+
+	def test_missing_package(self):
+		packages = ["app-misc/foo", "app-misc/missing", "app-misc/bar"]
+		for jobs in (1, 4):
+			failed = []
+			stderr, sys.stderr = sys.stderr, StringIO()
+			try:
+				seen = [x[0] for x in query_packages(packages, self.dbapi,
+					jobs, failed)]
+				errors = sys.stderr.getvalue()
+			finally:
+				sys.stderr = stderr
+			# the other packages are still queried
+			self.assertEqual(seen, ["app-misc/foo", "app-misc/bar"])
+			self.assertEqual(failed, ["app-misc/missing"])
+			self.assertEqual(errors,
+				'app-misc/missing: No such package "app-misc/missing"\n')
+
+
+def test_main():
+	test_support.run_unittest(TestBatch)
+
+
+if __name__ == '__main__':
+	test_main()
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import json
+import unittest
+try:
+	# the csv module writes str on python-2.x
+	from StringIO import StringIO
+except ImportError:
+	from io import StringIO
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.eshowkw import export
+from gentoolkit.eshowkw.export import matrix_rows, write_csv, write_json
+from gentoolkit.eshowkw.keywords_content import keyword_state
+
+
+ARCHS = ['amd64', 'arm', 'x86']
+
+RESULTS = [
+	('app-misc/foo', (['app-misc/foo-1.0', 'app-misc/foo-2.0'],
+		('amd64 ~x86 -arm', '-* ~amd64'), ('0', '2'), ('gentoo', 'overlay'),
+		(False, True))),
+	('app-misc/bar', (['app-misc/bar-1.0'], ('x86',), ('0',), ('gentoo',),
+		(False,))),
+]
+
+
+def failing_rows():
+	"""Rows of a query which fails after the first package"""
+	for row in matrix_rows(RESULTS[:1], ARCHS):
+		yield row
+	raise KeyboardInterrupt
+
+
+class TestExport(unittest.TestCase):
+
+	def setUp(self):
+		# no portage databases here
+		self.saved = export.get_install_status
+		export.get_install_status = lambda cpv: cpv == 'app-misc/foo-1.0'
+
+	def tearDown(self):
+		export.get_install_status = self.saved
+
+	def test_keyword_state(self):
+		keywords = '-* ~amd64 -arm x86'.split()
+		self.assertEqual([keyword_state(a, keywords) for a in ARCHS + ['ppc']],
+			['testing', 'unsupported', 'stable', 'disabled'])
+		self.assertEqual(keyword_state('ppc', ['x86']), None)
+
+	def test_rows(self):
+		rows = list(matrix_rows(RESULTS, ARCHS))
+		self.assertEqual([r['cpv'] for r in rows], ['app-misc/foo-1.0',
+			'app-misc/foo-2.0', 'app-misc/bar-1.0'])
+		self.assertEqual(rows[0], {'cpv': 'app-misc/foo-1.0', 'slot': '0',
+			'repository': 'gentoo', 'masked': False, 'installed': True,
+			'keywords': {'amd64': 'stable', 'arm': 'unsupported',
+				'x86': 'testing'}})
+		self.assertEqual(rows[1]['keywords'], {'amd64': 'testing',
+			'arm': 'disabled', 'x86': 'disabled'})
+		self.assertTrue(rows[1]['masked'])
+
+	def test_csv(self):
+		out = StringIO()
+		write_csv(out, matrix_rows(RESULTS, ARCHS), ARCHS)
+		self.assertEqual(out.getvalue().splitlines(), [
+			'cpv,slot,repository,masked,installed,amd64,arm,x86',
+			'app-misc/foo-1.0,0,gentoo,0,1,stable,unsupported,testing',
+			'app-misc/foo-2.0,2,overlay,1,0,testing,disabled,disabled',
+			'app-misc/bar-1.0,0,gentoo,0,0,,,stable'])
+
+	def test_json(self):
+		out = StringIO()
+		write_json(out, matrix_rows(RESULTS, ARCHS), ARCHS)
+		self.assertEqual(json.loads(out.getvalue()),
+			list(matrix_rows(RESULTS, ARCHS)))
+		out = StringIO()
+		write_json(out, [], ARCHS)
+		self.assertEqual(json.loads(out.getvalue()), [])
+
+	def test_json_interrupted(self):
+		out = StringIO()
+		self.assertRaises(KeyboardInterrupt, write_json, out, failing_rows(),
+			ARCHS)
+		# the rows written so far are still a valid list
+		self.assertEqual(json.loads(out.getvalue()),
+			list(matrix_rows(RESULTS[:1], ARCHS)))
+
+
+def test_main():
+	test_support.run_unittest(TestExport)
+
+
+if __name__ == '__main__':
+	test_main()
@@ -0,0 +1,60 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import unittest
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.eshowkw.keywords_content import keywords_content, numpy
+from gentoolkit.test.eshowkw.bench_redundancy import OldRedundancyChecker, \
+	make_package
+
+
+class TestRedundancyChecker(unittest.TestCase):
+
+	def setUp(self):
+		self.checker = keywords_content.RedundancyChecker
+		self.saved = self.checker.NUMPY_THRESHOLD
+
+	def tearDown(self):
+		self.checker.NUMPY_THRESHOLD = self.saved
+
+	def check(self, keywords, slots, expected=None):
+		for ignore_slots in (False, True):
+			old = OldRedundancyChecker(keywords, slots, ignore_slots).redundant
+			new = self.checker(keywords, slots, ignore_slots).redundant
+			self.assertEqual(new, old)
+		if expected is not None:
+			self.assertEqual(''.join(self.checker(keywords, slots).redundant),
+				expected)
+
+	def test_examples(self):
+		self.check(['~amd64 ~x86', 'amd64 ~x86', '~amd64'], ['0', '0', '0'],
+			'#oo')
+		self.check(['amd64', '~amd64 x86'], ['0', '0'], 'o' 'o')
+		self.check(['amd64 -x86', '-* amd64'], ['0', '0'], '#o')
+		self.check(['', 'amd64'], ['0', '0'], '#o')
+		self.check(['amd64', 'amd64', 'amd64'], ['0', '1', '0'], '#oo')
+		self.check([], [])
+
+	def test_generated(self):
+		for threshold in (1000, 0):
+			if threshold == 0 and numpy is None:
+				continue
+			self.checker.NUMPY_THRESHOLD = threshold
+			for seed in range(10):
+				keywords, slots = make_package(60, 8, seed=seed)
+				self.check(keywords, slots)
+
+
+def test_main():
+	test_support.run_unittest(TestRedundancyChecker)
+
+
+if __name__ == '__main__':
+	test_main()
@@ -0,0 +1,86 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""Generates GLSA files and configs for the glsa tests."""
+
+import os
+
+
+GLSA_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE glsa SYSTEM "http://www.gentoo.org/dtd/glsa.dtd">
+<glsa id="%(id)s">
+  <title>%(title)s</title>
+  <synopsis>A vulnerability in %(title)s.</synopsis>
+  <product type="ebuild">%(title)s</product>
+  <announced>2010-10-01</announced>
+  <revised>2010-10-02: 02</revised>
+  <bug>123456</bug>
+  <access>remote</access>
+  <affected>
+%(packages)s
+  </affected>
+  <background>
+    <p>Some software.</p>
+  </background>
+  <description>
+    <p>A bug was found.</p>
+  </description>
+  <impact type="normal">
+    <p>Bad things may happen.</p>
+  </impact>
+  <workaround>
+    <p>There is no known workaround at this time.</p>
+  </workaround>
+  <resolution>
+    <p>Upgrade:</p>
+    <code>
+    # emerge --sync</code>
+  </resolution>
+  <references>
+    <uri link="http://cve.mitre.org">CVE-2010-0001</uri>
+  </references>
+</glsa>
+"""
+
+PACKAGE_TEMPLATE = """    <package name="%(name)s" auto="yes" arch="%(arch)s">
+%(versions)s
+    </package>"""
+
+
+def make_config(glsa_dir, **kwargs):
+	"""Returns a GLSA aware config dict for glsa_dir"""
+	config = {
+		"GLSA_DIR": os.path.join(glsa_dir, ""),
+		"GLSA_PREFIX": "glsa-",
+		"GLSA_SUFFIX": ".xml",
+		"CHECKFILE": os.path.join(glsa_dir, "glsa_injected"),
+		"GLSA_STORE": os.path.join(glsa_dir, "cache", "glsa.store"),
+		"GLSA_STATE": os.path.join(glsa_dir, "cache", "glsa.state"),
+		"CHECKMODE": "local",
+		"PRINTWIDTH": "76",
+		"ARCH": "amd64",
+	}
+	config.update(kwargs)
+	return config
+
+
+def write_glsa(glsa_dir, myid, title, packages):
+	"""Writes a GLSA file.
+
+	@param packages: list of (name, arch, [(tag, range, version),...])
+		with tag either 'vulnerable' or 'unaffected'
+	"""
+	package_xml = []
+	for name, arch, versions in packages:
+		version_xml = "\n".join('      <%s range="%s">%s</%s>'
+			% (tag, range_, version, tag) for tag, range_, version in versions)
+		package_xml.append(PACKAGE_TEMPLATE % {"name": name, "arch": arch,
+			"versions": version_xml})
+	path = os.path.join(glsa_dir, "glsa-%s.xml" % myid)
+	f = open(path, "w")
+	f.write(GLSA_TEMPLATE % {"id": myid, "title": title,
+		"packages": "\n".join(package_xml)})
+	f.close()
+	return path
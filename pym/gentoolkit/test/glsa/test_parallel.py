@@ -0,0 +1,98 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.glsa import GlsaFormatException, VulnerabilityTester
+from gentoolkit.glsa.parallel import ParallelTester
+from gentoolkit.glsa.store import CompiledGlsa, GlsaStore
+from gentoolkit.test.glsa.glsasupport import make_config, write_glsa
+
+
+class FakeVardb(object):
+	"""A vdb with dev-libs/foo-1.1 installed"""
+
+	def cpv_all(self):
+		return ["dev-libs/foo-1.1"]
+
+	def match(self, atom):
+		if atom in ("<dev-libs/foo-1.2", "<dev-libs/foo-1.5"):
+			return ["dev-libs/foo-1.1"]
+		return []
+
+
+class TestParallelTester(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		self.config = make_config(self.dir)
+		self.ids = []
+		for i in range(12):
+			myid = "201010-%02d" % (i + 1)
+			version = ("1.0", "1.2", "1.5")[i % 3]
+			write_glsa(self.dir, myid, myid, [("dev-libs/foo", "*",
+				[("vulnerable", "lt", version)])])
+			self.ids.append(myid)
+		# an invalid GLSA, its id does not match its filename
+		path = write_glsa(self.dir, "201010-13", "invalid", [])
+		f = open(path)
+		content = f.read().replace('id="201010-13"', 'id="201010-99"')
+		f.close()
+		f = open(path, "w")
+		f.write(content)
+		f.close()
+		self.ids.append("201010-13")
+		self.expected = [i % 3 != 0 for i in range(12)]
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def run_tester(self, jobs):
+		store = GlsaStore(self.config)
+		store.load()
+		tester = ParallelTester(store, VulnerabilityTester(self.config,
+			FakeVardb()), jobs, self.config, FakeVardb())
+		results = list(tester.test(self.ids + self.ids[:2]))
+		self.assertTrue(store.save())
+		return store, tester, results
+
+	def check(self, jobs):
+		store, tester, results = self.run_tester(jobs)
+		self.assertEqual([r[0] for r in results], self.ids + self.ids[:2])
+		self.assertEqual([r[2] for r in results[:12]], self.expected)
+		self.assertEqual([r[2] for r in results[13:]], self.expected[:2])
+		for myid, myglsa, vulnerable, error in results[:12]:
+			self.assertEqual(myglsa.nr, myid)
+			self.assertEqual(myglsa.title, myid)
+			self.assertTrue(error is None)
+		self.assertTrue(results[12][1] is None)
+		self.assertTrue(isinstance(results[12][3], GlsaFormatException))
+		self.assertEqual(sorted(store.entries), self.ids[:12])
+		self.assertEqual(len(tester.verdicts), 12)
+
+	def test_serial(self):
+		self.check(1)
+
+	def test_parallel(self):
+		self.check(3)
+		# the records parsed by the workers were stored
+		store, tester, results = self.run_tester(3)
+		self.assertTrue(isinstance(results[0][1], CompiledGlsa))
+		self.assertFalse(store.dirty)
+
+
+def test_main():
+	test_support.run_unittest(TestParallelTester)
+
+
+if __name__ == '__main__':
+	test_main()
@@ -0,0 +1,74 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import unittest
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.glsa import RevisionMatcher, getRevisionMatcher, \
+	revisionMatch
+
+
+INSTALLED = ["dev-libs/foo-1.2", "dev-libs/foo-1.2-r1", "dev-libs/foo-1.2-r3",
+	"dev-libs/foo-1.2-r10"]
+
+
+class FakeDbapi(object):
+	"""Matches ~ atoms against INSTALLED"""
+
+	def __init__(self):
+		self.calls = []
+
+	def match(self, atom):
+		self.calls.append(atom)
+		cpv = atom[1:].split(":")[0]
+		return [v for v in INSTALLED if v == cpv or v.startswith(cpv + "-r")]
+
+	def xmatch(self, match_type, atom):
+		return self.match(atom)
+
+
+class TestRevisionMatcher(unittest.TestCase):
+
+	def test_ranges(self):
+		db = FakeDbapi()
+		for atom, expected in (
+				(">=~dev-libs/foo-1.2-r3", ["dev-libs/foo-1.2-r3", "dev-libs/foo-1.2-r10"]),
+				(" >~dev-libs/foo-1.2-r3", ["dev-libs/foo-1.2-r10"]),
+				("<=~dev-libs/foo-1.2-r1", ["dev-libs/foo-1.2", "dev-libs/foo-1.2-r1"]),
+				(" <~dev-libs/foo-1.2", []),
+				(" <~dev-libs/foo-1.2-r2:0", ["dev-libs/foo-1.2", "dev-libs/foo-1.2-r1"])):
+			self.assertEqual(revisionMatch(atom, db), expected)
+			self.assertEqual(revisionMatch(atom, db, match_type="match-visible"),
+				expected)
+		self.assertEqual(db.calls[-1], "~dev-libs/foo-1.2:0")
+
+	def test_compiled(self):
+		matcher = RevisionMatcher(">=~dev-libs/foo-1.2-r3")
+		self.assertEqual(matcher.baseAtom, "~dev-libs/foo-1.2")
+		self.assertEqual(matcher.version, "1.2")
+		self.assertEqual(matcher.revision, 3)
+		self.assertEqual(matcher.getRevision("dev-libs/foo-1.2-r10"), 10)
+		self.assertEqual(matcher.getRevision("dev-libs/foo-1.2"), 0)
+
+	def test_shared(self):
+		self.assertTrue(getRevisionMatcher(" >~dev-libs/foo-1.2-r3")
+			is getRevisionMatcher(" >~dev-libs/foo-1.2-r3"))
+
+	def test_invalid(self):
+		for atom in (">=dev-libs/foo-1.2", "=~dev-libs/foo-1.2",
+				">=~dev-libs/foo", " >~__import__('os')"):
+			self.assertRaises(ValueError, RevisionMatcher, atom)
+
+
+def test_main():
+	test_support.run_unittest(TestRevisionMatcher)
+
+
+if __name__ == '__main__':
+	test_main()
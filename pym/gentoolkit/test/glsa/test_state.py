@@ -0,0 +1,115 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+import gentoolkit.glsa
+from gentoolkit.glsa import Glsa, getInjectedList
+from gentoolkit.glsa.state import CheckState
+from gentoolkit.glsa.store import GlsaStore
+from gentoolkit.test.glsa.glsasupport import make_config, write_glsa
+
+
+INSTALLED = ["dev-libs/foo-1.1", "dev-libs/bar-2.1"]
+
+
+class TestCheckState(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		self.config = make_config(self.dir)
+		for myid, name in (("201010-01", "dev-libs/foo"),
+				("201010-02", "dev-libs/bar"), ("201010-03", "dev-libs/baz")):
+			write_glsa(self.dir, myid, myid, [(name, "*",
+				[("vulnerable", "lt", "2.0")])])
+		self.store = GlsaStore(self.config)
+		for myid in ("201010-01", "201010-02", "201010-03"):
+			self.store.get(myid)
+		self.verdicts = {"201010-01": True, "201010-02": False,
+			"201010-03": False}
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def rerun(self, installed, config=None):
+		"""Saves the verdicts and starts the next run"""
+		state = CheckState(self.config)
+		state.load()
+		state.start(INSTALLED, self.store)
+		state.finish(self.verdicts, self.store)
+		self.assertTrue(state.save())
+		state = CheckState(config or self.config)
+		state.load()
+		return state.start(installed, self.store)
+
+	def test_unchanged(self):
+		self.assertEqual(self.rerun(INSTALLED), self.verdicts)
+
+	def test_merged(self):
+		valid = self.rerun(["dev-libs/foo-1.1", "dev-libs/bar-2.2"])
+		self.assertEqual(sorted(valid), ["201010-01", "201010-03"])
+
+	def test_unmerged(self):
+		valid = self.rerun(["dev-libs/bar-2.1"])
+		self.assertEqual(sorted(valid), ["201010-02", "201010-03"])
+
+	def test_modified_glsa(self):
+		write_glsa(self.dir, "201010-03", "modified", [("dev-libs/baz", "*",
+			[("vulnerable", "lt", "2.0")])])
+		self.assertEqual(sorted(self.rerun(INSTALLED)),
+			["201010-01", "201010-02"])
+
+	def test_other_arch(self):
+		self.assertEqual(self.rerun(INSTALLED,
+			make_config(self.dir, ARCH="x86")), {})
+
+	def test_not_stored(self):
+		state = CheckState(self.config)
+		state.start(INSTALLED, self.store)
+		state.finish({"/tmp/glsa-201010-04.xml": True}, self.store)
+		self.assertEqual(state.glsas, {})
+
+
+class TestInjectedList(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		self.config = make_config(self.dir)
+		write_glsa(self.dir, "201010-01", "Foo", [])
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_injected(self):
+		self.assertEqual(getInjectedList(self.config), frozenset())
+		myglsa = Glsa("201010-01", self.config)
+		self.assertFalse(myglsa.isInjected())
+		myglsa.inject()
+		self.assertTrue(myglsa.isInjected())
+		self.assertEqual(getInjectedList(self.config),
+			frozenset(["201010-01"]))
+		# the file is not read again while it is unchanged
+		cached = gentoolkit.glsa._injected[self.config["CHECKFILE"]]
+		self.assertTrue(getInjectedList(self.config) is cached[1])
+		f = open(self.config["CHECKFILE"], "a")
+		f.write("201010-02\n")
+		f.close()
+		self.assertEqual(getInjectedList(self.config),
+			frozenset(["201010-01", "201010-02"]))
+
+
+def test_main():
+	test_support.run_unittest(TestCheckState, TestInjectedList)
+
+
+if __name__ == '__main__':
+	test_main()
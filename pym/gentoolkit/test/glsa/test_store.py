@@ -0,0 +1,77 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import os
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.glsa.store import CompiledGlsa, GlsaStore, RECORD_FIELDS, \
+	LAZY_FIELDS
+from gentoolkit.test.glsa.glsasupport import make_config, write_glsa
+
+
+PACKAGES = [("dev-libs/foo", "*", [("unaffected", "ge", "1.2"),
+	("vulnerable", "lt", "1.2")])]
+
+
+class TestGlsaStore(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		self.config = make_config(self.dir)
+		self.path = write_glsa(self.dir, "201010-01", "Foo", PACKAGES)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def get(self):
+		store = GlsaStore(self.config)
+		store.load()
+		myglsa = store.get("201010-01")
+		self.assertTrue(store.save())
+		return myglsa
+
+	def test_compiled(self):
+		parsed = self.get()
+		self.assertFalse(isinstance(parsed, CompiledGlsa))
+		compiled = self.get()
+		self.assertTrue(isinstance(compiled, CompiledGlsa))
+		for key in RECORD_FIELDS:
+			self.assertEqual(getattr(compiled, key), getattr(parsed, key))
+		self.assertEqual(compiled.packages["dev-libs/foo"][0]["vul_atoms"],
+			["<dev-libs/foo-1.2"])
+		# the long text is not stored
+		self.assertFalse("description" in compiled.__dict__)
+		for key in LAZY_FIELDS[:5]:
+			self.assertEqual(getattr(compiled, key), getattr(parsed, key))
+		self.assertRaises(AttributeError, getattr, compiled, "nonexistent")
+
+	def test_changed_file(self):
+		self.get()
+		write_glsa(self.dir, "201010-01", "Foo and bar", PACKAGES)
+		os.utime(self.path, (0, 0))
+		myglsa = self.get()
+		self.assertFalse(isinstance(myglsa, CompiledGlsa))
+		self.assertEqual(myglsa.title, "Foo and bar")
+
+	def test_filename(self):
+		store = GlsaStore(self.config)
+		myglsa = store.get(self.path)
+		self.assertEqual(myglsa.title, "Foo")
+		self.assertEqual(store.entries, {})
+
+
+def test_main():
+	test_support.run_unittest(TestGlsaStore)
+
+
+if __name__ == '__main__':
+	test_main()
@@ -0,0 +1,99 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.glsa import Glsa, Matcher, UpgradeCalculator, getMinUpgrade
+from gentoolkit.test.glsa.glsasupport import make_config, write_glsa
+
+
+FOO = [("dev-libs/foo", "*", [("unaffected", "ge", "1.2"),
+	("vulnerable", "lt", "1.2")])]
+
+
+class FakeDbapi(object):
+	"""A database with the package versions in matches and slots"""
+
+	def __init__(self, matches, slots):
+		self.matches = matches
+		self.slots = slots
+		self.calls = []
+
+	def match(self, atom):
+		self.calls.append(atom)
+		return list(self.matches.get(atom, []))
+
+	def aux_get(self, cpv, keys):
+		self.calls.append(cpv)
+		return [self.slots[cpv]]
+
+
+def make_matcher():
+	vardb = FakeDbapi({"<dev-libs/foo-1.2": ["dev-libs/foo-1.1"]},
+		{"dev-libs/foo-1.1": "0"})
+	portdb = FakeDbapi({">=dev-libs/foo-1.2": ["dev-libs/foo-1.2",
+		"dev-libs/foo-1.3-r1", "dev-libs/foo-2.0"]},
+		{"dev-libs/foo-1.2": "0", "dev-libs/foo-1.3-r1": "0",
+		"dev-libs/foo-2.0": "2"})
+	return Matcher({"vartree": vardb, "porttree": portdb}), vardb, portdb
+
+
+class TestUpgradeCalculator(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		self.config = make_config(self.dir)
+		self.glsas = []
+		for myid in ("201010-01", "201010-02"):
+			write_glsa(self.dir, myid, myid, FOO)
+			self.glsas.append(Glsa(myid, self.config))
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_min_upgrade(self):
+		matcher = make_matcher()[0]
+		self.assertEqual(getMinUpgrade(["<dev-libs/foo-1.2"],
+			[">=dev-libs/foo-1.2"], True, matcher),
+			[["dev-libs/foo-1.1", "dev-libs/foo-1.2"]])
+		# the upgrade stays in the slot of the installed version
+		self.assertEqual(getMinUpgrade(["<dev-libs/foo-1.2"],
+			[">=dev-libs/foo-1.2"], False, matcher),
+			[["dev-libs/foo-1.1", "dev-libs/foo-1.3-r1"]])
+		self.assertEqual(getMinUpgrade(["<dev-libs/foo-1.0"],
+			[">=dev-libs/foo-1.2"], True, matcher), None)
+
+	def test_memoized(self):
+		matcher, vardb, portdb = make_matcher()
+		calculator = UpgradeCalculator(matcher)
+		tables = calculator.getAffectionTables(self.glsas)
+		self.assertEqual(tables, [[["dev-libs/foo-1.1", "dev-libs/foo-1.2"]]] * 2)
+		self.assertEqual(self.glsas[0].getMergeList(calculator=calculator),
+			["dev-libs/foo-1.2"])
+		self.assertEqual(calculator.getAffectionTables(self.glsas, False),
+			[[["dev-libs/foo-1.1", "dev-libs/foo-1.3-r1"]]] * 2)
+		# every match and slot was looked up once
+		self.assertEqual(sorted(vardb.calls), sorted(set(vardb.calls)))
+		self.assertEqual(sorted(portdb.calls), sorted(set(portdb.calls)))
+		self.assertEqual(len(calculator.cache), 2)
+		# the results are copies
+		tables[0][0][1] = ""
+		self.assertEqual(calculator.getAffectionTables(self.glsas[:1]),
+			[[["dev-libs/foo-1.1", "dev-libs/foo-1.2"]]])
+
+
+def test_main():
+	test_support.run_unittest(TestUpgradeCalculator)
+
+
+if __name__ == '__main__':
+	test_main()
@@ -0,0 +1,112 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.glsa import Glsa, Matcher, VulnerabilityTester, \
+	isVulnerableAtom
+from gentoolkit.test.glsa.glsasupport import make_config, write_glsa
+
+
+FOO = [("dev-libs/foo", "*", [("unaffected", "ge", "1.2"),
+	("vulnerable", "lt", "1.2")])]
+BAR = [("dev-libs/bar", "*", [("unaffected", "ge", "2.0"),
+	("vulnerable", "lt", "2.0")])]
+BAZ = [("dev-libs/baz", "*", [("vulnerable", "lt", "3.0")])]
+FOO_SPARC = [("dev-libs/foo", "sparc", [("vulnerable", "lt", "1.2")])]
+
+# {atom: installed cpvs}
+MATCHES = {
+	"<dev-libs/foo-1.2": ["dev-libs/foo-1.1"],
+	">=dev-libs/foo-1.2": [],
+	"<dev-libs/bar-2.0": [],
+	">=dev-libs/bar-2.0": ["dev-libs/bar-2.1"],
+}
+
+
+class FakeVardb(object):
+	"""A vdb whose matches are looked up in MATCHES"""
+
+	def __init__(self):
+		self.calls = []
+
+	def cpv_all(self):
+		return ["dev-libs/foo-1.1", "dev-libs/bar-2.1"]
+
+	def match(self, atom):
+		self.calls.append(atom)
+		return list(MATCHES.get(atom, []))
+
+
+class TestVulnerabilityTester(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		self.config = make_config(self.dir)
+		self.vardb = FakeVardb()
+		self.tester = VulnerabilityTester(self.config, self.vardb)
+		self.glsas = {}
+		for myid, packages in (("201010-01", FOO), ("201010-02", BAR),
+				("201010-03", BAZ), ("201010-04", FOO_SPARC)):
+			write_glsa(self.dir, myid, myid, packages)
+			self.glsas[myid] = Glsa(myid, self.config)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_installed(self):
+		self.assertEqual(self.tester.installed,
+			frozenset(["dev-libs/foo", "dev-libs/bar"]))
+
+	def test_is_vulnerable(self):
+		results = dict((myid, self.tester.isVulnerable(myglsa))
+			for myid, myglsa in self.glsas.items())
+		self.assertEqual(results, {"201010-01": True, "201010-02": False,
+			"201010-03": False, "201010-04": False})
+		# baz is not installed and foo is not vulnerable on amd64
+		self.assertFalse([a for a in self.vardb.calls if "baz" in a])
+		self.assertFalse(self.tester.isAffected(self.glsas["201010-03"]))
+
+	def test_memoized(self):
+		for i in range(3):
+			for myglsa in self.glsas.values():
+				self.tester.isVulnerable(myglsa)
+		self.assertEqual(sorted(self.vardb.calls), sorted(set(self.vardb.calls)))
+
+	def test_same_as_glsa(self):
+		matcher = Matcher({"vartree": self.vardb})
+		for myglsa in self.glsas.values():
+			self.assertEqual(self.tester.isVulnerable(myglsa),
+				myglsa.isVulnerable(matcher=matcher))
+
+	def test_is_vulnerable_atom(self):
+		matcher = Matcher({"vartree": self.vardb})
+		self.assertTrue(isVulnerableAtom("<dev-libs/foo-1.2", [], matcher))
+		self.assertFalse(isVulnerableAtom("<dev-libs/foo-1.2",
+			["<dev-libs/foo-1.2"], matcher))
+		self.assertFalse(isVulnerableAtom("<dev-libs/bar-2.0",
+			[">=dev-libs/bar-2.0"], matcher))
+
+	def test_matcher_copies(self):
+		matcher = Matcher({"vartree": self.vardb})
+		matcher("<dev-libs/foo-1.2", "vartree").append("dev-libs/foo-0")
+		self.assertEqual(matcher("<dev-libs/foo-1.2", "vartree"),
+			["dev-libs/foo-1.1"])
+		self.assertEqual(self.vardb.calls, ["<dev-libs/foo-1.2"])
+
+
+def test_main():
+	test_support.run_unittest(TestVulnerabilityTester)
+
+
+if __name__ == '__main__':
+	test_main()
@@ -0,0 +1,6 @@
+#!/usr/bin/python
+# Copyright 2010 Gentoo Foundation
+#
+# Distributed under the terms of the GNU General Public License v2
+#
+# $Header$
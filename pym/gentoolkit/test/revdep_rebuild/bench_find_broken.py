@@ -0,0 +1,103 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""Benchmark of the revdep-rebuild broken library detection.
+
+Compares the indexed find_broken with the former joined string search
+on synthetic library sets.  Not part of the test suite, run it with:
+
+	python -m gentoolkit.test.revdep_rebuild.bench_find_broken [size]
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import time
+
+from gentoolkit.revdep_rebuild.check import LibraryIndex, find_broken
+
+
+DEFAULT_SIZE = 50000
+# one NEEDED entry out of BROKEN_RATIO is not available
+BROKEN_RATIO = 100
+
+
+def old_find_broken(found_libs, system_libraries, to_check):
+	"""The find_broken of revdep-rebuild 0.1-r3"""
+	broken = []
+	sl = '|'.join(system_libraries)
+	if not to_check:
+		for f in found_libs:
+			if f+'|' not in sl:
+				broken.append(found_libs.index(f))
+	else:
+		for tc in to_check:
+			for f in found_libs:
+				if tc in f:
+					broken.append(found_libs.index(f))
+	return broken
+
+
+def make_sets(size, seed=0):
+	"""Returns (system_libraries, found_libs) of size entries each"""
+	rand = random.Random(seed)
+	dirs = ['/lib64', '/usr/lib64', '/usr/lib64/qt4', '/opt/lib64']
+	system_libraries = []
+	found_libs = []
+	for i in range(size):
+		name = 'lib%s%d.so.%d' % (rand.choice(['gtk', 'kde', 'x', 'z']),
+			i, rand.randint(0, 9))
+		system_libraries.append(rand.choice(dirs) + '/' + name)
+		if i % BROKEN_RATIO:
+			found_libs.append(name)
+		else:
+			found_libs.append('libmissing%d.so.1' % i)
+	rand.shuffle(found_libs)
+	return system_libraries, found_libs
+
+
+def timed(func, *args):
+	start = time.time()
+	result = func(*args)
+	return result, time.time() - start
+
+
+def main(size=DEFAULT_SIZE):
+	system_libraries, found_libs = make_sets(size)
+	print("%d system libraries, %d NEEDED entries" % (size, size))
+
+	new, new_time = timed(lambda: find_broken(found_libs,
+		LibraryIndex(system_libraries), set()))
+	print("indexed:  %8.3fs  %d broken" % (new_time, len(new)))
+	old, old_time = timed(old_find_broken, found_libs, system_libraries,
+		set())
+	print("joined:   %8.3fs  %d broken" % (old_time, len(old)))
+
+	to_check = set(['libmissing1', 'libgtk2', 'libz3'])
+	new, new_time = timed(find_broken, found_libs, system_libraries,
+		to_check)
+	print("indexed --library:  %8.3fs  %d broken" % (new_time, len(new)))
+	old, old_time = timed(old_find_broken, found_libs, system_libraries,
+		to_check)
+	print("joined --library:   %8.3fs  %d broken" % (old_time, len(old)))
+
+	# many --library names, e.g. all the sonames of a removed package
+	to_check = set('libkde%d.so' % i for i in range(0, size, size // 200))
+	new, new_time = timed(find_broken, found_libs, system_libraries,
+		to_check)
+	print("indexed --library x%d:  %8.3fs  %d broken" % (len(to_check),
+		new_time, len(new)))
+	old, old_time = timed(old_find_broken, found_libs, system_libraries,
+		to_check)
+	print("joined --library x%d:   %8.3fs  %d broken" % (len(to_check),
+		old_time, len(old)))
+
+
+if __name__ == '__main__':
+	if len(sys.argv) > 1:
+		main(int(sys.argv[1]))
+	else:
+		main()
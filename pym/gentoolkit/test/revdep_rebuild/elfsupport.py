@@ -0,0 +1,75 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""Generates small ELF objects for the revdep_rebuild tests."""
+
+import os
+import struct
+
+from gentoolkit.revdep_rebuild.elf import (DT_NEEDED, DT_NULL, DT_RPATH,
+	DT_RUNPATH, DT_SONAME, DT_STRTAB, PT_DYNAMIC, PT_LOAD)
+
+
+BASE_ADDR = 0x400000
+
+
+def make_elf(bits=64, endian='<', needed=(), soname=None, rpath=None,
+		runpath=None):
+	"""Returns the content of a minimal dynamically linked ELF object"""
+	if bits == 64:
+		ehdr_size, phdr_size, dyn_fmt = 64, 56, endian + 'qQ'
+	else:
+		ehdr_size, phdr_size, dyn_fmt = 52, 32, endian + 'iI'
+	strtab = b'\0'
+	dynamic = []
+	def add_string(tag, string):
+		dynamic.append((tag, len(strtab)))
+		return strtab + string.encode('utf-8') + b'\0'
+	for lib in needed:
+		strtab = add_string(DT_NEEDED, lib)
+	if soname is not None:
+		strtab = add_string(DT_SONAME, soname)
+	if rpath is not None:
+		strtab = add_string(DT_RPATH, rpath)
+	if runpath is not None:
+		strtab = add_string(DT_RUNPATH, runpath)
+	strtab_offset = ehdr_size + 2 * phdr_size
+	dyn_offset = strtab_offset + len(strtab)
+	dynamic.append((DT_STRTAB, BASE_ADDR + strtab_offset))
+	dynamic.append((DT_NULL, 0))
+	dyn = b''.join(struct.pack(dyn_fmt, tag, val) for tag, val in dynamic)
+	size = dyn_offset + len(dyn)
+
+	if bits == 64:
+		ident = b'\x7fELF' + bytearray([2, endian == '<' and 1 or 2, 1])
+		ehdr = struct.pack(endian + 'HHIQQQIHHHHHH', 3, 62, 1, 0,
+			ehdr_size, 0, 0, ehdr_size, phdr_size, 2, 64, 0, 0)
+		phdrs = struct.pack(endian + 'IIQQQQQQ', PT_LOAD, 5, 0, BASE_ADDR,
+			BASE_ADDR, size, size, 0x1000)
+		phdrs += struct.pack(endian + 'IIQQQQQQ', PT_DYNAMIC, 6, dyn_offset,
+			BASE_ADDR + dyn_offset, BASE_ADDR + dyn_offset, len(dyn),
+			len(dyn), 8)
+	else:
+		ident = b'\x7fELF' + bytearray([1, endian == '<' and 1 or 2, 1])
+		ehdr = struct.pack(endian + 'HHIIIIIHHHHHH', 3, 3, 1, 0,
+			ehdr_size, 0, 0, ehdr_size, phdr_size, 2, 40, 0, 0)
+		phdrs = struct.pack(endian + 'IIIIIIII', PT_LOAD, 0, BASE_ADDR,
+			BASE_ADDR, size, size, 5, 0x1000)
+		phdrs += struct.pack(endian + 'IIIIIIII', PT_DYNAMIC, dyn_offset,
+			BASE_ADDR + dyn_offset, BASE_ADDR + dyn_offset, len(dyn),
+			len(dyn), 6, 4)
+	ident = bytes(ident).ljust(16, b'\0')
+	return ident + ehdr + phdrs + strtab + dyn
+
+
+def write_elf(path, **kwargs):
+	"""Writes make_elf(**kwargs) to path"""
+	dirname = os.path.dirname(path)
+	if not os.path.isdir(dirname):
+		os.makedirs(dirname)
+	f = open(path, 'wb')
+	f.write(make_elf(**kwargs))
+	f.close()
+	return path
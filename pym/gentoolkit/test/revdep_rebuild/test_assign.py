@@ -0,0 +1,123 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import os
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.revdep_rebuild import assign
+
+
+CONTENTS = {
+	'sys-libs/zlib-1.2.5': ['dir /lib', 'obj /lib/libz.so.1.2.5 0123 1',
+		'sym /lib/libz.so.1 -> libz.so.1.2.5 1'],
+	'app-misc/foo-1.0': ['dir /usr/bin', 'obj /usr/bin/foo 4567 2',
+		'obj /usr/share/foo/with space 89ab 3'],
+	'app-misc/bar-2.0': ['obj /usr/bin/bar cdef 4'],
+}
+
+
+class FakeDblink(object):
+	def __init__(self, cpv):
+		self.mycpv = cpv
+
+	def getcontents(self):
+		contents = {}
+		for line in CONTENTS[self.mycpv]:
+			entry_type, rest = line.split(' ', 1)
+			if entry_type == 'obj':
+				path = rest.rsplit(' ', 2)[0]
+			elif entry_type == 'sym':
+				path = rest.split(' -> ')[0]
+			else:
+				path = rest
+			contents[path] = [entry_type]
+		return contents
+
+
+class FakeOwners(object):
+	"""Like portage's index, matches every type of CONTENTS entry"""
+	def iter_owners(self, paths):
+		for path in paths:
+			for cpv in sorted(CONTENTS):
+				if path in FakeDblink(cpv).getcontents():
+					yield FakeDblink(cpv), path
+
+
+class FakeVardb(object):
+	_owners = FakeOwners()
+
+
+class BrokenOwners(object):
+	def iter_owners(self, paths):
+		raise IOError(13, 'Permission denied')
+		yield
+
+
+class BrokenVardb(object):
+	_owners = BrokenOwners()
+
+
+class TestAssignPackages(unittest.TestCase):
+
+	def setUp(self):
+		self.vdb = mkdtemp()
+		for cpv in CONTENTS:
+			os.makedirs(os.path.join(self.vdb, cpv))
+			f = open(os.path.join(self.vdb, cpv, 'CONTENTS'), 'w')
+			f.write('\n'.join(CONTENTS[cpv]) + '\n')
+			f.close()
+		self.messages = []
+
+	def tearDown(self):
+		shutil.rmtree(self.vdb)
+
+	def output(self, level, message):
+		self.messages.append(message)
+
+	def test_assign(self):
+		broken = ['/usr/bin/foo', '/lib/libz.so.1.2.5',
+			'/usr/share/foo/with space', '/lib/libz.so.1']
+		self.assertEqual(assign.assign_packages(broken, self.output,
+			vdb_path=self.vdb),
+			set(['sys-libs/zlib-1.2.5', 'app-misc/foo-1.0']))
+		self.assertEqual(len(self.messages), 3)
+
+	def test_nothing_broken(self):
+		self.assertEqual(assign.assign_packages([], self.output,
+			vdb_path=os.path.join(self.vdb, 'missing')), set())
+
+	def test_owners_index(self):
+		self.assertEqual(assign.assign_packages(['/usr/bin/bar'],
+			self.output, vdb_path=self.vdb, vardb=FakeVardb()),
+			set(['app-misc/bar-2.0']))
+		# same owners as from the CONTENTS files, sym and dir are skipped
+		broken = ['/usr/bin/foo', '/lib/libz.so.1.2.5',
+			'/usr/share/foo/with space', '/lib/libz.so.1', '/usr/bin']
+		self.assertEqual(assign.assign_packages(broken, self.output,
+			vdb_path=self.vdb, vardb=FakeVardb()),
+			assign.assign_packages(broken, self.output, vdb_path=self.vdb))
+		self.assertEqual(assign.assign_packages(['/lib/libz.so.1'],
+			self.output, vdb_path=self.vdb, vardb=FakeVardb()), set())
+
+	def test_owners_index_error(self):
+		self.assertEqual(assign.assign_packages(['/usr/bin/bar'],
+			self.output, vdb_path=self.vdb, vardb=BrokenVardb()),
+			set(['app-misc/bar-2.0']))
+		self.assertTrue('Permission denied' in self.messages[0])
+
+
+def test_main():
+	test_support.run_unittest(TestAssignPackages)
+
+
+if __name__ == '__main__':
+	test_main()
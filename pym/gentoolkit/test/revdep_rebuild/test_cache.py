@@ -0,0 +1,90 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import os
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.revdep_rebuild.cache import ElfCache, CACHE_VERSION
+from gentoolkit.test.revdep_rebuild.elfsupport import write_elf
+
+
+class TestElfCache(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		self.cache_file = os.path.join(self.dir, 'cache', 'elf.cache')
+		self.foo = write_elf(os.path.join(self.dir, 'libfoo.so.1'),
+			needed=['libc.so.6'], soname='libfoo.so.1')
+		self.bar = write_elf(os.path.join(self.dir, 'libbar.so.2'), bits=32,
+			needed=['libfoo.so.1'], rpath='/opt/lib')
+		self.script = os.path.join(self.dir, 'script')
+		f = open(self.script, 'w')
+		f.write('#!/bin/sh\n')
+		f.close()
+		self.paths = [self.foo, self.bar, self.script]
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def scan(self):
+		cache = ElfCache(self.cache_file)
+		cache.load()
+		found = cache.scan(self.paths, jobs=1)
+		self.assertTrue(cache.save())
+		return cache, found
+
+	def test_reuse(self):
+		cache, found = self.scan()
+		self.assertEqual((cache.reused, cache.read), (0, 3))
+		self.assertEqual(sorted(found), sorted([self.foo, self.bar]))
+		cache, cached = self.scan()
+		self.assertEqual((cache.reused, cache.read), (3, 0))
+		self.assertEqual(cached, found)
+		self.assertEqual(cached[self.bar].needed, ('libfoo.so.1',))
+
+	def test_changed_file(self):
+		cache, found = self.scan()
+		write_elf(self.foo + '.new', needed=['libc.so.6', 'libz.so.1'],
+			soname='libfoo.so.1', rpath='/usr/lib/foo')
+		os.rename(self.foo + '.new', self.foo)
+		os.remove(self.bar)
+		cache, found = self.scan()
+		self.assertEqual((cache.reused, cache.read), (1, 1))
+		self.assertEqual(sorted(found), [self.foo])
+		self.assertEqual(found[self.foo].needed, ('libc.so.6', 'libz.so.1'))
+		self.assertEqual(sorted(cache.entries), sorted([self.foo, self.script]))
+
+	def test_bad_cache(self):
+		os.makedirs(os.path.dirname(self.cache_file))
+		f = open(self.cache_file, 'w')
+		f.write('{"version": 0')
+		f.close()
+		self.assertFalse(ElfCache(self.cache_file).load())
+
+	def test_malformed_entries(self):
+		os.makedirs(os.path.dirname(self.cache_file))
+		for files in ('{"/lib/libc.so.6": [1, 2]}', '{"/lib/libc.so.6": 3}',
+				'{"/lib/libc.so.6": [1, 2, 3, [64]]}', '[]'):
+			f = open(self.cache_file, 'w')
+			f.write('{"version": %d, "files": %s}' % (CACHE_VERSION, files))
+			f.close()
+			cache = ElfCache(self.cache_file)
+			self.assertFalse(cache.load())
+			self.assertEqual(cache.entries, {})
+
+
+def test_main():
+	test_support.run_unittest(TestElfCache)
+
+
+if __name__ == '__main__':
+	test_main()
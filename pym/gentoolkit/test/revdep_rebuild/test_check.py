@@ -0,0 +1,107 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import os
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.revdep_rebuild.check import LibraryIndex, check_abis, \
+	find_broken, partition
+from gentoolkit.revdep_rebuild.elf import scan_files
+from gentoolkit.test.revdep_rebuild.elfsupport import write_elf
+
+
+SYSTEM_LIBRARIES = ['/lib64/libc.so.6', '/usr/lib64/libfoo.so.1',
+	'/usr/lib64/libbar.so.2.0.1', '/usr/lib64/libbar.so.2']
+
+
+class TestFindBroken(unittest.TestCase):
+
+	def setUp(self):
+		self.index = LibraryIndex(SYSTEM_LIBRARIES)
+
+	def test_index(self):
+		self.assertTrue('libc.so.6' in self.index)
+		self.assertTrue('/usr/lib64/libbar.so.2' in self.index)
+		self.assertFalse('/lib/libbar.so.2' in self.index)
+		# the old substring search matched names ending the same way
+		self.assertFalse('bc.so.6' in self.index)
+		self.assertFalse('libfoo.so' in self.index)
+
+	def test_find_broken(self):
+		found_libs = ['libc.so.6', 'libbaz.so.3', 'libfoo.so.1',
+			'libbar.so.2', 'libfoo.so.2']
+		self.assertEqual(find_broken(found_libs, self.index, set()), [1, 4])
+		# a plain list is accepted as well
+		self.assertEqual(find_broken(found_libs, SYSTEM_LIBRARIES, set()),
+			[1, 4])
+
+	def test_find_broken_library(self):
+		found_libs = ['libc.so.6', 'libfoo.so.1', 'libbar.so.2',
+			'libfoo.so.2']
+		self.assertEqual(find_broken(found_libs, self.index, set(['libfoo'])),
+			[1, 3])
+		self.assertEqual(find_broken(found_libs, self.index,
+			set(['libbar.so.2', 'libc', 'bar'])), [0, 2])
+		# names are matched literally
+		found_libs = ['libstdc++.so.6', 'libstdcxx.so.6', '/opt/lib/libx.so']
+		self.assertEqual(find_broken(found_libs, self.index,
+			set(['libstdc++', 'libx.so'])), [0, 2])
+
+
+class TestCheckAbis(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		self.lib64 = os.path.join(self.dir, 'lib64')
+		self.lib32 = os.path.join(self.dir, 'lib32')
+		self.libraries = [
+			write_elf(os.path.join(self.lib64, 'libc.so.6')),
+			write_elf(os.path.join(self.lib32, 'libc.so.6'), bits=32),
+			write_elf(os.path.join(self.lib64, 'libz.so.1'),
+				needed=['libc.so.6'])]
+		self.bin64 = write_elf(os.path.join(self.dir, 'bin', 'foo'),
+			needed=['libz.so.1', 'libc.so.6'])
+		self.bin32 = write_elf(os.path.join(self.dir, 'bin', 'foo32'),
+			bits=32, needed=['libz.so.1', 'libc.so.6'])
+		self.files = self.libraries + [self.bin64, self.bin32]
+		self.elf_info = scan_files(self.files)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_partition(self):
+		abis = partition(self.elf_info)
+		self.assertEqual(sorted(abis), [32, 64])
+		self.assertEqual(sorted(abis[32]),
+			sorted([self.libraries[1], self.bin32]))
+
+	def test_check_abis(self):
+		for jobs in (1, 2):
+			results = check_abis(self.elf_info, self.files, self.libraries,
+				[self.lib32, self.lib64], set(), jobs=jobs)
+			# the broken libraries of every ABI are kept
+			self.assertEqual(results, [(32, ['libz.so.1'], [[self.bin32]]),
+				(64, [], [])])
+
+	def test_check_abis_library(self):
+		results = check_abis(self.elf_info, self.files, self.libraries,
+			[self.lib32, self.lib64], set(['libc']), jobs=1)
+		self.assertEqual(results, [(32, ['libc.so.6'], [[self.bin32]]),
+			(64, ['libc.so.6'], [[self.libraries[2], self.bin64]])])
+
+
+def test_main():
+	test_support.run_unittest(TestFindBroken, TestCheckAbis)
+
+
+if __name__ == '__main__':
+	test_main()
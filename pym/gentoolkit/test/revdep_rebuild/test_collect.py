@@ -0,0 +1,66 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import os
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.revdep_rebuild import collect
+
+
+class TestCollect(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		self.lib = os.path.join(self.dir, 'lib')
+		self.bin = os.path.join(self.dir, 'bin')
+		for d in ('lib/sub', 'lib/masked', 'bin/sub'):
+			os.makedirs(os.path.join(self.dir, d))
+		self.files = {}
+		for name, mode in (('lib/libfoo.so.1.0', 0o755),
+				('lib/sub/libbar.so', 0o644), ('lib/libfoo.la', 0o644),
+				('lib/masked/libmasked.so', 0o644), ('lib/sub/helper', 0o755),
+				('lib/README', 0o644), ('bin/prog', 0o755),
+				('bin/sub/tool', 0o711), ('bin/data', 0o644)):
+			path = os.path.join(self.dir, name)
+			open(path, 'w').close()
+			os.chmod(path, mode)
+			self.files[name] = path
+		os.symlink('libfoo.so.1.0', os.path.join(self.lib, 'libfoo.so.1'))
+		os.symlink('sub', os.path.join(self.lib, 'linkdir'))
+		os.symlink('prog', os.path.join(self.bin, 'prog-link'))
+		self.mask = set([os.path.join(self.lib, 'masked')])
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_collect_libraries(self):
+		libs, la_libs, links, pairs = collect.collect_libraries([self.lib],
+			self.mask, jobs=2)
+		self.assertEqual(sorted(libs), sorted([self.files['lib/libfoo.so.1.0'],
+			self.files['lib/sub/libbar.so'], self.files['lib/sub/helper']]))
+		self.assertEqual(la_libs, [self.files['lib/libfoo.la']])
+		self.assertEqual(links, [os.path.join(self.lib, 'libfoo.so.1')])
+		self.assertEqual([(links[i], libs[j]) for i, j in pairs],
+			[(links[0], os.path.realpath(self.files['lib/libfoo.so.1.0']))])
+
+	def test_collect_binaries(self):
+		bins = collect.collect_binaries([self.bin], set(), jobs=2)
+		self.assertEqual(sorted(bins), sorted([self.files['bin/prog'],
+			self.files['bin/sub/tool']]))
+
+
+def test_main():
+	test_support.run_unittest(TestCollect)
+
+
+if __name__ == '__main__':
+	test_main()
@@ -0,0 +1,75 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import os
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.revdep_rebuild import elf
+from gentoolkit.test.revdep_rebuild.elfsupport import make_elf, write_elf
+
+
+class TestElfReader(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_parse_elf64(self):
+		data = make_elf(64, '<', needed=['libfoo.so.1', 'libc.so.6'],
+			soname='libbar.so.2', runpath='$ORIGIN/../lib:/opt/lib')
+		info = elf.parse_elf(data)
+		self.assertEqual(info.elfclass, 64)
+		self.assertEqual(info.needed, ('libfoo.so.1', 'libc.so.6'))
+		self.assertEqual(info.soname, 'libbar.so.2')
+		self.assertEqual(info.rpath, ())
+		self.assertEqual(info.runpath, ('$ORIGIN/../lib', '/opt/lib'))
+
+	def test_parse_elf32_big_endian(self):
+		data = make_elf(32, '>', needed=['libc.so.6'], rpath='/usr/lib/foo')
+		info = elf.parse_elf(data)
+		self.assertEqual(info.elfclass, 32)
+		self.assertEqual(info.needed, ('libc.so.6',))
+		self.assertEqual(info.soname, None)
+		self.assertEqual(info.rpath, ('/usr/lib/foo',))
+
+	def test_not_elf(self):
+		self.assertEqual(elf.parse_elf(b'#!/bin/sh\necho foo\n'), None)
+		self.assertEqual(elf.parse_elf(make_elf()[:20]), None)
+
+	def test_scan_files(self):
+		paths = []
+		for i in range(elf.MIN_PARALLEL_FILES + 1):
+			paths.append(write_elf(os.path.join(self.dir, 'lib%d.so' % i),
+				bits=(i % 2 and 32 or 64), needed=['libc.so.6'],
+				soname='lib%d.so' % i))
+		script = os.path.join(self.dir, 'script')
+		f = open(script, 'w')
+		f.write('#!/bin/sh\n')
+		f.close()
+		empty = os.path.join(self.dir, 'empty.so')
+		open(empty, 'w').close()
+		found = elf.scan_files(paths + [script, empty], jobs=2)
+		self.assertEqual(sorted(found), sorted(paths))
+		self.assertEqual(found[paths[1]].elfclass, 32)
+		self.assertEqual(found[paths[2]].soname, 'lib2.so')
+		self.assertEqual(elf.scan_files(paths[:3], jobs=1),
+			dict((p, found[p]) for p in paths[:3]))
+
+
+def test_main():
+	test_support.run_unittest(TestElfReader)
+
+
+if __name__ == '__main__':
+	test_main()
@@ -0,0 +1,91 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import os
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.revdep_rebuild.cache import LaCache
+from gentoolkit.revdep_rebuild.check import LibraryIndex
+from gentoolkit.revdep_rebuild.la import broken_la, iter_la_files, parse_la
+
+
+LA_TEMPLATE = """# libfoo.la - a libtool library file
+dlname='libfoo.so.1'
+dependency_libs=' -L/usr/lib64 %s -lm'
+"""
+
+
+class TestLa(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		self.foo = self.write('libfoo.la',
+			'/usr/lib64/libbar.la /usr/lib64/libz.so')
+		self.bar = self.write('libbar.la', '/usr/lib64/libgone.la')
+		self.baz = self.write('libbaz.la', '')
+		self.la_files = [self.foo, self.bar, self.baz,
+			'/usr/lib64/libbar.la']
+		self.libraries = LibraryIndex(['/usr/lib64/libz.so'])
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def write(self, name, dependencies):
+		path = os.path.join(self.dir, name)
+		f = open(path, 'w')
+		f.write(LA_TEMPLATE % dependencies)
+		f.close()
+		return path
+
+	def test_parse_la(self):
+		self.assertEqual(parse_la(self.foo),
+			('/usr/lib64/libbar.la', '/usr/lib64/libz.so'))
+		self.assertEqual(parse_la(self.baz), ())
+		self.assertEqual(parse_la(os.path.join(self.dir, 'missing.la')),
+			None)
+
+	def test_iter_la_files(self):
+		paths = [self.foo, self.bar, self.baz] * 10
+		self.assertEqual([path for path, deps in iter_la_files(paths, 3)],
+			paths)
+
+	def test_broken_la(self):
+		parsed = iter_la_files(self.la_files)
+		self.assertEqual(list(broken_la(parsed, self.la_files,
+			self.libraries, set())), [(self.bar, '/usr/lib64/libgone.la')])
+		parsed = iter_la_files(self.la_files)
+		self.assertEqual(list(broken_la(parsed, self.la_files,
+			self.libraries, set(['libfoo']))), [])
+
+	def test_cache(self):
+		cache_file = os.path.join(self.dir, 'la.cache')
+		cache = LaCache(cache_file)
+		first = sorted(cache.scan(self.la_files))
+		self.assertEqual((cache.reused, cache.read), (0, 3))
+		self.assertTrue(cache.save())
+		self.write('libbaz.la', '/usr/lib64/libnew.so')
+		os.utime(self.baz, (0, 0))
+		cache = LaCache(cache_file)
+		self.assertTrue(cache.load())
+		second = dict(cache.scan(self.la_files))
+		self.assertEqual((cache.reused, cache.read), (2, 1))
+		self.assertEqual(sorted(second), [path for path, deps in first])
+		self.assertEqual(second[self.foo], dict(first)[self.foo])
+		self.assertEqual(second[self.baz], ('/usr/lib64/libnew.so',))
+
+
+def test_main():
+	test_support.run_unittest(TestLa)
+
+
+if __name__ == '__main__':
+	test_main()
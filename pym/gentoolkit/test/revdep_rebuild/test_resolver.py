@@ -0,0 +1,121 @@
+#!/usr/bin/python
+#
+# Copyright 2010 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import os
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.revdep_rebuild.elf import scan_files
+from gentoolkit.revdep_rebuild.resolver import Resolver, parse_ld_conf
+from gentoolkit.test.revdep_rebuild.elfsupport import write_elf
+
+
+class TestParseLdConf(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		os.makedirs(os.path.join(self.dir, 'ld.so.conf.d'))
+		self.conf = self.write('ld.so.conf', '/usr/local/lib\n'
+			'include ld.so.conf.d/*.conf\n# comment\n/opt/lib:/usr/lib/\n')
+		self.write('ld.so.conf.d/20-b.conf', '/usr/lib/b # trailing\n')
+		self.write('ld.so.conf.d/10-a.conf', '/usr/lib/a, /usr/local/lib\n'
+			'include ../ld.so.conf\nhwcap 0 nosegneg\n')
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def write(self, name, content):
+		path = os.path.join(self.dir, name)
+		f = open(path, 'w')
+		f.write(content)
+		f.close()
+		return path
+
+	def test_order(self):
+		self.assertEqual(parse_ld_conf(self.conf), ['/usr/local/lib',
+			'/usr/lib/a', '/usr/lib/b', '/opt/lib', '/usr/lib'])
+
+	def test_missing(self):
+		self.assertEqual(parse_ld_conf(os.path.join(self.dir, 'none')), [])
+
+
+class TestResolver(unittest.TestCase):
+
+	def setUp(self):
+		self.dir = mkdtemp()
+		self.conf_dir = os.path.join(self.dir, 'usr/lib')
+		self.app_dir = os.path.join(self.dir, 'opt/app')
+		self.lib('usr/lib/libc.so.6')
+		self.lib('usr/lib/libz.so.1')
+		self.lib('usr/lib/libold.so.1', bits=32)
+		self.lib('opt/app/lib/libapp.so.1', needed=['libc.so.6'])
+		self.lib('opt/other/libapp.so.1', needed=['libc.so.6'])
+		self.lib('opt/app/lib/libplugin.so', needed=['libapp.so.1'])
+		self.origin = self.lib('opt/app/bin/app',
+			needed=['libapp.so.1', 'libz.so.1'], rpath='$ORIGIN/../lib')
+		self.runpath = self.lib('opt/app/bin/app2',
+			needed=['libapp.so.1'], rpath='$ORIGIN/../lib',
+			runpath='/nonexistent')
+		self.old = self.lib('usr/bin/old', needed=['libold.so.1', 'libc.so.6'])
+		self.elf_info = scan_files(self.paths)
+		self.resolver = Resolver(self.elf_info, 64, [self.conf_dir])
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def lib(self, name, bits=64, **kwargs):
+		if not hasattr(self, 'paths'):
+			self.paths = []
+		path = write_elf(os.path.join(self.dir, name), bits=bits, **kwargs)
+		self.paths.append(path)
+		return path
+
+	def test_search_path(self):
+		info = self.elf_info[self.origin]
+		search_path = self.resolver.search_path(self.origin, info)
+		self.assertEqual(search_path[:2],
+			(os.path.join(self.app_dir, 'lib'), self.conf_dir))
+		# DT_RUNPATH disables DT_RPATH
+		info = self.elf_info[self.runpath]
+		self.assertEqual(self.resolver.search_path(self.runpath, info)[:2],
+			('/nonexistent', self.conf_dir))
+
+	def test_resolve(self):
+		search_path = (self.conf_dir,)
+		self.assertEqual(self.resolver.resolve('libz.so.1', search_path),
+			os.path.join(self.conf_dir, 'libz.so.1'))
+		# wrong ELF class
+		self.assertEqual(self.resolver.resolve('libold.so.1', search_path),
+			None)
+		self.assertEqual(self.resolver.resolve('libapp.so.1', search_path),
+			None)
+
+	def test_unresolved(self):
+		libs, dependencies = self.resolver.unresolved(self.paths)
+		self.assertEqual(sorted(zip(libs, dependencies)), [
+			('libapp.so.1', [os.path.join(self.app_dir, 'lib/libplugin.so'),
+				self.runpath]),
+			('libold.so.1', [self.old])])
+
+	def test_unresolved_libraries(self):
+		libraries = [p for p in self.paths if '.so' in p]
+		libs, dependencies = self.resolver.unresolved(self.paths, libraries)
+		self.assertEqual(sorted(zip(libs, dependencies)), [
+			('libapp.so.1', [self.runpath]),
+			('libold.so.1', [self.old])])
+
+
+def test_main():
+	test_support.run_unittest(TestParseLdConf, TestResolver)
+
+
+if __name__ == '__main__':
+	test_main()
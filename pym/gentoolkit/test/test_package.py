@@ -0,0 +1,117 @@
+import unittest
+from string import Template
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit.package import (MaskEvaluator, Package, PackageFormatter,
+	template_fields)
+
+
+class FakePortdb(object):
+	"""A tree where only the versions in visible are unmasked."""
+
+	def __init__(self, visible):
+		self.visible = visible
+		self.calls = []
+
+	def xmatch(self, level, cp):
+		self.calls.append((level, cp))
+		return [x for x in self.visible if x.startswith(cp + '-')]
+
+
+class FakeEvaluator(object):
+
+	arch = 'amd64'
+
+	def __init__(self, status):
+		self.status = status
+		self.calls = 0
+
+	def __call__(self, cpv):
+		self.calls += 1
+		return self.status
+
+
+class TestPackageFormatter(unittest.TestCase):
+
+	def setUp(self):
+		self.pkg = Package('sys-apps/portage-2.1.6.13')
+
+	def tearDown(self):
+		pass
+
+	def test_template_fields(self):
+		self.failUnlessEqual(template_fields(Template("$cpv ${slot}:$$repo")),
+			frozenset(['cpv', 'slot']))
+
+	def test_only_used_fields(self):
+		pkgstr = PackageFormatter(self.pkg, do_format=False,
+			custom_format="$name-$version")
+		self.failUnlessEqual(pkgstr.fields, frozenset(['name', 'version']))
+		self.failUnlessEqual(sorted(pkgstr.format_vars),
+			['name', 'version'])
+		self.failUnlessEqual(str(pkgstr), 'portage-2.1.6.13')
+
+	def test_mask_evaluator(self):
+		evaluator = FakeEvaluator(['~amd64 keyword'])
+		pkgstr = PackageFormatter(self.pkg, do_format=False,
+			custom_format="$cpv", mask_evaluator=evaluator)
+		self.failUnlessEqual(pkgstr.format_mask_status(),
+			(1, ['~amd64 keyword']))
+		pkgstr.format_mask_status()
+		self.failUnlessEqual(evaluator.calls, 1)
+
+		pkgstr.pkg = Package('sys-apps/portage-2.1.8')
+		self.failUnlessEqual(str(pkgstr), 'sys-apps/portage-2.1.8')
+		evaluator.status = None
+		self.failUnlessEqual(pkgstr.format_mask_status(), (6, []))
+		self.failUnlessEqual(evaluator.calls, 2)
+
+
+class TestMaskEvaluator(unittest.TestCase):
+
+	def setUp(self):
+		self.portdb = FakePortdb(['sys-apps/portage-2.1.6.13',
+			'sys-apps/portage-2.1.8', 'sys-devel/gcc-4.3.2-r3'])
+		self.evaluator = MaskEvaluator(self.portdb)
+
+	def tearDown(self):
+		pass
+
+	def test_evaluate(self):
+		cpvs = ['sys-apps/portage-2.1.6.13', 'sys-apps/portage-2.1.8',
+			'sys-devel/gcc-4.3.2-r3']
+		self.failUnlessEqual(self.evaluator.evaluate(cpvs),
+			dict((x, []) for x in cpvs))
+		# One lookup per cat/pkg
+		self.failUnlessEqual(self.portdb.calls, [
+			('match-visible', 'sys-apps/portage'),
+			('match-visible', 'sys-devel/gcc')
+		])
+
+	def test_call(self):
+		self.failUnlessEqual(self.evaluator('sys-apps/portage-2.1.8'), [])
+		self.failUnlessEqual(self.evaluator('sys-apps/portage-2.1.6.13'), [])
+		self.failUnlessEqual(self.evaluator.evaluate(
+			['sys-apps/portage-2.1.8']), {'sys-apps/portage-2.1.8': []})
+		self.failUnlessEqual(len(self.portdb.calls), 1)
+
+	def test_evaluate_then_call(self):
+		self.evaluator.evaluate(['sys-apps/portage-2.1.8'])
+		self.failUnlessEqual(self.evaluator('sys-apps/portage-2.1.6.13'), [])
+		self.failUnlessEqual(self.evaluator.evaluate(
+			['sys-apps/portage-2.1.6.13', 'sys-apps/portage-2.1.8']),
+			{'sys-apps/portage-2.1.6.13': [], 'sys-apps/portage-2.1.8': []})
+		# the visible versions of the cat/pkg were looked up once
+		self.failUnlessEqual(self.portdb.calls,
+			[('match-visible', 'sys-apps/portage')])
+
+
+def test_main():
+	test_support.run_unittest(TestPackageFormatter, TestMaskEvaluator)
+
+
+if __name__ == '__main__':
+	test_main()
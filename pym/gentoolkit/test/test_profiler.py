@@ -0,0 +1,112 @@
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+
+try:
+	from test import test_support
+except ImportError:
+	from test import support as test_support
+
+from gentoolkit import profiler
+from gentoolkit.profiler import Profiler
+
+
+class FakeDb(object):
+
+	def aux_get(self, cpv, keys):
+		return [cpv] * len(keys)
+
+
+class TestProfiler(unittest.TestCase):
+
+	def setUp(self):
+		self.profiler = Profiler()
+		self.tmpdir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		self.profiler.stop()
+		shutil.rmtree(self.tmpdir)
+
+	def test_disabled(self):
+		self.failUnless(self.profiler.phase("output") is profiler._NULL_PHASE)
+		self.profiler.count("files hashed")
+		self.failIf(self.profiler.count_calls(os, 'stat', 'stat calls'))
+		self.failUnlessEqual(self.profiler.counters, {})
+		self.failUnlessEqual(self.profiler.phases, {})
+
+	def test_phases(self):
+		self.profiler.start()
+		with self.profiler.phase("query resolution"):
+			with self.profiler.phase("output"):
+				pass
+			# Nested phases of the same name are timed once
+			with self.profiler.phase("query resolution"):
+				pass
+		with self.profiler.phase("query resolution"):
+			pass
+		self.profiler.count("files hashed", 3)
+		self.profiler.stop()
+		self.failUnlessEqual(self.profiler.phase_order,
+			["query resolution", "output"])
+		self.failUnlessEqual(self.profiler.phases["query resolution"][0], 2)
+		self.failUnlessEqual(self.profiler.phases["output"][0], 1)
+		self.failUnlessEqual(self.profiler.counters["files hashed"], 3)
+
+		lines = self.profiler.summary()
+		self.failUnless(lines[0].startswith("Profile: "))
+		self.failUnlessEqual([x.split()[0] for x in lines[1:]],
+			["phase", "query", "output", "files"])
+
+	def test_count_calls(self):
+		db = FakeDb()
+		orig_stat = os.stat
+		self.profiler.start()
+		self.failUnless(self.profiler.count_calls(db, 'aux_get',
+			'aux_get calls'))
+		db.aux_get('app-misc/foo-1.0', ['SLOT'])
+		db.aux_get('app-misc/foo-1.0', ['SLOT', 'repository'])
+		os.stat(self.tmpdir)
+		os.lstat(self.tmpdir)
+		self.profiler.stop()
+		self.failUnlessEqual(self.profiler.counters,
+			{'aux_get calls': 2, 'stat calls': 2})
+		# The wrappers are removed when stopped
+		self.failUnless(os.stat is orig_stat)
+		self.failIf('aux_get' in db.__dict__)
+		db.aux_get('app-misc/foo-1.0', ['SLOT'])
+		self.failUnlessEqual(self.profiler.counters['aux_get calls'], 2)
+
+	def test_dump(self):
+		path = os.path.join(self.tmpdir, 'equery.prof')
+		self.profiler.start(path)
+		sorted(range(100))
+		out = StringIO()
+		self.profiler.finish(out)
+		self.failIf(self.profiler.enabled)
+		self.failUnless(pstats.Stats(path).total_calls)
+		self.failUnless(out.getvalue().endswith(
+			"cProfile stats written to %s\n" % path))
+
+	def test_dump_error(self):
+		path = os.path.join(self.tmpdir, 'missing', 'equery.prof')
+		self.profiler.start(path)
+		out = StringIO()
+		self.profiler.finish(out)
+		self.failUnless(out.getvalue().startswith(
+			"!!! Could not write the cProfile stats to %s" % path))
+		self.failIf("written to" in out.getvalue())
+		# A second finish does nothing
+		out = StringIO()
+		self.profiler.finish(out)
+		self.failUnlessEqual(out.getvalue(), '')
+
+
+def test_main():
+	test_support.run_unittest(TestProfiler)
+
+
+if __name__ == '__main__':
+	test_main()